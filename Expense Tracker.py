@@ -2,60 +2,38 @@
 
 import tkinter as tk
 from tkinter import ttk
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, simpledialog
 
 # If you get a library related error, run the below code
 # pip install tkcalendar
 
-from tkcalendar import Calendar
-
-import pandas as pd
-import numpy as np
+import datetime
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+import expense_profiling  # standard library only, cheap to import
+from expense_profiling import span
 
-import datetime
-######################## INITIATE THE MAIN DATAFRAME  ########################
-
-# We are creating a pandas dataframe (df) which will be used globally by the app
-
-# data type of each colum
-df_dtype = {
-    "date": "datetime64[ns]",
-    "category": "category",
-    "description": "str",
-    "amount": "float"
-}
-
-# The different type of expense
-category_ls = [
-    "Transport",
-    "Housing",
-    "Health",
-    "Food",
-    "Entertainment",
-    "Miscellaneous",
-    "Education",
-    "Utilities",
-    "Shopping"
-      ]
+# Only tkinter is imported before the main window is drawn, the heavy modules are loaded later:
+#  - pandas, numpy and the data modules right after the first paint (end of this file)
+#  - tkcalendar when a calendar is opened, matplotlib when a dashboard is opened
 
-    
+startup_time = time.perf_counter()
 
-def convert_columns(df):
-    """Convert the dataframe column into the expected format"""
-    for key, value in df_dtype.items():
-        if value == "datetime64[ns]":  # Special handling for datetime conversion
-            df[key] = pd.to_datetime(df[key], errors='coerce')  # Safely handle invalid dates
-        else:
-            df[key] = df[key].astype(value)
-    return df
+######################## INITIATE THE MAIN LEDGER  ########################
 
+# The expenses are kept in a Ledger (see expense_data.py) which is used globally by the app.
+# ledger.frame() gives them back as a pandas dataframe when a view needs one.
+# The main ledger is created at the end of this file, once the main window is shown.
+ledger = None
 
-# Create the main dataframe + apply data type conversion
-df = pd.DataFrame(columns=df_dtype.keys())
-df = convert_columns(df)
+# Journal of the changes when the ledger was saved/loaded as a .ledger file (incremental saves)
+journal = None
 
 
 ###########################  DATABASE FUNCTIONS  ###########################
@@ -63,60 +41,233 @@ df = convert_columns(df)
 
 
 def input_fake_data():
-    """Generate fake data for testing and debugging functionalities""" 
-    global df
+    """Generate fake data for testing and debugging functionalities (skewed like a real ledger)"""
+    n = simpledialog.askinteger("Input fake data", "Number of expenses to generate:",
+                                initialvalue=10_000, minvalue=1, maxvalue=10_000_000)
+    if n is None:
+        return
 
-    fake_data = {
-        "date": ["2024-12-12", "2024-12-11", "2023-12-03"],
-        "category": ["Food", "Transportation", "Entertainment"],
-        "description": ["Lunch at restaurant", "Bus ticket", "Movie ticket"],
-        "amount": [20.50, 30.00, 15.00]
-    }
+    fake_data_df = synthetic_expenses(n)
 
-    fake_data_df = pd.DataFrame(fake_data)
+    # Same path as a bulk import: rows go to the append buffer
+    ledger.extend(fake_data_df)
+    messagebox.showinfo("Input fake data", f"{n} expenses generated.")
+
+
+# Listeners following whichever ledger the app works on (open dashboards), moved by use_ledger
+ledger_listeners = []
+
+
+def follow_ledger(listener):
+    ledger_listeners.append(listener)
+    ledger.subscribe(listener)
+
+
+def unfollow_ledger(listener):
+    if listener in ledger_listeners:
+        ledger_listeners.remove(listener)
+    ledger.unsubscribe(listener)
+
+
+def use_ledger(new_ledger):
+    """
+    Make the app work on another ledger: in memory, or a SQLite database.
+    The listeners of the app move to the new ledger and get a "reset" event.
+    """
+    global ledger
+    if ledger is new_ledger:
+        return
+    for listener in ledger_listeners:
+        ledger.unsubscribe(listener)
+        new_ledger.subscribe(listener)
+    if isinstance(ledger, SQLiteLedger):
+        ledger.close()
+    ledger = new_ledger
+    for listener in list(ledger_listeners):
+        listener("reset", None)
+
+
+def detach_journal():
+    """Stop writing the changes of the ledger to the current journal (another file is used)"""
+    global journal
+    if journal is not None:
+        journal.close()
+        journal = None
 
-    df = pd.concat([df, fake_data_df], ignore_index=True)
-    df = df.astype(df_dtype)
-    
 
 def save_to_file():
-    """Open a dialog allowing user to save the dataframe inside a CSV format only"""
+    """
+    Open a dialog allowing user to save the dataframe as CSV, Feather or Parquet (from the extension).
+    A .ledger file is a journal: saving it again only appends the changes made since the last save.
+    A .sqlite / .db file gets a copy of the expenses (a loaded database is always saved).
+    """
+    global journal
     
     try:
-        path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")], title="Save as")
+        # Propose the current journal first, saving it is the fast path
+        initial_file = os.path.basename(journal.path) if journal is not None else ""
+        path = filedialog.asksaveasfilename(defaultextension=".csv",
+                                            filetypes=file_types + [journal_file_type, database_file_type],
+                                            initialfile=initial_file, title="Save as")
 
         if path:
-            df.to_csv(path, index=False)
+            with span("file.save"):
+                if is_database(path):
+                    # Every change of a loaded database is already committed
+                    if not (isinstance(ledger, SQLiteLedger) and os.path.abspath(ledger.path) == os.path.abspath(path)):
+                        database = SQLiteLedger(path)
+                        database.replace(ledger.frame())
+                        database.close()
+                elif path.endswith(".ledger"):
+                    if journal is not None and os.path.abspath(journal.path) == os.path.abspath(path):
+                        journal.save()  # O(changes)
+                    else:
+                        detach_journal()
+                        journal = Journal.create(path, ledger)
+                else:
+                    write_ledger(ledger.frame(), path)
             messagebox.showinfo("Saved", "File Save")
         else:
             messagebox.showwarning("Error", "Operation cancelled")
 
+    except ImportError as e:  # Feather / Parquet without pyarrow
+        messagebox.showerror("Error", str(e))
     except Exception:
         messagebox.showerror("Error")
 
 
 
 def load_from_file():
-    """Open a dialog box allowing the user to load a csv file into the dataframe"""
-    global df
+    """
+    Open a dialog box allowing the user to load a CSV, Feather, Parquet or journal (.ledger) file into the dataframe.
+    A SQLite database (.sqlite / .db) is not loaded in memory: the app works on the database directly.
+    """
+    global journal
 
     try:
-        path = filedialog.askopenfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")], title="Load from")
+        loadable_types = file_types + [journal_file_type, database_file_type]
+        all_types = ("All supported files", " ".join(pattern for _, pattern in loadable_types))
+        path = filedialog.askopenfilename(defaultextension=".csv", filetypes=[all_types] + loadable_types,
+                                          title="Load from")
 
         if path:
-            # Read data from csv + convert + add to dataframe
-            data_input = pd.read_csv(path)
-            df = convert_columns(data_input)
+            detach_journal()
+
+            # Database: filters, deletes and dashboard are SQL queries, the views read it page by page
+            if is_database(path):
+                with span("file.load"):
+                    use_ledger(SQLiteLedger(path))
+                messagebox.showinfo("File loaded", f"Database loaded ({len(ledger)} expenses)")
+                return
+
+            # The other files are loaded in memory (never into an open database)
+            if isinstance(ledger, SQLiteLedger):
+                use_ledger(Ledger())
+
+            # Journal: snapshot + replay of the changes saved after it
+            if path.endswith(".ledger"):
+                with span("file.load"):
+                    journal = Journal.open(path, ledger)
+                messagebox.showinfo("File loaded", "File loaded")
+                return
+
+            # CSV files are streamed in the background with a progress bar
+            if file_format(path) == "csv":
+                import_csv(path)
+                return
+
+            # Read data from the file (binary formats are already typed) + add to dataframe
+            with span("file.load"):
+                ledger.replace(read_ledger(path))
 
             messagebox.showinfo("File loaded", "File loaded")
         else:
             messagebox.showwarning("Error", "Operation cancelled")
 
+    except ImportError as e:  # Feather / Parquet without pyarrow
+        messagebox.showerror("Error", str(e))
     except Exception:
         messagebox.showerror("Error")
 
 
 
+def compact_memory():
+    """
+    Switch the ledger to the compact schema (amounts in cents, dictionary-encoded descriptions,
+    fixed categories) and show the memory used by each column before and after
+    """
+    if isinstance(ledger, SQLiteLedger):
+        messagebox.showinfo("Compact memory", "The expenses of a database are not kept in memory.")
+        return
+
+    before, after = ledger.compact_memory()
+    lines = [f"{column}: {before[column] / 2**20:.1f} MB -> {after[column] / 2**20:.1f} MB" for column in before.index]
+    lines.append(f"\nTotal: {before.sum() / 2**20:.1f} MB -> {after.sum() / 2**20:.1f} MB")
+    messagebox.showinfo("Compact memory", "\n".join(lines))
+
+
+def import_csv(path):
+    """
+    Load a CSV file chunk by chunk in a background thread, with a progress bar.
+    The thread only parses the file, the ledger is replaced by the main (Tk) thread
+    once everything is read, so the window stays responsive during the import.
+    """
+    progress_window = tk.Toplevel(root)
+    progress_window.title("Loading")
+    progress_window.geometry("300x120")
+
+    label_progress = tk.Label(progress_window, text=f"Loading {os.path.basename(path)}...")
+    label_progress.pack(pady=10)
+    progress_bar = ttk.Progressbar(progress_window, length=250, maximum=100)
+    progress_bar.pack()
+
+    messages = queue.Queue()  # thread -> Tk loop
+    cancel = threading.Event()
+
+    def read_file():
+        """Run in the background thread"""
+        try:
+            with span("file.load csv (parse)"):
+                frame, invalid = read_csv_chunked(path, progress=lambda fraction: messages.put(("progress", fraction)),
+                                                  cancel=cancel)
+            messages.put(("done", frame, invalid))
+        except Exception as e:
+            messages.put(("error", e))
+
+    def check_messages():
+        """Run in the Tk loop every 100 ms until the import is over"""
+        while not messages.empty():
+            message = messages.get()
+            if message[0] == "progress":
+                progress_bar["value"] = message[1] * 100
+            elif message[0] == "error":
+                progress_window.destroy()
+                messagebox.showerror("Error", f"Could not load the file.\n Error: {message[1]}")
+                return
+            else:
+                progress_window.destroy()
+                frame, invalid = message[1], message[2]
+                if frame is None:
+                    messagebox.showwarning("Error", "Operation cancelled")
+                    return
+                with span("file.load csv (replace)"):
+                    ledger.replace(frame)
+                text = "File loaded" if not invalid else f"File loaded\n{invalid} invalid dates/amounts were left empty"
+                messagebox.showinfo("File loaded", text)
+                return
+        progress_window.after(100, check_messages)
+
+    def cancel_import():
+        cancel.set()
+        label_progress.config(text="Cancelling...")
+
+    tk.Button(progress_window, text="Cancel", command=cancel_import).pack(pady=10)
+    progress_window.protocol("WM_DELETE_WINDOW", cancel_import)
+
+    threading.Thread(target=read_file, daemon=True).start()
+    check_messages()
+
+
 def input_data():
     """
     This function creates a new window for the user to manually input some data.
@@ -139,6 +290,8 @@ def input_data():
         calendar_window.geometry("300x300")
         
         # Create the calendar widget
+        from tkcalendar import Calendar  # loaded on first use
+
         today = datetime.date.today() # Set today date as defaut value on the calendar
         calendar_input = Calendar(calendar_window, selectmode='day',
                             year = today.year, month = today.month, day = today.day)
@@ -217,17 +370,11 @@ def input_data():
             value_amount = float(value_amount)
         except ValueError as e:
             messagebox.showerror("Error", f"Please input a valid number for the amount.\n Error: {str(e)}")
+            return
 
-        new_data = pd.Series({
-            'date': value_date,
-            'category': value_category,
-            'description': value_description,
-            'amount': value_amount
-        })
-
-        global df
-        df = pd.concat([df, new_data.to_frame().T], ignore_index=True)
-        df = df.astype(df_dtype)
+        # The expense goes to the append buffer, the dataframe is not copied
+        with span("ledger.add"):
+            ledger.append(value_date, value_category, value_description, value_amount)
         input_data_window.destroy()
 
 
@@ -236,43 +383,311 @@ def input_data():
     submit_button.grid(row=4, columnspan=2, pady=10)
 
 
+def bulk_entry():
+    """
+    Spreadsheet-like window to enter many expenses at once: the cells are edited in place
+    (double-click or Enter), rows can be pasted from a spreadsheet or a CSV (Ctrl+V).
+    All the rows are validated together and added to the ledger in a single batch.
+    """
+    bulk_window = tk.Toplevel(root)
+    bulk_window.title("Bulk add expenses")
+    bulk_window.geometry("750x500")
+
+    label_help = tk.Label(bulk_window, text="Double-click a cell to edit it (Enter: next row, Tab: next cell). "
+                                            "Ctrl+V pastes rows: date, category, description, amount.")
+    label_help.pack(pady=5)
+
+    grid_frame = tk.Frame(bulk_window)
+    grid_frame.pack(fill=tk.BOTH, expand=True, padx=10)
+
+    columns = entry_columns + ["status"]
+    grid = ttk.Treeview(grid_frame, columns=columns, show="headings", selectmode="extended")
+    for col, text, width in zip(columns, ["Date", "Category", "Description", "Amount (€)", "Status"],
+                                [100, 120, 200, 90, 200]):
+        grid.heading(col, text=text)
+        grid.column(col, width=width, anchor="w")
+    grid.tag_configure("error", background="#f8d0d0")
+    grid.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+    scrollbar = ttk.Scrollbar(grid_frame, orient=tk.VERTICAL, command=grid.yview)
+    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+    grid.configure(yscrollcommand=scrollbar.set)
+
+    label_count = tk.Label(bulk_window, text="")
+    label_count.pack()
+
+    def update_count():
+        label_count.config(text=f"{len(grid.get_children(''))} rows")
+
+    def add_rows(rows):
+        """Append rows (lists of 4 strings) at the end of the grid"""
+        for row in rows:
+            grid.insert("", "end", values=list(row) + [""])
+        update_count()
+
+    def add_empty_rows(n=10):
+        # New rows get the date of the last row (receipts are often entered day by day)
+        items = grid.get_children("")
+        last_date = grid.set(items[-1], "date") if items else datetime.date.today().strftime("%Y-%m-%d")
+        add_rows([[last_date, "", "", ""]] * n)
+
+    ######## Cell editor ########
+
+    editor = {"widget": None, "item": None, "column": None}
+
+    def close_editor(save=True):
+        widget = editor["widget"]
+        if widget is None:
+            return
+        if save:
+            grid.set(editor["item"], editor["column"], widget.get().strip())
+            grid.set(editor["item"], "status", "")
+            grid.item(editor["item"], tags=())
+        widget.destroy()
+        editor["widget"] = None
+
+    def edit_cell(item, column):
+        """Show an entry (a drop-down list for the category) over a cell"""
+        close_editor()
+        grid.see(item)
+        grid.update_idletasks()
+        box = grid.bbox(item, column)
+        if not box:
+            return
+        x, y, width, height = box
+        if column == "category":
+            widget = ttk.Combobox(grid, values=category_ls)
+        else:
+            widget = tk.Entry(grid)
+        widget.insert(0, grid.set(item, column))
+        widget.place(x=x, y=y, width=width, height=height)
+        widget.focus_set()
+        if isinstance(widget, tk.Entry):
+            widget.select_range(0, tk.END)
+        editor.update(widget=widget, item=item, column=column)
+
+        def move(rows, cols):
+            """Save the cell and edit the next one (a new row is added after the last one)"""
+            close_editor()
+            items = list(grid.get_children(""))
+            row, col = items.index(item) + rows, entry_columns.index(column) + cols
+            if col >= len(entry_columns):
+                row, col = row + 1, 0
+            if row >= len(items):
+                add_empty_rows(1)
+                items = list(grid.get_children(""))
+            edit_cell(items[row], entry_columns[col])
+            return "break"
+
+        widget.bind("<Return>", lambda event: move(1, 0))
+        widget.bind("<Tab>", lambda event: move(0, 1))
+        widget.bind("<Escape>", lambda event: close_editor(save=False))
+        if isinstance(widget, tk.Entry):
+            # Clicking elsewhere saves the cell (not for the drop-down list, its popup takes the focus)
+            widget.bind("<FocusOut>", lambda event: close_editor() if editor["widget"] is widget else None)
+
+    def on_double_click(event):
+        item, column = grid.identify_row(event.y), grid.identify_column(event.x)
+        if item and column:
+            name = columns[int(column[1:]) - 1]
+            if name in entry_columns:
+                edit_cell(item, name)
+
+    def on_return(event):
+        selection = grid.selection()
+        if selection:
+            edit_cell(selection[0], "date")
+
+    grid.bind("<Double-1>", on_double_click)
+    grid.bind("<Return>", on_return)
+
+    ######## Paste / delete ########
+
+    def paste(event=None):
+        """Add the rows of the clipboard (tab separated from a spreadsheet, or CSV)"""
+        if editor["widget"] is not None:
+            return None  # pasting into the cell being edited
+        try:
+            text = bulk_window.clipboard_get()
+        except tk.TclError:
+            messagebox.showinfo("Paste", "The clipboard is empty.", parent=bulk_window)
+            return "break"
+        rows = split_pasted_rows(text)
+        # The empty rows at the end of the grid are replaced by the pasted ones
+        for item in reversed(grid.get_children("")):
+            if any(grid.set(item, col) for col in ("category", "description", "amount")):
+                break
+            grid.delete(item)
+        add_rows(rows)
+        return "break"
+
+    def delete_rows():
+        close_editor(save=False)
+        grid.delete(*grid.selection())
+        update_count()
+
+    ######## Validate / add ########
+
+    def validate():
+        """Check all the non-empty rows at once, mark the invalid ones. Return (typed rows, number of errors)"""
+        close_editor()
+        items = [item for item in grid.get_children("")
+                 if any(grid.set(item, col) for col in ("category", "description", "amount"))]
+        raw = pd.DataFrame([grid.item(item, "values")[:len(entry_columns)] for item in items],
+                           columns=entry_columns, dtype=object)
+        with span("bulk.validate"):
+            typed, errors = parse_entries(raw)
+
+        invalid = errors.to_numpy() != ""
+        for item, error in zip(items, errors.tolist()):
+            grid.set(item, "status", error or "ok")
+            grid.item(item, tags=("error",) if error else ())
+        if invalid.any():
+            grid.see(items[int(np.argmax(invalid))])
+        return typed, int(invalid.sum())
+
+    def submit_rows():
+        typed, n_errors = validate()
+        if len(typed) == 0:
+            messagebox.showerror("Error", "No expense to add.", parent=bulk_window)
+            return
+        if n_errors:
+            messagebox.showerror("Error", f"{n_errors} row(s) are not valid, see the status column.",
+                                 parent=bulk_window)
+            return
+
+        # One batch: a single append to the buffer (one notification, one dtype conversion at the next view)
+        with span("bulk.add"):
+            ledger.extend(typed)
+        messagebox.showinfo("Bulk add", f"{len(typed)} expenses added.", parent=bulk_window)
+        bulk_window.destroy()
+
+    buttons = tk.Frame(bulk_window)
+    buttons.pack(pady=5)
+    tk.Button(buttons, text="Add 10 rows", command=add_empty_rows).grid(row=0, column=0, padx=5)
+    tk.Button(buttons, text="Paste (Ctrl+V)", command=paste).grid(row=0, column=1, padx=5)
+    tk.Button(buttons, text="Delete selected rows", command=delete_rows).grid(row=0, column=2, padx=5)
+    tk.Button(buttons, text="Validate", command=validate).grid(row=0, column=3, padx=5)
+    tk.Button(buttons, text="Add expenses", command=submit_rows).grid(row=0, column=4, padx=5)
+
+    bulk_window.bind("<Control-v>", paste)
+    bulk_window.bind("<Control-V>", paste)
+    grid.bind("<Delete>", lambda event: delete_rows())
+
+    add_empty_rows()
+
+
 def clear_data():
     """Clear dataframe"""
-    global df
-    df = df.iloc[0:0]
+    ledger.clear()
 
 
 def delete_entry():
     """Function to delete an entry based on date input"""
-    global df
-
-    if len(df) == 0:
+    if len(ledger) == 0:
         messagebox.showwarning("Error", "No data to delete!")
         return
 
     #Initiate the sub window
     delete_window = tk.Toplevel(root)
     delete_window.title("Delete Entry")
-    delete_window.geometry("400x300")
+    delete_window.geometry("650x550")
+
+    #Search bar: description, category and amount range
+    search_frame = tk.Frame(delete_window)
+    search_frame.pack(pady=5)
+
+    tk.Label(search_frame, text="Description").grid(row=0, column=0)
+    search_entry = tk.Entry(search_frame, width=20)
+    search_entry.grid(row=0, column=1)
+
+    contains_var = tk.BooleanVar(value=False)
+    tk.Checkbutton(search_frame, text="Contains", variable=contains_var,
+                   command=lambda: schedule_search()).grid(row=0, column=2)
 
-    #Showing current entries to the user
-    entries_text = tk.Text(delete_window, height=10, width=45)
-    entries_text.pack(pady=10)
+    tk.Label(search_frame, text="Category").grid(row=0, column=3)
+    search_category = ttk.Combobox(search_frame, values=["All"] + category_ls, state="readonly", width=14)
+    search_category.set("All")
+    search_category.grid(row=0, column=4)
 
-    #Displaying entries
-    entries_text.insert(tk.END, "Current Entries:\n\n")
-    for idx, row in df.iterrows():
-        entry_str = f"{row['date'].strftime('%Y-%m-%d')}: {row['description']} (€{row['amount']:.2f})\n"
-        entries_text.insert(tk.END, entry_str)
+    tk.Label(search_frame, text="Amount from").grid(row=1, column=0)
+    search_min = tk.Entry(search_frame, width=10)
+    search_min.grid(row=1, column=1, sticky="w")
+    tk.Label(search_frame, text="to").grid(row=1, column=2)
+    search_max = tk.Entry(search_frame, width=10)
+    search_max.grid(row=1, column=3, sticky="w")
+
+    #Showing current entries to the user (only the visible rows are rendered)
+    list_frame = tk.Frame(delete_window)
+    list_frame.pack(fill=tk.BOTH, expand=True, padx=10)
+
+    columns = ["date", "category", "description", "amount"]
+    viewer = DataViewer(list_frame, ledger.search(), columns)
+    for col, text in zip(columns, ["Date", "Category", "Description", "Amount (€)"]):
+        viewer.treeview.heading(col, text=text)
+        viewer.treeview.column(col, width=140, anchor="center")
+    viewer.treeview.tag_configure('center', anchor='center')
 
-    entries_text.config(state='disabled')  # Make text read-only
+    label_found = tk.Label(delete_window, text="")
+    label_found.pack()
+
+    pending_search = None  # id of the scheduled search (after)
+
+    def run_search():
+        """Filter the list with the criteria of the search bar"""
+        nonlocal pending_search
+        pending_search = None
+
+        def parse_amount(entry):
+            text = entry.get().strip().replace(",", ".")
+            return float(text) if text else None
+
+        try:
+            min_amount, max_amount = parse_amount(search_min), parse_amount(search_max)
+        except ValueError:
+            label_found.config(text="Amount range must be numbers")
+            return
+
+        category = search_category.get()
+        with span("ledger.search"):
+            view = ledger.search(search_entry.get(), None if category == "All" else category,
+                                 min_amount, max_amount, contains=contains_var.get())
+        viewer.set_view(view)
+        label_found.config(text=f"{len(view)} entries")
+
+    def schedule_search(event=None):
+        """Incremental search: wait for a short pause in the typing before searching"""
+        nonlocal pending_search
+        if pending_search is not None:
+            delete_window.after_cancel(pending_search)
+        pending_search = delete_window.after(200, run_search)
+
+    for widget in (search_entry, search_min, search_max):
+        widget.bind("<KeyRelease>", schedule_search)
+    search_category.bind("<<ComboboxSelected>>", schedule_search)
+
+    def delete_selected():
+        """Delete the rows selected in the list"""
+        ids = viewer.selected_ids()
+        if len(ids) == 0:
+            messagebox.showerror("Error", "Please select an entry in the list.")
+            return
+        if messagebox.askyesno("Confirm", f"Delete {len(ids)} selected entr{'y' if len(ids) == 1 else 'ies'}?"):
+            try:
+                with span("ledger.delete"):
+                    ledger.delete(ids)
+            except KeyError:
+                messagebox.showerror("Error", "This entry was already deleted.")
+            run_search()
+
+    tk.Button(delete_window, text="Delete Selected", command=delete_selected).pack(pady=5)
+    run_search()
 
     # User can input the date to search for the expense to delete
-    date_label = tk.Label(delete_window, text="Enter date to delete (YYYY-MM-DD):")
-    date_label.pack(pady=5)
+    date_label = tk.Label(delete_window, text="Or enter date to delete (YYYY-MM-DD):")
+    date_label.pack()
 
     date_entry = tk.Entry(delete_window)
-    date_entry.pack(pady=5)
+    date_entry.pack()
 
     def try_delete():
         """Search for the corresponding expense to delete and manage records with the same date"""
@@ -281,8 +696,9 @@ def delete_entry():
             #convert input to datetime
             delete_date = pd.to_datetime(date_str)
 
-            #Find matches
-            matches = df[df['date'].dt.date == delete_date.date()]
+            #Find matches (binary search in the date index, matches are indexed by row id)
+            with span("ledger.find_date"):
+                matches = ledger.find_date(delete_date)
 
             if len(matches) == 0:
                 messagebox.showerror("Error", "No entries found for this date!")
@@ -319,12 +735,12 @@ def delete_entry():
                             messagebox.showerror("Error",f"Please enter a number between 1 and {len(matches)}")
                             return
 
-                        #Converting selection to index
-                        idx_to_delete = matches.index[selection - 1]
+                        #Converting selection to row id
+                        id_to_delete = matches.index[selection - 1]
 
                         #Deleting the entry
-                        df.drop(idx_to_delete, inplace=True)
-                        df.reset_index(drop=True, inplace=True)
+                        with span("ledger.delete"):
+                            ledger.delete(id_to_delete)
                         messagebox.showinfo("Success", "Entry deleted!")
                         select_window.destroy()
                         delete_window.destroy()
@@ -337,8 +753,8 @@ def delete_entry():
             else:
                 #Single entry - delete directly
                 if messagebox.askyesno("Confirm", "Delete this entry?"):
-                    df.drop(matches.index[0], inplace=True)
-                    df.reset_index(drop=True, inplace=True)
+                    with span("ledger.delete"):
+                        ledger.delete(matches.index[0])
                     messagebox.showinfo("Success", "Entry deleted!")
                     delete_window.destroy()
 
@@ -349,33 +765,131 @@ def delete_entry():
 
     #Adding delete button
     delete_button = tk.Button(delete_window, text="Delete", command=try_delete)
-    delete_button.pack(pady=10)
+    delete_button.pack(pady=5)
     
 
 ######################## SHOW DATAFRAME  ########################
 
 
+class DataViewer:
+    """
+    Treeview showing the rows of a FrameView (or QueryView) without inserting all of them.
+    Only the visible rows (+ a small overscan) exist as Treeview items. When the
+    user scrolls, these items are refilled with the matching slice of the dataframe.
+    """
+    overscan = 5  # extra rows rendered below the visible ones
+
+    def __init__(self, master, view, columns):
+        self.view = view
+        self.first = 0  # position (in the view) of the first visible row
+        self.visible = 20
+        self.positions = {}  # Treeview item -> position in the view
+        self.selected = set()  # selected positions in the view (also the ones scrolled away)
+
+        self.treeview = ttk.Treeview(master, columns=columns, show="headings")
+        self.treeview.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        # The scrollbar is driven by us (position in the dataframe), not by the Treeview
+        self.scrollbar = ttk.Scrollbar(master, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.row_height = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+
+        self.treeview.bind("<<TreeviewSelect>>", self.on_select)
+        self.treeview.bind("<Configure>", self.on_resize)
+        self.treeview.bind("<MouseWheel>", lambda event: self.scroll_by(-3 if event.delta > 0 else 3))
+        self.treeview.bind("<Button-4>", lambda event: self.scroll_by(-3))  # Linux wheel up
+        self.treeview.bind("<Button-5>", lambda event: self.scroll_by(3))  # Linux wheel down
+        self.treeview.bind("<Prior>", lambda event: self.scroll_by(-self.visible))
+        self.treeview.bind("<Next>", lambda event: self.scroll_by(self.visible))
+        self.treeview.bind("<Home>", lambda event: self.scroll_to(0))
+        self.treeview.bind("<End>", lambda event: self.scroll_to(len(self.view)))
+
+        self.render()
+
+    def set_view(self, view):
+        """Show another view (sorted, filtered...) from the top"""
+        self.view = view
+        self.first = 0
+        self.selected = set()
+        self.render()
+
+    def on_select(self, event):
+        """Remember the selection by row position, as the items are reused when scrolling"""
+        rendered = set(self.positions.values())
+        chosen = {self.positions[item] for item in self.treeview.selection() if item in self.positions}
+        self.selected = (self.selected - rendered) | chosen
+
+    def selected_ids(self):
+        """Ledger ids of the selected rows"""
+        return self.view.row_ids(sorted(self.selected))
+
+    def scroll_to(self, first):
+        """Move the first visible row, clamped to the data"""
+        self.first = max(0, min(first, len(self.view) - self.visible))
+        self.render()
+        return "break"  # the Treeview itself must not scroll
+
+    def scroll_by(self, n_rows):
+        return self.scroll_to(self.first + n_rows)
+
+    def on_scrollbar(self, action, amount, unit=None):
+        """Handle drag ("moveto") and arrows / trough clicks ("scroll") of the scrollbar"""
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * len(self.view)))
+        elif unit == "pages":
+            self.scroll_by(int(amount) * self.visible)
+        else:
+            self.scroll_by(int(amount))
+
+    def on_resize(self, event):
+        """Adapt the number of rendered rows to the height of the window"""
+        visible = max(1, (event.height - self.row_height) // self.row_height)
+        if visible != self.visible:
+            self.visible = visible
+            self.scroll_to(self.first)
+
+    def render(self):
+        """Create/update the Treeview items for the visible slice only"""
+        with span("viewer.render"):
+            self._render()
+
+    def _render(self):
+        total = len(self.view)
+        rows = self.view.rows(self.first, self.first + self.visible + self.overscan)
+        values = format_rows(rows)
+
+        # Reuse the existing items, add or remove only the difference
+        items = list(self.treeview.get_children(""))
+        while len(items) < len(values):
+            items.append(self.treeview.insert("", "end", tags=('center',)))
+        if len(items) > len(values):
+            self.treeview.delete(*items[len(values):])
+            items = items[:len(values)]
+
+        self.positions = {}
+        for offset, (item, row_values) in enumerate(zip(items, values)):
+            self.treeview.item(item, values=row_values)
+            self.positions[item] = self.first + offset
+
+        # The selection follows the rows, not the reused items
+        self.treeview.selection_set([item for item, position in self.positions.items() if position in self.selected])
+
+        if total:
+            self.scrollbar.set(self.first / total, min(1.0, (self.first + self.visible) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+
 # Show the dataframe in the UI
 def show_expense():
     """how the dataframe in a window"""
     
     def sort_treeview(col, reverse):
         """Sort the Treeview based on the clicked column."""
-        data = []
-        for child in treeview.get_children(''):
-            row_data = treeview.item(child)['values']
-            if col == "amount":
-                value = float(row_data[3][1:])  # Remove the € symbol and convert to float
-            else:
-                value = row_data[columns.index(col)]
-            data.append((value, child))
-
-        # Perform sorting
-        data.sort(reverse=reverse)
-
-        # Rearrange items in sorted order
-        for index, (_, item) in enumerate(data):
-            treeview.move(item, '', index)
+        # Sort on the column (real dtype, cached by the ledger, or ORDER BY for a database), only the visible rows are re-rendered
+        with span("viewer.sort"):
+            viewer.set_view(ledger.view(col, reverse))
 
         # Toggle the sort order for future clicks
         treeview.heading(col, command=lambda: sort_treeview(col, not reverse))
@@ -384,18 +898,12 @@ def show_expense():
     show_expense_wondow.title("Data viewer")
     show_expense_wondow.geometry("600x500")
 
-    treeview = ttk.Treeview(show_expense_wondow)
-    treeview.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-
-    scrollbar = ttk.Scrollbar(show_expense_wondow, orient=tk.VERTICAL, command=treeview.yview)
-    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-
-    treeview.configure(yscrollcommand=scrollbar.set)
-
     # Define column headers
     columns = ["date", "category", "description", "amount"]
-    treeview["columns"] = columns
-    treeview["show"] = "headings"
+
+    # Sort data by date initially. Only the visible rows are added to the Treeview, with formatted data
+    viewer = DataViewer(show_expense_wondow, ledger.view("date"), columns)
+    treeview = viewer.treeview
 
     # Set column headers and alignment
     treeview.heading("date", text="Date", command=lambda: sort_treeview("date", False))
@@ -409,31 +917,29 @@ def show_expense():
     # Create a tag for center alignment
     treeview.tag_configure('center', anchor='center')
 
-    # Sort data by date initially
-    sorted_df = df.sort_values(by="date")
-
-    # Add rows to Treeview with formatted data
-    for _, row in sorted_df.iterrows():
-        formatted_date = row["date"].strftime("%Y-%m-%d")  # Format date without time
-        formatted_amount = f"€{row['amount']:.2f}"  # Add euro symbol and format to 2 decimals
-        treeview.insert(
-            "", "end", values=(formatted_date, row["category"], row["description"], formatted_amount), tags=('center',)
-        )
-
 
 ######################## UI HANDLING FUNCTION  ########################
 
 
-def update_kpi_frame(kpi_frame, filtered_df):
-    """Update the 3 KPIs in the (top side of) dashboard (KPI frame)."""
+def update_kpi_frame(kpi_frame, summary):
+    """
+    Update the 3 KPIs in the (top side of) dashboard (KPI frame) from the PeriodSummary of the period.
+    Without summary (still computing) a placeholder is shown.
+    """
     # Clear existing widgets in the KPI frame
     for widget in kpi_frame.winfo_children():
         widget.destroy()
 
-    # Calculate KPIs
-    total_value = filtered_df['amount'].sum()
-    avg_monthly_expenses = filtered_df.groupby(filtered_df['date'].dt.to_period('M'))['amount'].sum().mean()
-    highest_expense_category = filtered_df.groupby('category')['amount'].sum().idxmax()
+    if summary is None:
+        kpi_computing = tk.Label(kpi_frame, text="Computing...", font=("Arial", 14), bg="white", anchor="center")
+        kpi_computing.grid(row=0, column=0, columnspan=3, padx=20, pady=2)
+        return
+
+    # Calculate KPIs (from the monthly/category rollup, not from the raw rows)
+    kpis = summary.kpis()
+    total_value = kpis["total_expenses"]
+    avg_monthly_expenses = kpis["average_monthly_expense"]
+    highest_expense_category = kpis["highest_spending_category"]
 
     # Total amount spend (on the filtered date period)
     kpi_total = tk.Label(
@@ -472,162 +978,9 @@ def update_kpi_frame(kpi_frame, filtered_df):
 
 
 
-def create_pie_chart(chart_frame, filtered_df):
-    """Create a pie chart showing the expense distribution by category given the 
-    filtered date period set by user
-    """
-    # Clear existing widgets in the chart frame
-    for widget in chart_frame.winfo_children():
-        widget.destroy()
-
-    # Create the chart
-    category_totals = filtered_df.groupby('category')['amount'].sum()
-    category_totals = category_totals[category_totals > 0]
-    
-    fig, ax = plt.subplots(figsize=(9, 6))
-    wedges, texts, autotexts = ax.pie(
-        category_totals,
-        labels = category_totals.index,
-        autopct = '%1.1f%%',
-        startangle = 90,
-        wedgeprops= {'width': 0.25}, # control the donut size
-        colors = plt.cm.Dark2.colors,
-        pctdistance = 0.88, # put label exactly in the graph
-        labeldistance = 1.10  # outside of graph
-    )
-    
-    plt.setp(autotexts, size=10, weight="bold", color='white') # label (percentage)
-    plt.setp(texts, size=10, weight="bold", color = 'black') # label (name of the category)
-    
-    ax.legend(frameon=False, # no outline (box)
-              bbox_to_anchor = (0, 1),
-              labelspacing = 0.3, handlelength = 1.5)
-    
-    
-    ax.set_title('Expense Distribution by Category', fontsize=14, weight = 'bold', loc = 'center' )
-    plt.tight_layout()
-
-    #Draw the pie_chart in the dashboard
-    canvas_pie = FigureCanvasTkAgg(fig, master=chart_frame)
-    canvas_pie.draw()
-    canvas_pie.get_tk_widget().grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
-
-
-def create_bar_chart(chart_frame, filtered_df, selected_year):
-    """
-    Create a bar chart showing monthly expenses
-    The bar chart has the specificity to be set to a 1 year period  with 12 bars showing each months
-    It is the default barchart that appear in the dashboard without pre-selection
-    """
-    # Summarize expenses by month
-    monthly_totals = filtered_df.groupby(filtered_df['date'].dt.to_period('M'))['amount'].sum()
-
-    # Ensure all months are included for the selected year
-    all_months = pd.period_range(start=f"{selected_year}-01", end=f"{selected_year}-12", freq='M')
-    monthly_totals = monthly_totals.reindex(all_months, fill_value=0)
-
-    # Create a bar chart
-    fig_barchart, ax_barchart = plt.subplots(figsize=(8.5, 6))  
-    bars = ax_barchart.bar(
-        [month.strftime('%b') for month in all_months],
-        monthly_totals.values,
-        color='#4682B4',
-        edgecolor='black',
-        width = 0.7
-    )
-
-    # Annotate each bar with the value
-    for bar in bars:
-        height = bar.get_height()
-        ax_barchart.annotate(f'{height:.2f} €',  # Show values with two decimals
-                             xy=(bar.get_x() + bar.get_width() / 2, height),
-                             xytext=(0, 5),  # Offset for readability
-                             textcoords="offset points",
-                             ha='center', va='bottom', fontsize=10)
-
-
-    # Set chart titles and labels
-    ax_barchart.set_title('Total Expense by Month', fontsize=16, pad=20,  weight = 'bold', loc = 'center')
-    ax_barchart.set_xlabel('Month', fontsize=12, labelpad=10, weight = 'bold', loc = 'center')  # Label padding
-    ax_barchart.set_ylabel('Amount (€)', fontsize=12, labelpad=10,  weight = 'bold', loc = 'center')
-    
-    # Add top buffer
-    ax_barchart.set_ylim(0, monthly_totals.max() * 1.1)
-
-    # Rotate x-axis labels for better readability
-    ax_barchart.tick_params(axis='x', labelsize=11)
-    ax_barchart.tick_params(axis='y', labelsize=11) 
-    
-
-    # Ensure layout adjusts dynamically
-    fig_barchart.subplots_adjust(left=0.1, right=0.95, top=0.9, bottom=0.2)  # Explicit adjustments
-    plt.tight_layout()
-
-    # Render chart in the Tkinter canvas
-    canvas_barchart = FigureCanvasTkAgg(fig_barchart, master=chart_frame)
-    canvas_barchart.draw()
-    canvas_barchart.get_tk_widget().grid(row=0, column=1, padx=10, pady=10, sticky="nsew")
-
-
-def create_bar_chart_2(chart_frame, filtered_df):
-    """
-    Create the same bar chart but this one is not set on a 1 year period and is more flexible
-    It is only called when the time period is selected via the calendar in the dashboard 
-    
-    """
-    # Convert the 'date' column to datetime
-    filtered_df.loc[:, 'date'] = pd.to_datetime(filtered_df['date'])
-    # Create a new column for year and month in 'YYMM' format
-    filtered_df.loc[:, 'year_month'] = filtered_df['date'].dt.strftime('%b%y')
-    
-    # Group by 'year_month' and sum the 'amount'
-    spending_by_month = filtered_df.groupby('year_month')['amount'].sum()
-    # Sort the data by the datetime order of the 'date' column
-    spending_by_month = spending_by_month[filtered_df.groupby('year_month')['date'].min().sort_values().index]
-
-
-    # Create a bar chart
-    fig_barchart, ax_barchart = plt.subplots(figsize=(8.5, 6))  
-    
-    # Plot the bars
-    bars = ax_barchart.bar(
-        spending_by_month.index,  # x-axis: months in 'MMM. YYYY' format
-        spending_by_month.values,  # y-axis: total spending
-        color='#4682B4',
-        edgecolor='black',
-        width=0.7
-    )
-    
-    # Annotate each bar with its value
-    for bar in bars:
-        height = bar.get_height()
-        ax_barchart.annotate(f'{height:.2f} €',  # Show values with two decimals
-                             xy=(bar.get_x() + bar.get_width() / 2, height),
-                             xytext=(0, 5),  # Offset for readability
-                             textcoords="offset points",
-                             ha='center', va='bottom', fontsize=10)
-    
-    # Adding title and labels
-    ax_barchart.set_title('Total Expense by Month & Year', fontsize=16, pad=20, weight='bold', loc='center')
-    ax_barchart.set_xlabel('Month & Year', fontsize=12, labelpad=10, weight='bold', loc='center')
-    ax_barchart.set_ylabel('Amount (€)', fontsize=12, labelpad=10, weight='bold', loc='center')
-    
-    # Add top buffer
-    ax_barchart.set_ylim(0, spending_by_month.max() * 1.1)
-    
-    # Rotate x-axis labels for better readability
-    ax_barchart.tick_params(axis='x', labelsize=11)
-    ax_barchart.tick_params(axis='y', labelsize=11) 
-
-    # Ensure layout adjusts dynamically
-    fig_barchart.subplots_adjust(left=0.1, right=0.95, top=0.9, bottom=0.2)  # Explicit adjustments
-    plt.tight_layout()
-
-    # Render chart in the Tkinter canvas
-    canvas_barchart = FigureCanvasTkAgg(fig_barchart, master=chart_frame)
-    canvas_barchart.draw()
-    canvas_barchart.get_tk_widget().grid(row=0, column=1, padx=10, pady=10, sticky="nsew")
-    
+# Worker threads of the dashboard: the summaries and the Agg rasterization of the charts
+# run there so that the app does not freeze on large ledgers
+dashboard_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="dashboard")
 
 
 def show_dashboard():
@@ -636,16 +989,147 @@ def show_dashboard():
     It will call some function from above code to create the chart & the metrics
     """
     # Throw back an error if no data to display
-    if len(df) == 0:
+    if len(ledger) == 0:
         messagebox.showerror("Error", "No data to show.")
         return
+
+    # matplotlib is only loaded when the first dashboard is opened
+    from expense_canvas import DashboardCanvas
+    from expense_charts import AnalyticsCharts, DashboardCharts
         
     show_dashboard_window = tk.Toplevel(root)
     show_dashboard_window.title("Dashboard")
     show_dashboard_window.geometry("1500x750")
     
-    # It serves as a temporary dataframe for the detail window
-    df_for_detail = df
+    # Summary of the selected period, it is also used by the detail window
+    summary_for_detail = None
+
+    # Only the last requested period is shown, the older requests are dropped
+    request = {"id": 0, "future": None, "time": 0.0}
+
+    # Live updates: the ledger changes not shown yet, as (ledger version, event, rows),
+    # the period shown (arguments of refresh), the ledger version of its summary and the request shown
+    live = {"changes": [], "after": None, "period": None, "version": -1, "shown": None}
+
+    def refresh(start, end, update_bars, period_text, summary=None, version=None):
+        """
+        Compute the summary of the period and redraw the charts in a worker thread,
+        the result is shown by show_result() in the Tk loop.
+        A summary already updated with the last ledger changes (live update) is only drawn.
+        """
+        nonlocal summary_for_detail
+        request["id"] += 1
+        request_id = request["id"]
+        if request["future"] is not None:
+            request["future"].cancel()  # never runs if not started yet
+        if summary is None:
+            summary_for_detail = None  # the summary of the period shown before is not updated anymore
+        live["period"] = (start, end, update_bars, period_text)
+
+        # Placeholders while computing (a live update keeps the current KPIs and charts until it is drawn)
+        if summary is None:
+            update_kpi_frame(kpi_frame, None)
+            label_computing.place(relx=0.5, rely=0.5, anchor="center")
+            label_computing.lift()
+        label_show_period.config(text=period_text)
+
+        def compute():
+            """Runs in the worker thread: no Tk call in here. Returns (summary, ledger version)"""
+            if summary is None:
+                # The changes made while computing have a newer version: apply_changes() adds them
+                with span("dashboard.summary"):
+                    period_summary, period_version = ledger.versioned_summary(start, end)
+            else:
+                period_summary, period_version = summary, version
+            with span("dashboard.kpis"):
+                period_summary.kpis()  # compute the KPIs here too
+            with charts.lock:
+                if request_id != request["id"]:
+                    return None  # the user already chose another period
+                with span("dashboard.pie"):
+                    charts.update_pie(period_summary, draw=False)
+                with span("dashboard.bars"):
+                    update_bars(period_summary)
+                with span("dashboard.render"):
+                    charts.render()
+            return period_summary, period_version
+
+        future = dashboard_pool.submit(expense_profiling.profile_call, compute)
+        request["future"] = future
+        request["time"] = time.perf_counter()
+        show_dashboard_window.after(50, show_result, request_id, future)
+
+        refresh_analytics()
+
+    def show_result(request_id, future):
+        """Poll the worker from the Tk loop, then show its KPIs and the charts it rendered"""
+        if not show_dashboard_window.winfo_exists() or request_id != request["id"]:
+            return  # window closed, or replaced by a newer request
+        if not future.done():
+            show_dashboard_window.after(50, show_result, request_id, future)
+            return
+
+        try:
+            summary, version = future.result()
+        except Exception as e:
+            label_computing.config(text="Error")
+            messagebox.showerror("Error", f"Failed to compute the dashboard: {e}")
+            return
+
+        nonlocal summary_for_detail
+        summary_for_detail = summary
+        live["version"] = version
+        live["shown"] = request_id
+        with span("dashboard.kpi_frame"):
+            update_kpi_frame(kpi_frame, summary)
+        label_computing.place_forget()
+        with span("dashboard.blit"), charts.lock:
+            canvas_pie.blit()
+            canvas_barchart.blit()
+        if expense_profiling.enabled:
+            # From the click to the charts on screen (includes the polling delay)
+            expense_profiling.record("dashboard.total", time.perf_counter() - request["time"])
+
+        # Changes made while it was computing
+        schedule_changes()
+
+    def on_ledger_change(event, rows):
+        """
+        Ledger listener. The app changes the ledger in the Tk thread only, so the changes
+        are kept and applied together a moment later: fast data entry gives one redraw, not one per row
+        """
+        live["changes"].append((ledger.version, event, rows))
+        schedule_changes()
+
+    def schedule_changes():
+        if live["after"] is None and live["changes"]:
+            live["after"] = show_dashboard_window.after(250, apply_changes)
+
+    def apply_changes():
+        """Add the changed rows to the summary shown (no new aggregation of the ledger), then redraw"""
+        live["after"] = None
+        if not show_dashboard_window.winfo_exists():
+            return
+        if summary_for_detail is None or live["shown"] != request["id"]:
+            return  # applied by show_result() once the current refresh is shown
+
+        changes, live["changes"] = live["changes"], []
+        start, end, update_bars, period_text = live["period"]
+        if any(event == "reset" for _, event, _ in changes):
+            # File loaded / cleared, or another ledger (its versions start again): summary of the period again
+            year_combobox.config(values=[str(year) for year in ledger.years()])
+            refresh(start, end, update_bars, period_text)
+            return
+
+        # The changes already counted in the summary shown are dropped
+        changes = [change for change in changes if change[0] > live["version"]]
+        if not changes:
+            return
+
+        year_combobox.config(values=[str(year) for year in ledger.years()])
+        with span("dashboard.live update"):
+            summary = summary_for_detail.updated([(event, rows) for _, event, rows in changes], start, end)
+        refresh(start, end, update_bars, period_text, summary, changes[-1][0])
 
 
     def open_calendar():
@@ -655,6 +1139,8 @@ def show_dashboard():
         open_calendar_window.geometry("800x350")
         
         # Add calendar
+        from tkcalendar import Calendar  # loaded on first use
+
         today = datetime.date.today() # Initiate today to be the standard date
         
         def update_graph():
@@ -667,18 +1153,15 @@ def show_dashboard():
                 messagebox.showerror("Error", "Please select a valid period.")
                 return
             
-            filtered_df = df[(df['date'] >= start_date) & (df['date'] <= end_date)]
-            
-            # recreate all the graph on the dashboard with the new filtered data
-            update_kpi_frame(kpi_frame, filtered_df)
-            create_pie_chart(chart_frame, filtered_df)
-            create_bar_chart_2(chart_frame, filtered_df)
-            
+            # update all the graph on the dashboard with the new filtered data (in the background)
             value_date_text = f"From {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}"
-            label_show_period.config(text = f"{value_date_text}")
-            
-            nonlocal df_for_detail
-            df_for_detail = filtered_df
+            # Days, weeks, months, quarters or years: as many bars as fit the width of the chart
+            max_bars = charts.max_bars()
+            end_of_day = end_date + pd.Timedelta(days=1) - pd.Timedelta(1, "ns")
+            refresh(start_date, end_of_day,
+                    lambda summary: charts.update_range_bars(
+                        summary, draw=False, bars=ledger.period_bars(start_date, end_of_day, max_bars)),
+                    value_date_text)
             
             open_calendar_window.destroy()  # Close the calendar window  
         
@@ -714,22 +1197,18 @@ def show_dashboard():
     def on_year_selected(selected_year):
         """Update when dropdrown for Year Filter is changed"""
         
-        filtered_df = df[df['date'].dt.year == int(selected_year)]
-        
-        # Recreate the KPI + dashboard
-        update_kpi_frame(kpi_frame, filtered_df)
-        create_pie_chart(chart_frame, filtered_df)
-        create_bar_chart(chart_frame, filtered_df, selected_year)
+        # Whole year: only full months, read from the rollup
+        year_start = pd.Timestamp(f"{selected_year}-01-01")
+        year_end = year_start + pd.DateOffset(years=1) - pd.Timedelta(1, "ns")
         
+        # Update the KPI + dashboard (in the background)
         value_date_text = f"From 01.01.{selected_year} to 31.12.{selected_year}"
-        label_show_period.config(text = f"{value_date_text}")
-        
-        nonlocal df_for_detail
-        df_for_detail = filtered_df
+        refresh(year_start, year_end,
+                lambda summary: charts.update_year_bars(summary, selected_year, draw=False), value_date_text)
 
     
     # Get list of year
-    available_years = sorted(df['date'].dt.year.unique().astype(str))
+    available_years = [str(year) for year in ledger.years()]
     year_label = tk.Label(show_dashboard_window, text="Select Year:", font=("Arial", 12))
     year_label.grid(row=0, column=0, padx=3, pady=5, sticky="w")
 
@@ -747,18 +1226,36 @@ def show_dashboard():
     kpi_frame = tk.Frame(show_dashboard_window, bg="white", relief="solid", bd=2)
     kpi_frame.grid(row=2, column=0, columnspan=2, sticky="nsew", padx=10, pady=(10, 5))
 
-    chart_frame = tk.Frame(show_dashboard_window)
-    chart_frame.grid(row=3, column=0, columnspan=2, sticky="nsew", padx=10, pady=10)
+    # Tabs of the charts: the overview (pie + bars) and the analytics panels
+    notebook = ttk.Notebook(show_dashboard_window)
+    notebook.grid(row=3, column=0, columnspan=2, sticky="nsew", padx=10, pady=10)
+
+    chart_frame = tk.Frame(notebook)
+    notebook.add(chart_frame, text="Overview")
+
+    # The figures are created once and updated in place when the period changes (see expense_charts.py)
+    charts = DashboardCharts()
+    canvas_pie = DashboardCanvas(charts.pie_figure, chart_frame, charts.lock)
+    canvas_pie.get_tk_widget().grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
+    canvas_barchart = DashboardCanvas(charts.bar_figure, chart_frame, charts.lock)
+    canvas_barchart.get_tk_widget().grid(row=0, column=1, padx=10, pady=10, sticky="nsew")
+
+    # Shown over the charts while the worker computes them
+    label_computing = tk.Label(chart_frame, text="Computing...", font=("Arial", 14), bg="white")
     
     # Add the additional info
     
     def open_detail():
         """Open a window showing the spending by category, orderer by highest spending"""
+        if summary_for_detail is None:
+            messagebox.showinfo("Dashboard", "The dashboard is still computing.")
+            return
+
         show_detail_window = tk.Toplevel(show_dashboard_window)
         show_detail_window.title("Dashboard")
         show_detail_window.geometry("400x500")
         
-        grouped_data = df_for_detail.groupby("category")["amount"].sum()
+        grouped_data = summary_for_detail.category_totals
         result = grouped_data.reindex(category_ls, fill_value=0)
         
         sorted_data = result.sort_values(ascending=False)
@@ -780,16 +1277,200 @@ def show_dashboard():
     button_detail = tk.Button(show_dashboard_window, text="Details", command=open_detail, width=20, height=1)
     button_detail.grid(row = 4, column = 0)
 
+    ######## Analytics panels ########
+
+    # Running total, rolling 30/90-day spending, month-over-month changes and the budget burn-down
+    # of the last month of the period. Computed and drawn in the worker like the charts, only while
+    # their tab is shown: they follow the period and the live updates of the dashboard.
+    from expense_analytics import ledger_analytics
+
+    analytics_frame = tk.Frame(notebook)
+    notebook.add(analytics_frame, text="Analytics")
+
+    analytics_charts = AnalyticsCharts()
+    canvas_analytics = DashboardCanvas(analytics_charts.figure, analytics_frame, analytics_charts.lock)
+    canvas_analytics.get_tk_widget().grid(row=0, column=0, rowspan=2, padx=5, pady=5, sticky="nsew")
+
+    controls = tk.Frame(analytics_frame)
+    controls.grid(row=0, column=1, padx=5, pady=5, sticky="nw")
+    tk.Label(controls, text="Monthly budget (€)\nempty: average of the 12 months before").grid(row=0, column=0, columnspan=2)
+    entry_budget = tk.Entry(controls, width=12)
+    entry_budget.grid(row=1, column=0, padx=5, pady=5)
+    entry_budget.bind("<Return>", lambda event: refresh_analytics())
+    tk.Button(controls, text="Update", command=lambda: refresh_analytics()).grid(row=1, column=1, padx=5, pady=5)
+    label_analytics = tk.Label(controls, text="", wraplength=320)
+    label_analytics.grid(row=2, column=0, columnspan=2, pady=5)
+
+    # Month-over-month changes of the last month of the period, per category
+    columns = ["category", "spent", "change", "percent"]
+    table = ttk.Treeview(analytics_frame, columns=columns, show="headings", height=12)
+    for col, text in zip(columns, ["Category", "Spent (€)", "Change (€)", "Change (%)"]):
+        table.heading(col, text=text)
+        table.column(col, width=80, anchor="center")
+    table.grid(row=1, column=1, padx=5, pady=5, sticky="n")
+
+    # Only the last request is shown, as in the dashboard. Stale: the period or the ledger changed
+    # while the tab was hidden
+    analytics_request = {"id": 0, "stale": True}
+
+    def refresh_analytics():
+        if notebook.select() != str(analytics_frame):
+            analytics_request["stale"] = True
+            return
+        analytics_request["stale"] = False
+        text = entry_budget.get().strip().replace(",", ".")
+        try:
+            budget = float(text) if text else None
+        except ValueError:
+            label_analytics.config(text="The budget must be a number")
+            return
+        start, end = live["period"][:2]
+        analytics_request["id"] += 1
+        request_id = analytics_request["id"]
+        label_analytics.config(text="Computing...")
+
+        def compute():
+            """Runs in the worker thread: no Tk call in here"""
+            with span("analytics.compute"):
+                analytics = ledger_analytics(ledger)  # follows the changes of the ledger
+                month_budget = budget
+                if month_budget is None:
+                    month_budget = analytics.default_budget(month_key(end.to_datetime64()))
+                changes = analytics.last_month_changes(start, end)
+                compared = analytics.last_month_label(start, end)
+            with analytics_charts.lock:
+                if request_id != analytics_request["id"]:
+                    return None
+                with span("analytics.charts"):
+                    analytics_charts.update(analytics, start, end, month_budget, draw=False)
+                    analytics_charts.render()
+            return changes, compared, month_budget
+
+        future = dashboard_pool.submit(expense_profiling.profile_call, compute)
+        analytics_frame.after(50, show_analytics, request_id, future)
+
+    def show_analytics(request_id, future):
+        """Poll the worker from the Tk loop, then show the table and the charts it rendered"""
+        if not analytics_frame.winfo_exists() or request_id != analytics_request["id"]:
+            return
+        if not future.done():
+            analytics_frame.after(50, show_analytics, request_id, future)
+            return
+        try:
+            changes, compared, month_budget = future.result()
+        except Exception as e:
+            label_analytics.config(text=f"Error: {e}")
+            return
+
+        table.delete(*table.get_children(""))
+        for category, row in changes.iterrows():
+            table.insert("", "end", values=[
+                category, f"{row['spent']:.2f}",
+                "-" if pd.isna(row["change"]) else f"{row['change']:+.2f}",
+                "-" if pd.isna(row["percent"]) else f"{row['percent']:+.1f}%"])
+        label_analytics.config(text=f"Budget: {month_budget:.2f} €\n{compared}")
+        with analytics_charts.lock:
+            canvas_analytics.blit()
+
+    def on_tab_changed(event):
+        if analytics_request["stale"] and live["period"] is not None:
+            refresh_analytics()
+
+    notebook.bind("<<NotebookTabChanged>>", on_tab_changed)
+
+    # Follow the changes of the ledger while the window is open (also after loading a database)
+    follow_ledger(on_ledger_change)
+
+    def on_destroy(event):
+        if event.widget is show_dashboard_window:
+            unfollow_ledger(on_ledger_change)
+
+    show_dashboard_window.bind("<Destroy>", on_destroy)
+
     # Initial update for the default year
     on_year_selected(available_years[0])
 
 
+######################## PROFILING  ########################
+
+
+def show_profiling():
+    """
+    Window with the latency percentiles of each timed stage (see expense_profiling.py),
+    refreshed every second, and the cProfile capture button
+    """
+    profiling_window = tk.Toplevel(root)
+    profiling_window.title("Profiling")
+    profiling_window.geometry("650x420")
+
+    controls = tk.Frame(profiling_window)
+    controls.pack(pady=5)
+
+    enabled_var = tk.BooleanVar(value=expense_profiling.enabled)
+    tk.Checkbutton(controls, text="Record timings", variable=enabled_var,
+                   command=lambda: expense_profiling.set_enabled(enabled_var.get())).grid(row=0, column=0, padx=5)
+
+    def reset():
+        expense_profiling.reset()
+        refresh_table()
+
+    tk.Button(controls, text="Reset", command=reset).grid(row=0, column=1, padx=5)
+
+    def toggle_capture():
+        """Start the cProfile capture, or stop it and show the slowest functions"""
+        if not expense_profiling.capturing():
+            expense_profiling.start_capture()
+            button_capture.config(text="Stop cProfile capture")
+            return
+
+        button_capture.config(text="Start cProfile capture")
+        path = filedialog.asksaveasfilename(defaultextension=".prof", filetypes=[("cProfile stats", "*.prof")],
+                                            title="Save the profile (cancel: only show it)")
+        text = expense_profiling.stop_capture(path or None)
+
+        result_window = tk.Toplevel(profiling_window)
+        result_window.title("cProfile (cumulative time)")
+        result_window.geometry("900x500")
+        result_text = tk.Text(result_window, wrap="none", font=("Courier", 10))
+        result_text.insert("1.0", text or "No capture running.")
+        result_text.config(state="disabled")
+        result_text.pack(fill=tk.BOTH, expand=True)
+
+    button_capture = tk.Button(controls, command=toggle_capture, width=22,
+                               text="Stop cProfile capture" if expense_profiling.capturing() else "Start cProfile capture")
+    button_capture.grid(row=0, column=2, padx=5)
+
+    # One row per stage, in milliseconds
+    columns = ["stage", "count", "p50", "p90", "p99", "max"]
+    table = ttk.Treeview(profiling_window, columns=columns, show="headings")
+    for col in columns:
+        table.heading(col, text=col if col in ("stage", "count") else f"{col} (ms)")
+        table.column(col, width=220 if col == "stage" else 80, anchor="w" if col == "stage" else "e")
+    table.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+    label_hint = tk.Label(profiling_window, text="Tick \"Record timings\" then use the app: the stages appear here.")
+    label_hint.pack(pady=5)
+
+    def refresh_table():
+        table.delete(*table.get_children(""))
+        for name, stage in expense_profiling.stats().items():
+            table.insert("", "end", values=[name, stage["count"]] + [
+                f"{stage[key] * 1000:.1f}" for key in ("p50", "p90", "p99", "max")])
+
+    def refresh_loop():
+        if profiling_window.winfo_exists():
+            refresh_table()
+            profiling_window.after(1000, refresh_loop)
+
+    refresh_loop()
+
+
 ######################## GUI  ########################
 
 
 # Start the main page
 root = tk.Tk()
-root.geometry("300x500")
+root.geometry("300x660")
 root.title("EXPENSE TRACKER")
 
 # Button for showing dataframe
@@ -819,8 +1500,46 @@ button_save_file.pack(padx=10, pady=10)
 button_load_file = tk.Button(root, text="7. Load from file", command=load_from_file, width=20, height=1)
 button_load_file.pack(padx=10, pady=10)
 
+# Button to store the expenses with less memory
+button_compact_memory = tk.Button(root, text="8. Compact memory", command=compact_memory, width=20, height=1)
+button_compact_memory.pack(padx=10, pady=10)
+
+# Button to show the timings of the slow stages (and capture a cProfile)
+button_profiling = tk.Button(root, text="9. Profiling", command=show_profiling, width=20, height=1)
+button_profiling.pack(padx=10, pady=10)
+
 # Button to input fake data for testing
 button_input_fake_data = tk.Button(root, text="10. Input fake data", command=input_fake_data, width=20, height=1)
 button_input_fake_data.pack(padx=10, pady=10)
+
+# Button to enter (or paste) many expenses at once
+button_bulk_add = tk.Button(root, text="11. Bulk add", command=bulk_entry, width=20, height=1)
+button_bulk_add.pack(padx=10, pady=10)
+
+# Draw the main window right away, then load the data modules (pandas, numpy...)
+root.update()
+first_paint_time = time.perf_counter() - startup_time
+modules_at_first_paint = [name for name in ("pandas", "numpy", "matplotlib", "tkcalendar") if name in sys.modules]
+
+import pandas as pd  # noqa: E402
+import numpy as np  # noqa: E402
+
+from expense_data import Ledger, category_ls, format_rows, month_key, synthetic_expenses  # noqa: E402
+from expense_io import (Journal, entry_columns, file_format, file_types, journal_file_type,  # noqa: E402
+                        parse_entries, read_csv_chunked, read_ledger, split_pasted_rows, write_ledger)
+from expense_sqlite import SQLiteLedger, database_file_type, is_database  # noqa: E402
+
+# Create the main ledger
+ledger = Ledger()
+
 # Launch
-root.mainloop()
+if os.environ.get("EXPENSE_TRACKER_STARTUP_BENCHMARK"):
+    # Run by benchmarks/bench_startup.py: report the startup times and quit
+    print(json.dumps({
+        "first_paint": first_paint_time,
+        "ready": time.perf_counter() - startup_time,
+        "modules_at_first_paint": modules_at_first_paint,
+    }))
+    root.destroy()
+else:
+    root.mainloop()
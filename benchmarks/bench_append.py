@@ -0,0 +1,84 @@
+"""
+Benchmark: cost of adding one expense as the ledger grows.
+
+The ledger is pre-filled with N rows, then single expenses are appended the way
+submit_data does it. With the append buffer the time per insert should stay flat
+whatever N is. Use --concat to also time the old pd.concat + astype approach.
+
+    python benchmarks/bench_append.py
+    python benchmarks/bench_append.py --sizes 1000 10000 100000 --concat
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from expense_data import Ledger, category_ls, df_dtype  # noqa: E402
+
+
+def make_rows(n, seed=0):
+    """Random expenses used to pre-fill the ledger"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "date": pd.Timestamp("2015-01-01") + pd.to_timedelta(rng.integers(0, 3650, n), unit="D"),
+        "category": rng.choice(category_ls, n),
+        "description": rng.choice(["Lunch", "Bus ticket", "Rent", "Groceries"], n),
+        "amount": rng.uniform(1, 200, n).round(2),
+    })
+
+
+def time_ledger_append(size, inserts):
+    """Microseconds per ledger.append with `size` rows already in the ledger"""
+    ledger = Ledger()
+    ledger.extend(make_rows(size))
+    ledger.frame()
+
+    start = time.perf_counter()
+    for i in range(inserts):
+        ledger.append("2024-12-12", "Food", "Lunch", 12.5 + i)
+    elapsed = time.perf_counter() - start
+
+    # A view asking for the data pays for the merge once
+    start = time.perf_counter()
+    ledger.frame()
+    merge = time.perf_counter() - start
+    return elapsed / inserts * 1e6, merge * 1e3
+
+
+def time_concat_append(size, inserts):
+    """Microseconds per insert with the old pd.concat + astype approach"""
+    df = make_rows(size).astype(df_dtype)
+
+    start = time.perf_counter()
+    for i in range(inserts):
+        new_data = pd.Series({"date": pd.Timestamp("2024-12-12"), "category": "Food",
+                              "description": "Lunch", "amount": 12.5 + i})
+        df = pd.concat([df, new_data.to_frame().T], ignore_index=True)
+        df = df.astype(df_dtype)
+    return (time.perf_counter() - start) / inserts * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 500_000])
+    parser.add_argument("--inserts", type=int, default=5_000)
+    parser.add_argument("--concat", action="store_true", help="also time the old pd.concat approach (slow)")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'append (us)':>12} {'merge (ms)':>11}" + (f" {'concat (us)':>12}" if args.concat else ""))
+    for size in args.sizes:
+        per_insert, merge = time_ledger_append(size, args.inserts)
+        line = f"{size:>10} {per_insert:>12.2f} {merge:>11.1f}"
+        if args.concat:
+            line += f" {time_concat_append(size, min(args.inserts, 200)):>12.1f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark: startup time of the app, and a guard against slow imports coming back.
+
+The app is started in a subprocess with EXPENSE_TRACKER_STARTUP_BENCHMARK=1: it
+reports the time until its main window is drawn (first paint), the time until
+the ledger is ready, and the heavy modules already loaded at the first paint,
+then quits. The check fails (exit status 1) if any of pandas, numpy, matplotlib
+or tkcalendar is loaded before the first paint, or if the first paint is slower
+than --max-first-paint.
+
+The import time of these deferred modules is also measured (in fresh processes)
+to show what the lazy loading saves. Starting the app needs a display.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --max-first-paint 0.5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+app_path = os.path.join(root_dir, "Expense Tracker.py")
+
+# Modules only loaded after the first paint (or on first use)
+deferred_imports = {
+    "pandas": "import pandas",
+    "numpy": "import numpy",
+    "matplotlib TkAgg": "from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg",
+    "tkcalendar": "import tkcalendar",
+}
+
+
+def time_import(statement, runs):
+    """Median seconds to run an import statement in a fresh interpreter (None if it fails)"""
+    baseline, times = [], []
+    for _ in range(runs):
+        for statements, result in (("pass", baseline), (statement, times)):
+            start = time.perf_counter()
+            done = subprocess.run([sys.executable, "-c", statements], capture_output=True)
+            if done.returncode != 0:
+                return None
+            result.append(time.perf_counter() - start)
+    return max(0.0, statistics.median(times) - statistics.median(baseline))
+
+
+def time_startup(runs):
+    """Startup reports of the app (first_paint, ready, modules_at_first_paint) + total process time"""
+    env = dict(os.environ, EXPENSE_TRACKER_STARTUP_BENCHMARK="1")
+    reports = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        done = subprocess.run([sys.executable, app_path], cwd=root_dir, env=env, capture_output=True, text=True)
+        if done.returncode != 0:
+            raise RuntimeError(done.stderr.strip().splitlines()[-1] if done.stderr.strip() else "app failed")
+        report = json.loads(done.stdout.strip().splitlines()[-1])
+        report["process"] = time.perf_counter() - start
+        reports.append(report)
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-first-paint", type=float, help="fail if the median first paint is slower (seconds)")
+    args = parser.parse_args()
+
+    print("Import time of the deferred modules:")
+    for name, statement in deferred_imports.items():
+        seconds = time_import(statement, args.runs)
+        print(f"  {name:18} {'not installed' if seconds is None else f'{seconds * 1000:8.0f} ms'}")
+
+    try:
+        reports = time_startup(args.runs)
+    except RuntimeError as e:
+        print(f"Could not start the app (a display is needed): {e}")
+        return 1
+
+    first_paint = statistics.median(report["first_paint"] for report in reports)
+    print("App startup (median):")
+    print(f"  first paint        {first_paint * 1000:8.0f} ms")
+    print(f"  ledger ready       {statistics.median(report['ready'] for report in reports) * 1000:8.0f} ms")
+    print(f"  whole process      {statistics.median(report['process'] for report in reports) * 1000:8.0f} ms")
+
+    failed = False
+    loaded = sorted({name for report in reports for name in report["modules_at_first_paint"]})
+    if loaded:
+        print(f"FAIL: loaded before the first paint: {', '.join(loaded)}")
+        failed = True
+    if args.max_first_paint is not None and first_paint > args.max_first_paint:
+        print(f"FAIL: first paint slower than {args.max_first_paint} s")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
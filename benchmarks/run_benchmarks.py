@@ -0,0 +1,312 @@
+"""
+Benchmark suite of the data and dashboard hot paths, on synthetic ledgers.
+
+For each size, a ledger is generated with synthetic_expenses (skewed categories
+and dates) and these stages are timed (median of --repeat runs):
+
+    append, load/save of every file format and of the journal, delete lookup
+    (find_date + delete), data viewer (sort + formatted pages), search, every
+    dashboard aggregation and the chart rendering (Agg, no display needed)
+
+The results are written as JSON (--output) and can be compared with an older
+run (--compare): stages slower than --threshold times the old time are listed
+and the exit status is 1.
+
+    python benchmarks/run_benchmarks.py --sizes 10000 100000 --output before.json
+    python benchmarks/run_benchmarks.py --sizes 10000 100000 --compare before.json
+    python benchmarks/run_benchmarks.py --sizes 10000000 --repeat 1 --only load dashboard
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from expense_analytics import SpendingAnalytics, ledger_analytics  # noqa: E402
+from expense_charts import AnalyticsCharts, DashboardCharts  # noqa: E402
+from expense_data import Ledger, format_rows, group_by_month, sort_positions, synthetic_expenses  # noqa: E402
+from expense_io import Journal, has_pyarrow, read_csv_chunked, read_ledger, write_ledger  # noqa: E402
+from expense_sqlite import SQLiteLedger  # noqa: E402
+
+
+def measure(function, repeat):
+    """Seconds of each run of function()"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+######################## STAGES  ########################
+
+# Each stage group gets (ledger, frame, folder, rng) and returns {stage name: function to time}
+
+
+def append_stages(ledger, frame, folder, rng):
+    def append_1000():
+        for i in range(1000):
+            ledger.append("2024-06-01", "Food", "Lunch", 12.5)  # like submit_data
+
+    return {"append 1000 rows": append_1000}
+
+
+def file_stages(ledger, frame, folder, rng):
+    stages = {}
+    formats = ["csv"] + (["feather", "parquet"] if has_pyarrow() else [])
+    for fmt in formats:
+        path = os.path.join(folder, f"ledger.{fmt}")
+        stages[f"save {fmt}"] = lambda path=path: write_ledger(ledger.frame(), path)
+        stages[f"load {fmt}"] = lambda path=path: read_ledger(path)
+    stages["load csv (chunked import)"] = lambda: read_csv_chunked(os.path.join(folder, "ledger.csv"))
+
+    journal_path = os.path.join(folder, "ledger.ledger")
+
+    def journal_save_100():
+        for i in range(100):
+            ledger.append("2024-06-02", "Transport", "Bus ticket", 2.5)
+        journal.save()
+
+    journal = Journal.create(journal_path, ledger)
+    stages["journal save (100 changes)"] = journal_save_100
+    stages["journal open"] = lambda: Journal.open(journal_path, Ledger()).close()
+    return stages
+
+
+def delete_stages(ledger, frame, folder, rng):
+    dates = frame["date"].to_numpy()[rng.integers(0, len(frame), 100)]
+
+    def find_100_dates():
+        for date in dates:
+            ledger.find_date(date)
+
+    def delete_100_rows():
+        ids = ledger.ids()
+        for row_id in rng.choice(ids, 100, replace=False):
+            ledger.delete([row_id])
+
+    return {"find_date x100": find_100_dates, "delete 100 rows (one by one)": delete_100_rows}
+
+
+def viewer_stages(ledger, frame, folder, rng):
+    stages = {f"sort {column}": lambda column=column: sort_positions(frame[column])
+              for column in ("date", "category", "description", "amount")}
+    view = ledger.view("date")
+    starts = rng.integers(0, max(1, len(view) - 30), 100)
+
+    def format_100_pages():
+        for start in starts:
+            format_rows(view.rows(start, start + 30))
+
+    stages["viewer 100 pages of 30 rows"] = format_100_pages
+    stages["search prefix"] = lambda: len(ledger.search("gro"))
+    stages["search contains + category"] = lambda: len(ledger.search("ticket", "Transport", contains=True))
+    return stages
+
+
+def dashboard_stages(ledger, frame, folder, rng):
+    last_year = ledger.years()[-1]
+    year_start = pd.Timestamp(f"{last_year}-01-01")
+    year_end = year_start + pd.DateOffset(years=1) - pd.Timedelta(1, "ns")
+    range_start, range_end = pd.Timestamp(f"{last_year - 3}-02-14"), pd.Timestamp(f"{last_year}-09-20")
+
+    def uncached(start, end):
+        ledger.period_cache.clear()
+        return ledger.summary(start, end).kpis()
+
+    def cached():
+        return ledger.summary(year_start, year_end).kpis()
+
+    # The stages before clear the cache: the first run would be a miss
+    cached.warm_up = True
+
+    return {
+        "rollup of all the rows (group_by_month)": lambda: group_by_month(frame),
+        "summary of a year": lambda: uncached(year_start, year_end),
+        "summary of a custom range (partial months)": lambda: uncached(range_start, range_end),
+        "summary of a year (cached)": cached,
+        "bars of the whole ledger (period_bars)": lambda: ledger.period_bars(frame["date"].min(), frame["date"].max(), 60),
+        "years": ledger.years,
+    }
+
+
+def chart_stages(ledger, frame, folder, rng):
+    charts = DashboardCharts()
+    last_year = ledger.years()[-1]
+    year_summary = ledger.summary(pd.Timestamp(f"{last_year}-01-01"), pd.Timestamp(f"{last_year}-12-31"))
+    all_summary = ledger.summary(frame["date"].min(), frame["date"].max())
+    all_bars = ledger.period_bars(frame["date"].min(), frame["date"].max(), 60)
+
+    def year_charts():
+        charts.update_pie(year_summary, draw=False)
+        charts.update_year_bars(year_summary, last_year, draw=False)
+        charts.render()
+
+    def range_charts():
+        charts.update_pie(all_summary, draw=False)
+        charts.update_range_bars(all_summary, draw=False, bars=all_bars)
+        charts.render()
+
+    year_charts()  # the first render creates the artists
+    return {"charts of a year (render)": year_charts, "charts of the whole ledger (render)": range_charts}
+
+
+def analytics_stages(ledger, frame, folder, rng):
+    start, end = frame["date"].min(), frame["date"].max()
+    analytics = SpendingAnalytics(ledger.daily_totals())
+
+    def all_panels():
+        fresh = SpendingAnalytics(ledger.daily_totals())  # nothing cached
+        fresh.running_total(start, end)
+        fresh.rolling(30, start, end)
+        fresh.rolling(90, start, end)
+        fresh.month_over_month(start, end)
+        fresh.burn_down(int(fresh.monthly(start, end).index[-1]), 1000.0)
+
+    def append_100():
+        """Analytics after each of 100 new expenses: the day x category table follows the changes"""
+        for i in range(100):
+            ledger.append("2024-06-03", "Food", "Lunch", 12.5)
+            ledger_analytics(ledger).running_total(start, end)
+
+    charts = AnalyticsCharts()
+    return {
+        "day x category table (daily_totals)": ledger.daily_totals,
+        "analytics after each of 100 appends": append_100,
+        "all the analytics of the whole ledger": all_panels,
+        "analytics charts (render)": lambda: (charts.update(analytics, start, end, 1000.0, draw=False), charts.render()),
+    }
+
+
+def sqlite_stages(ledger, frame, folder, rng):
+    database = SQLiteLedger(os.path.join(folder, "ledger.sqlite"))
+    database.replace(frame)
+    last_year = database.years()[-1]
+
+    def summary():
+        database.period_cache.clear()
+        return database.summary(pd.Timestamp(f"{last_year}-01-01"), pd.Timestamp(f"{last_year}-12-31")).kpis()
+
+    starts = rng.integers(0, max(1, len(database) - 30), 20).tolist()  # python ints, like the Treeview
+
+    def pages(column):
+        view = database.view(column)  # new view: no anchors yet
+        return [format_rows(view.rows(start, start + 30)) for start in starts]
+
+    return {
+        "sqlite load (replace)": lambda: database.replace(frame),
+        "sqlite summary of a year": summary,
+        "sqlite 20 viewer pages": lambda: pages("date"),
+        "sqlite 20 viewer pages by amount": lambda: pages("amount"),
+        "sqlite 20 viewer pages by description": lambda: pages("description"),
+        "sqlite search contains": lambda: len(database.search("ticket", contains=True)),
+    }
+
+
+stage_groups = {
+    "append": append_stages,
+    "files": file_stages,
+    "delete": delete_stages,
+    "viewer": viewer_stages,
+    "dashboard": dashboard_stages,
+    "charts": chart_stages,
+    "analytics": analytics_stages,
+    "sqlite": sqlite_stages,
+}
+
+
+######################## RUN / COMPARE  ########################
+
+
+def run(sizes, repeat, only=None, seed=0):
+    """Time every stage for every size, return the list of results"""
+    results = []
+    for size in sizes:
+        start = time.perf_counter()
+        frame = synthetic_expenses(size, seed=seed)
+        seconds = time.perf_counter() - start
+        results.append({"size": size, "group": "generate", "stage": "synthetic_expenses",
+                        "seconds": seconds, "runs": [seconds]})
+
+        for group, make_stages in stage_groups.items():
+            if only and group not in only:
+                continue
+            ledger = Ledger(frame.copy())
+            rng = np.random.default_rng(seed)
+            with tempfile.TemporaryDirectory() as folder:
+                for stage, function in make_stages(ledger, frame, folder, rng).items():
+                    if getattr(function, "warm_up", False):
+                        function()  # untimed
+                    runs = measure(function, repeat)
+                    results.append({"size": size, "group": group, "stage": stage,
+                                    "seconds": statistics.median(runs), "runs": runs})
+                    print(f"{size:>10}  {group:10} {stage:45} {statistics.median(runs) * 1000:10.1f} ms", flush=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print the ratio new / old of each stage, return the stages slower than threshold"""
+    old = {(result["size"], result["stage"]): result["seconds"] for result in baseline["results"]}
+    regressions = []
+    print(f"\n{'size':>10}  {'stage':45} {'old ms':>10} {'new ms':>10} {'ratio':>7}")
+    for result in results:
+        key = (result["size"], result["stage"])
+        if key not in old or old[key] <= 0:
+            continue
+        ratio = result["seconds"] / old[key]
+        flag = "  SLOWER" if ratio > threshold else ""
+        print(f"{result['size']:>10}  {result['stage']:45} {old[key] * 1000:10.1f} {result['seconds'] * 1000:10.1f}"
+              f" {ratio:7.2f}{flag}")
+        if ratio > threshold:
+            regressions.append(result)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="+", choices=list(stage_groups), help="only these stage groups")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file of an older run")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slower than old x threshold = regression")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat, args.only)
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "numpy": np.__version__, "pandas": pd.__version__, "matplotlib": matplotlib.__version__},
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) slower than {args.threshold}x")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+"""
+Spending analytics of the dashboard (no GUI code in here): running total,
+rolling 30/90-day spending per category, month-over-month changes and the
+budget burn-down of a month.
+
+Everything is computed from one dense day x category table of the ledger
+(one row per day, cents) and its prefix sums: a window total is the difference
+of two prefix sums, so a rolling sum over any period is a couple of numpy
+operations, whatever the number of expenses. The table is read once from the
+ledger (ledger.daily_totals()) and then kept up to date from its change events
+(DayCategoryRollup); the results are kept by the SpendingAnalytics of each
+ledger version (ledger_analytics).
+"""
+
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from expense_data import day_number, group_by_day, month_key, month_labels, month_start
+
+
+class DayCategoryRollup:
+    """
+    Total amount (cents) per day and category of a ledger, dense from the first to the last day.
+    Updated from the change events of the ledger like DailyRollup: an added or deleted expense
+    only costs the size of the table, the rows of the ledger are read again after a reset only.
+    No reference to the ledger is kept (the rollups are kept per ledger in a WeakKeyDictionary).
+    """
+
+    def __init__(self):
+        self.first_day = 0
+        self.categories = []
+        self.grid = np.zeros((0, 0), dtype=np.int64)
+        self.dirty = True  # read from the ledger on the next use
+
+    def load(self, daily):
+        """Start again from a table of ledger.daily_totals()"""
+        self.first_day = int(daily.index[0]) if len(daily) else 0
+        self.categories = [str(category) for category in daily.columns]
+        self.grid = daily.to_numpy(dtype=np.int64, copy=True).reshape(len(daily), len(self.categories))
+        self.dirty = False
+
+    def add(self, rows, sign):
+        """Add (sign 1) or remove (sign -1) the amounts of some rows"""
+        table = group_by_day(rows)
+        if len(table) == 0:
+            return
+        days = table.index.to_numpy(dtype=np.int64)
+        names = [str(category) for category in table.columns]
+
+        # Grow the table to the new first/last day and the new categories (kept in alphabetical order)
+        categories = sorted(set(self.categories).union(names))
+        first = min(int(days[0]), self.first_day) if len(self.grid) else int(days[0])
+        last = max(int(days[-1]), self.first_day + len(self.grid) - 1)
+        if categories != self.categories or first != self.first_day or last - first + 1 != len(self.grid):
+            grid = np.zeros((last - first + 1, len(categories)), dtype=np.int64)
+            rows_at = np.arange(len(self.grid)) + self.first_day - first
+            grid[np.ix_(rows_at, np.searchsorted(categories, self.categories))] = self.grid
+            self.first_day, self.categories, self.grid = first, categories, grid
+
+        cells = np.ix_(days - self.first_day, np.searchsorted(self.categories, names))
+        self.grid[cells] += sign * table.to_numpy(dtype=np.int64)
+
+    def apply(self, event, rows):
+        """Ledger listener: add (or remove) the rows of a change"""
+        if event == "reset" or rows is None:
+            self.dirty = True  # read again on the next use
+        elif not self.dirty:
+            self.add(rows, -1 if event == "delete" else 1)
+
+    def table(self):
+        """The table as a dataframe like ledger.daily_totals() (days as index, categories as columns)"""
+        return pd.DataFrame(self.grid, index=pd.Index(np.arange(self.first_day, self.first_day + len(self.grid)), name="day"),
+                            columns=pd.Index(self.categories, dtype=object, name="category"))
+
+
+class SpendingAnalytics:
+    """Analytics of one version of a ledger"""
+
+    def __init__(self, daily, version=None):
+        self.version = version
+        self.first_day = int(daily.index[0]) if len(daily) else 0
+        self.categories = [str(category) for category in daily.columns]
+        grid = daily.to_numpy(dtype=np.int64)
+        # prefix sums per category, with a row of zeros on top: sum of days [a, b) = cumulative[b] - cumulative[a]
+        self.cumulative = np.vstack([np.zeros((1, grid.shape[1]), dtype=np.int64), np.cumsum(grid, axis=0)])
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, key, compute):
+        """Result of compute() kept for this version of the ledger"""
+        with self._lock:
+            if key in self._results:
+                return self._results[key]
+        result = compute()
+        with self._lock:
+            self._results[key] = result
+        return result
+
+    def _prefix(self, days):
+        """Prefix sums (cents) before each of the day numbers, for every category"""
+        positions = np.clip(np.asarray(days, dtype=np.int64) - self.first_day, 0, len(self.cumulative) - 1)
+        return self.cumulative[positions]
+
+    @staticmethod
+    def _days(start, end):
+        """Day numbers of the whole days from start to end"""
+        first = int(day_number(pd.Timestamp(start).to_datetime64()))
+        last = int(day_number(pd.Timestamp(end).to_datetime64()))
+        return np.arange(first, last + 1)
+
+    @staticmethod
+    def _dates(days):
+        return pd.DatetimeIndex(np.asarray(days, dtype=np.int64).astype("datetime64[D]"), name="date")
+
+    ######## Daily series ########
+
+    def running_total(self, start, end):
+        """Cumulative spending (euros) from start, for every day of the period"""
+        def compute():
+            days = self._days(start, end)
+            spent = (self._prefix(days + 1) - self._prefix(days[:1])).sum(axis=1)
+            return pd.Series(spent / 100, index=self._dates(days), name="running total")
+        return self._cached(("running", start, end), compute)
+
+    def rolling(self, window, start, end):
+        """Spending (euros) per category over the last `window` days, for every day of the period"""
+        def compute():
+            days = self._days(start, end)
+            totals = self._prefix(days + 1) - self._prefix(days + 1 - window)
+            return pd.DataFrame(totals / 100, index=self._dates(days), columns=self.categories)
+        return self._cached(("rolling", window, start, end), compute)
+
+    ######## Months ########
+
+    def monthly(self, start, end):
+        """Spending (euros) per month (index: month keys) and category of the period"""
+        def compute():
+            days = self._days(start, end)
+            first_month, last_month = month_key(self._dates(days[[0, -1]]).to_numpy())
+            months = np.arange(first_month, last_month + 1)
+            # Edges of the months, cut to the period
+            edges = day_number(np.append(months, last_month + 1).astype("datetime64[M]"))
+            edges = np.clip(edges, days[0], days[-1] + 1)
+            totals = np.diff(self._prefix(edges), axis=0)
+            return pd.DataFrame(totals / 100, index=pd.Index(months, name="month"), columns=self.categories)
+        return self._cached(("monthly", start, end), compute)
+
+    def month_over_month(self, start, end):
+        """
+        Per month and category: spending, change (euros) and change (%) from the month before,
+        as a dataframe with columns (measure, category). The % is NaN after a month without spending.
+        """
+        def compute():
+            months = self.monthly(start, end)
+            change = months.diff()
+            percent = change / months.shift(1).where(months.shift(1) != 0) * 100
+            columns = pd.MultiIndex.from_product([["spent", "change", "percent"], self.categories],
+                                                 names=["measure", "category"])
+            return pd.DataFrame(np.hstack([months.to_numpy(), change.to_numpy(), percent.to_numpy()]),
+                                index=months.index, columns=columns)
+        return self._cached(("mom", start, end), compute)
+
+    def partial_months(self, start, end):
+        """Month keys of the period that it does not cover entirely (its first and/or last month)"""
+        days = self._days(start, end)
+        first_month, last_month = (int(month) for month in month_key(self._dates(days[[0, -1]]).to_numpy()))
+        partial = set()
+        if days[0] != day_number(np.datetime64(first_month, "M")):
+            partial.add(first_month)
+        if days[-1] + 1 != day_number(np.datetime64(last_month + 1, "M")):
+            partial.add(last_month)
+        return partial
+
+    def _last_month_days(self, start, end):
+        """
+        Day numbers [first, stop) of the last month of the period (cut to the period) and of the same
+        days of the month before (cut to its length), so that a partial month is compared with as many days
+        """
+        days = self._days(start, end)
+        month = int(month_key(self._dates(days[-1:]).to_numpy())[0])
+        month_first = int(day_number(np.datetime64(month, "M")))
+        previous_first = int(day_number(np.datetime64(month - 1, "M")))
+        first, stop = max(int(days[0]), month_first), int(days[-1]) + 1
+        previous = (min(previous_first + first - month_first, month_first),
+                    min(previous_first + stop - month_first, month_first))
+        return month, (first, stop), previous
+
+    def last_month_label(self, start, end):
+        """Text of the days compared by last_month_changes, e.g. "Oct 2026 (days 1-18) vs Sep 2026 (days 1-18)" """
+        month, (first, stop), (previous_first, previous_stop) = self._last_month_days(start, end)
+        names = month_labels([month, month - 1], "%b %Y")
+        if month not in self.partial_months(start, end):
+            return f"{names[0]} vs {names[1]}"
+        month_first = int(day_number(np.datetime64(month, "M")))
+        previous_month_first = int(day_number(np.datetime64(month - 1, "M")))
+        text = f"{names[0]} (days {first - month_first + 1}-{stop - month_first}) vs {names[1]}"
+        if previous_stop > previous_first:
+            text += f" (days {previous_first - previous_month_first + 1}-{previous_stop - previous_month_first})"
+        else:
+            text += " (no such days)"
+        return text
+
+    def last_month_changes(self, start, end):
+        """
+        Spending, change and change (%) of the last month of the period per category, highest spending
+        first. If the period ends (or starts) inside that month, it is compared with the same days of
+        the month before, not with the whole month.
+        """
+        def compute():
+            if not self.categories:
+                return pd.DataFrame(columns=["spent", "change", "percent"], dtype=float)
+            _, (first, stop), (previous_first, previous_stop) = self._last_month_days(start, end)
+            edges = self._prefix([first, stop, previous_first, previous_stop]) / 100
+            spent, before = edges[1] - edges[0], edges[3] - edges[2]
+            change = spent - before
+            percent = np.divide(change * 100, before, out=np.full(len(before), np.nan), where=before != 0)
+            frame = pd.DataFrame({"spent": spent, "change": change, "percent": percent},
+                                 index=pd.Index(self.categories, name="category"))
+            return frame.sort_values("spent", ascending=False)
+        return self._cached(("last month", start, end), compute)
+
+    ######## Budget ########
+
+    def default_budget(self, month):
+        """Average monthly spending of the 12 months before month (a starting value for the budget)"""
+        first_day = day_number(np.datetime64(int(month) - 12, "M"))
+        last_day = day_number(np.datetime64(int(month), "M"))
+        spent = (self._prefix([last_day]) - self._prefix([first_day])).sum()
+        return float(spent) / 100 / 12
+
+    def burn_down(self, month, budget):
+        """
+        Budget left (euros) after each day of a month (month key), the ideal line (budget spent evenly)
+        and the spending projected to the end of the month at the pace of the days already past
+        (up to today for the current month). Return (dataframe, projected spending).
+        """
+        def compute():
+            start = month_start(month)
+            days = self._days(start, month_start(month + 1) - pd.Timedelta(1, "ns"))
+            spent = (self._prefix(days + 1) - self._prefix(days[:1])).sum(axis=1) / 100
+            elapsed = np.arange(1, len(days) + 1)
+            frame = pd.DataFrame({
+                "spent": spent,
+                "remaining": budget - spent,
+                "ideal": budget * (1 - elapsed / len(days)),
+            }, index=self._dates(days))
+
+            today = int(day_number(np.datetime64("today", "D")))
+            past = int(np.clip(today - days[0] + 1, 1, len(days)))  # days of the month already over
+            projected = spent[past - 1] / past * len(days)
+            return frame, float(projected)
+        return self._cached(("burn", int(month), float(budget)), compute)
+
+
+_analytics = weakref.WeakKeyDictionary()  # ledger -> {"rollup": DayCategoryRollup, "analytics": of the last version}
+_analytics_lock = threading.Lock()
+
+
+def ledger_analytics(ledger):
+    """
+    SpendingAnalytics of the current version of a ledger (built once per version). The first call
+    reads the day x category table of the ledger, it then follows the changes of the ledger.
+    """
+    with ledger.lock:
+        with _analytics_lock:
+            entry = _analytics.get(ledger)
+            if entry is None:
+                entry = _analytics[ledger] = {"rollup": DayCategoryRollup(), "analytics": None}
+                ledger.subscribe(entry["rollup"].apply)
+        analytics = entry["analytics"]
+        if analytics is None or analytics.version != ledger.version:
+            rollup = entry["rollup"]
+            if rollup.dirty:
+                rollup.load(ledger.daily_totals())
+            analytics = entry["analytics"] = SpendingAnalytics(rollup.table(), ledger.version)
+        return analytics
@@ -0,0 +1,30 @@
+"""
+Tk canvas of the dashboard figures.
+
+Kept apart from expense_charts.py (which never imports a GUI toolkit) and from
+the app, which only imports it when the first dashboard is opened: loading the
+matplotlib TkAgg backend takes a while.
+"""
+
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+from expense_profiling import span
+
+
+class DashboardCanvas(FigureCanvasTkAgg):
+    """
+    Tk canvas of a dashboard figure. The figure is also rasterized by the worker threads,
+    so the Tk side only draws it (on resize) while holding the lock of the charts.
+    """
+
+    def __init__(self, figure, master, lock):
+        self.lock = lock
+        super().__init__(figure, master=master)
+
+    def draw(self):
+        with span("canvas.draw"), self.lock:
+            super().draw()
+
+    def resize(self, event):
+        with self.lock:
+            super().resize(event)
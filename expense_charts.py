@@ -0,0 +1,334 @@
+"""
+Charts of the dashboard.
+
+The figures are created once and then updated in place on every refresh: the
+bar heights, the pie wedges and the labels are changed and the canvas is
+redrawn with draw_idle(). On custom periods the bars are days, weeks, months,
+quarters or years so that they fit the width of the chart (max_bars_for_width),
+and only every k-th bar gets a value label and a tick, as many as fit side by
+side in the width of the axes (labels_that_fit): the number of artists to lay
+out stays bounded however long the period is.
+
+They are plain matplotlib Figures (not pyplot), so no figure manager keeps old
+figures alive. This module does not import any GUI toolkit: the app attaches a
+FigureCanvasTkAgg to the figures.
+
+The dashboard updates the figures in a worker thread with draw=False and then
+rasterizes them there with render(); self.lock must be held by anyone else
+drawing the figures at the same time (the Tk canvas when the window is resized).
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+import matplotlib
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.container import BarContainer
+from matplotlib.figure import Figure
+from matplotlib.font_manager import FontProperties
+from matplotlib.patches import Wedge
+
+from expense_data import month_key, month_labels, multi_year_steps
+
+
+# Same colors as the original pie chart
+pie_colors = matplotlib.colormaps["Dark2"].colors
+
+# Space (pixels) kept between two value labels / ticks of the bar chart
+label_gap = 8
+
+# Bars of a custom period: at least min_bar_pixels wide each, never more than max_range_bars
+min_bar_pixels = 18
+max_range_bars = 60
+
+# x axis title of the bars of a custom period, per resolution
+resolution_titles = {"day": "Day", "week": "Week", "month": "Month & Year", "quarter": "Quarter", "year": "Year",
+                     **{f"{step} years": f"Years (by {step})" for step in multi_year_steps}}
+
+
+def max_bars_for_width(axes_width):
+    """Number of bars that fit in axes of this width (pixels)"""
+    return int(min(max_range_bars, max(4, axes_width // min_bar_pixels)))
+
+
+def agg_canvas(figure):
+    """The Agg canvas of a figure (the Tk canvas is one), attached if the figure has none yet"""
+    if not isinstance(figure.canvas, FigureCanvasAgg):
+        FigureCanvasAgg(figure)  # no GUI canvas attached
+    return figure.canvas
+
+
+def labels_that_fit(ax, texts, fontsize):
+    """How many of these texts fit side by side (with label_gap) in the width of the axes"""
+    if not len(texts):
+        return 1
+    # Only the longest text is measured (digits all have the same width): measuring is slow
+    renderer = agg_canvas(ax.figure).get_renderer()
+    width, _, _ = renderer.get_text_width_height_descent(max(texts, key=len), FontProperties(size=fontsize),
+                                                         ismath=False)
+    return max(1, int(ax.get_window_extent().width // (width + label_gap)))
+
+
+def label_positions(n, max_labels):
+    """Positions of the bars that get a label: all of them, or every k-th one ending on the last bar"""
+    step = -(-n // max_labels) if n > max_labels else 1  # ceil
+    return np.arange(n - 1, -1, -step)[::-1]
+
+
+class DashboardCharts:
+    """The pie chart and the bar chart of one dashboard window"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+
+        # Pie chart: expense distribution by category
+        self.pie_figure = Figure(figsize=(9, 6))
+        self.pie_ax = self.pie_figure.add_subplot()
+        self.pie_ax.set(aspect="equal", xlim=(-1.3, 1.3), ylim=(-1.3, 1.3), frame_on=False, xticks=[], yticks=[])
+        self.pie_ax.set_title('Expense Distribution by Category', fontsize=14, weight='bold', loc='center')
+        self.pie_figure.tight_layout()
+        self.wedges = {}  # category -> (wedge, label, percentage text)
+        self.legend_labels = None
+
+        # Bar chart: monthly expenses of a year, or of a custom period
+        self.bar_figure = Figure(figsize=(8.5, 6))
+        self.bar_ax = self.bar_figure.add_subplot()
+        self.bar_ax.tick_params(axis='x', labelsize=11)
+        self.bar_ax.tick_params(axis='y', labelsize=11)
+        self.bar_ax.set_ylabel('Amount (€)', fontsize=12, labelpad=10, weight='bold', loc='center')
+        self.bars = None  # BarContainer
+        self.bar_value_labels = []
+        self.bar_labels = None
+        self.bar_layout = None  # what the last tight_layout() of the bar chart was made for
+
+    def render(self):
+        """Rasterize both figures with Agg, without any GUI call (safe in a worker thread)"""
+        with self.lock:
+            for figure in (self.pie_figure, self.bar_figure):
+                FigureCanvasAgg.draw(agg_canvas(figure))
+
+    def max_bars(self):
+        """Number of bars that fit the current width of the bar chart"""
+        with self.lock:
+            return max_bars_for_width(self.bar_ax.get_window_extent().width)
+
+    ######## Pie chart ########
+
+    def _wedge(self, category):
+        """Artists of the wedge of a category, created the first time it is shown"""
+        if category not in self.wedges:
+            wedge = Wedge((0, 0), 1, 90, 90, width=0.25)
+            self.pie_ax.add_patch(wedge)
+            label = self.pie_ax.text(0, 0, str(category), size=10, weight="bold", color='black', va='center')
+            percentage = self.pie_ax.text(0, 0, "", size=10, weight="bold", color='white', ha='center', va='center')
+            self.wedges[category] = (wedge, label, percentage)
+        return self.wedges[category]
+
+    def update_pie(self, summary, draw=True):
+        """Show the distribution by category of a PeriodSummary"""
+        category_totals = summary.category_totals
+        category_totals = category_totals[category_totals > 0]
+        fractions = category_totals.to_numpy() / category_totals.sum() if len(category_totals) else []
+
+        # Same geometry as ax.pie(startangle=90, pctdistance=0.88, labeldistance=1.10)
+        shown = []
+        angle = 90.0
+        for i, (category, fraction) in enumerate(zip(category_totals.index, fractions)):
+            wedge, label, percentage = self._wedge(category)
+            theta1, theta2 = angle, angle + 360 * fraction
+            angle = theta2
+
+            wedge.set_theta1(theta1)
+            wedge.set_theta2(theta2)
+            wedge.set_facecolor(pie_colors[i % len(pie_colors)])
+
+            middle = np.deg2rad((theta1 + theta2) / 2)
+            x, y = np.cos(middle), np.sin(middle)
+            label.set_position((1.10 * x, 1.10 * y))
+            label.set_horizontalalignment('left' if x > 0 else 'right')
+            percentage.set_position((0.88 * x, 0.88 * y))
+            percentage.set_text(f"{fraction * 100:.1f}%")
+            shown.append(category)
+
+        # Categories without expense in this period are hidden, not removed
+        for category, artists in self.wedges.items():
+            for artist in artists:
+                artist.set_visible(category in shown)
+
+        # The legend only changes when the list of categories changes
+        if shown != self.legend_labels:
+            if self.pie_ax.get_legend() is not None:
+                self.pie_ax.get_legend().remove()
+            if shown:
+                self.pie_ax.legend([self.wedges[category][0] for category in shown], [str(c) for c in shown],
+                                   frameon=False, bbox_to_anchor=(0, 1), labelspacing=0.3, handlelength=1.5)
+            self.pie_figure.tight_layout()  # make room for the new legend
+            self.legend_labels = shown
+
+        if draw:
+            self.pie_figure.canvas.draw_idle()
+
+    ######## Bar chart ########
+
+    def _set_bars(self, labels, values, draw):
+        """Update the bar heights and their value labels, the bars are only rebuilt if the months change"""
+        ax = self.bar_ax
+        if labels != self.bar_labels:
+            if self.bars is not None:
+                self.bars.remove()
+            x = np.arange(len(labels))
+            self.bars = ax.bar(x, np.zeros(len(labels)), color='#4682B4', edgecolor='black', width=0.7)
+            ax.set_xlim(-0.6, len(labels) - 0.4)
+            self.bar_labels = labels
+
+        for bar, height in zip(self.bars, values):
+            bar.set_height(height)
+
+        # Add top buffer
+        top = max(values) if len(values) else 0
+        ax.set_ylim(0, top * 1.1 if top > 0 else 1)
+
+        self._label_bars(labels, values)
+        # The margins only change with the number of bars (labels at both ends), the width of the y tick
+        # labels (digits of the top) and the titles: tight_layout() only runs then, not on every update
+        layout = (len(labels), len(f"{top:.0f}"), ax.get_title(), ax.get_xlabel(),
+                  tuple(self.bar_figure.get_size_inches()))
+        if layout != self.bar_layout:
+            self.bar_figure.tight_layout()
+            self.bar_layout = layout
+            self._label_bars(labels, values)  # as many labels as fit the new width of the axes
+        if draw:
+            self.bar_figure.canvas.draw_idle()
+
+    def _label_bars(self, labels, values):
+        """Ticks and value labels on every k-th bar, as many as fit in the width of the axes"""
+        ax = self.bar_ax
+        value_texts = [f"{value:.2f} €" for value in values]  # Show values with two decimals
+        fit = min(labels_that_fit(ax, value_texts, 10), labels_that_fit(ax, labels, 11))
+        shown = label_positions(len(labels), fit)
+        ax.set_xticks(shown, [labels[i] for i in shown])
+
+        # All the value labels in one call, only for the labeled bars
+        for text in self.bar_value_labels:
+            text.remove()
+        labeled_bars = BarContainer([self.bars[i] for i in shown], datavalues=np.asarray(values)[shown],
+                                    orientation='vertical')
+        self.bar_value_labels = ax.bar_label(labeled_bars, labels=[value_texts[i] for i in shown],
+                                             padding=5, fontsize=10)  # Offset for readability
+
+    def update_year_bars(self, summary, selected_year, draw=True):
+        """
+        Monthly expenses of one year: always 12 bars, one per month
+        It is the default barchart that appear in the dashboard without pre-selection
+        """
+        all_months = (int(selected_year) - 1970) * 12 + np.arange(12)  # month keys of the year
+        monthly_totals = summary.month_totals.reindex(all_months, fill_value=0)
+
+        self.bar_ax.set_title('Total Expense by Month', fontsize=16, pad=20, weight='bold', loc='center')
+        self.bar_ax.set_xlabel('Month', fontsize=12, labelpad=10, weight='bold', loc='center')
+        self._set_bars(month_labels(all_months, '%b'), monthly_totals.to_numpy(), draw)
+
+    def update_range_bars(self, summary, draw=True, bars=None):
+        """
+        Expenses of a custom period (selected via the calendar in the dashboard).
+        bars = (labels, totals, resolution) from ledger.period_bars(), without it
+        one bar per month with expenses
+        """
+        if bars is None:
+            spending_by_month = summary.month_totals
+            # Labels in 'MonYY' format, made only for the bars
+            bars = (month_labels(spending_by_month.index, '%b%y'), spending_by_month.to_numpy(), "month")
+        labels, values, resolution = bars
+        title = resolution_titles[resolution]
+
+        self.bar_ax.set_title(f'Total Expense by {title}', fontsize=16, pad=20, weight='bold', loc='center')
+        self.bar_ax.set_xlabel(title, fontsize=12, labelpad=10, weight='bold', loc='center')
+        self._set_bars(labels, np.asarray(values), draw)
+
+
+class AnalyticsCharts:
+    """
+    The four panels of the analytics tab of the dashboard: running total, rolling 30/90-day spending,
+    month-over-month change and budget burn-down. Unlike the dashboard charts they are
+    redrawn from scratch on each update (a few lines and at most max_range_bars bars).
+    """
+
+    # Categories with a rolling line (the ones with the highest spending in the period)
+    top_categories = 5
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.figure = Figure(figsize=(11, 5.6))
+        axes = self.figure.subplots(2, 2)
+        self.figure.subplots_adjust(left=0.07, right=0.98, top=0.94, bottom=0.1, hspace=0.45, wspace=0.18)
+        self.running_ax, self.rolling_ax = axes[0]
+        self.change_ax, self.burn_ax = axes[1]
+
+    def render(self):
+        """Rasterize the figure with Agg (safe in a worker thread)"""
+        with self.lock:
+            FigureCanvasAgg.draw(agg_canvas(self.figure))
+
+    def update(self, analytics, start, end, budget, draw=True):
+        """Show the analytics of the period, the burn-down is the one of its last month"""
+        for ax in (self.running_ax, self.rolling_ax, self.change_ax, self.burn_ax):
+            ax.clear()
+
+        # Running total
+        running = analytics.running_total(start, end)
+        self.running_ax.plot(running.index, running.to_numpy(), color='#4682B4')
+        self.running_ax.fill_between(running.index, running.to_numpy(), color='#4682B4', alpha=0.2)
+        self.running_ax.set_title('Running Total (€)', fontsize=12, weight='bold')
+
+        # Rolling 30-day spending of the top categories + 90-day spending of all (per 30 days)
+        rolling_30 = analytics.rolling(30, start, end)
+        top = rolling_30.sum().sort_values(ascending=False).index[:self.top_categories]
+        for i, category in enumerate(top):
+            self.rolling_ax.plot(rolling_30.index, rolling_30[category].to_numpy(), label=category,
+                                 color=pie_colors[i % len(pie_colors)], linewidth=1.2)
+        rolling_90 = analytics.rolling(90, start, end).sum(axis=1) / 3
+        self.rolling_ax.plot(rolling_90.index, rolling_90.to_numpy(), label='All (90 days / 3)',
+                             color='black', linestyle='--', linewidth=1)
+        self.rolling_ax.set_title('Rolling 30-day Spending (€)', fontsize=12, weight='bold')
+        if len(top):
+            self.rolling_ax.legend(fontsize=7, frameon=False, loc='upper left', ncol=3)
+
+        # Month-over-month change of the total, hatched when one of the two months is cut by the period
+        change = analytics.monthly(start, end).sum(axis=1).diff().dropna()
+        change = change.iloc[-max_range_bars:]
+        labels = month_labels(change.index, '%b%y')
+        colors = np.where(change.to_numpy() > 0, '#c0392b', '#27ae60')  # red: spent more
+        partial = analytics.partial_months(start, end)
+        x = np.arange(len(change))
+        bars = self.change_ax.bar(x, change.to_numpy(), color=colors, width=0.7)
+        for bar, month in zip(bars, change.index):
+            if month in partial or month - 1 in partial:
+                bar.set_hatch('//')
+                bar.set_alpha(0.5)
+        shown = label_positions(len(change), labels_that_fit(self.change_ax, labels, 8))
+        self.change_ax.set_xticks(shown, [labels[i] for i in shown], fontsize=8)
+        self.change_ax.axhline(0, color='black', linewidth=0.8)
+        self.change_ax.set_title('Month-over-Month Change (€)', fontsize=12, weight='bold')
+        if partial:
+            self.change_ax.set_xlabel('Hatched: partial month', fontsize=8, color='gray')
+
+        # Burn-down of the budget of the last month of the period
+        month = int(month_key(pd.Timestamp(end).to_datetime64()))
+        burn, projected = analytics.burn_down(month, budget)
+        days = np.arange(1, len(burn) + 1)
+        self.burn_ax.plot(days, burn["remaining"].to_numpy(), color='#4682B4', label='Budget left')
+        self.burn_ax.plot(days, burn["ideal"].to_numpy(), color='gray', linestyle='--', label='Even pace')
+        self.burn_ax.axhline(0, color='black', linewidth=0.8)
+        self.burn_ax.set_title(f'Budget Burn-down {month_labels([month], "%b %Y")[0]}', fontsize=12, weight='bold')
+        self.burn_ax.text(0.98, 0.95, f'Projected: {projected:.0f} € of {budget:.0f} €', transform=self.burn_ax.transAxes,
+                          ha='right', va='top', fontsize=9, color='#c0392b' if projected > budget else 'black')
+        self.burn_ax.set_xlabel('Day of the month')
+        self.burn_ax.legend(fontsize=8, frameon=False, loc='lower left')
+
+        for ax in (self.running_ax, self.rolling_ax):
+            ax.tick_params(axis='x', labelsize=8)
+            for label in ax.get_xticklabels():
+                label.set_rotation(30)
+        if draw:
+            self.figure.canvas.draw_idle()
@@ -0,0 +1,1185 @@
+"""
+Data layer of the expense tracker (no GUI code in here).
+
+All the expenses of the app are kept in a Ledger. New expenses first go into a
+columnar append buffer and are only turned into a dataframe when a view needs
+one, so adding an expense no longer copies the whole ledger.
+"""
+
+import threading
+from collections import OrderedDict
+from functools import cached_property, wraps
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+
+######################## DATA TYPES  ########################
+
+# data type of each colum
+df_dtype = {
+    "date": "datetime64[ns]",
+    "category": "category",
+    "description": "str",
+    "amount": "float"
+}
+
+# The different type of expense
+category_ls = [
+    "Transport",
+    "Housing",
+    "Health",
+    "Food",
+    "Entertainment",
+    "Miscellaneous",
+    "Education",
+    "Utilities",
+    "Shopping"
+      ]
+
+# Compact schema (Ledger.compact_memory): amounts in integer cents, descriptions dictionary-encoded
+# and the categories of category_ls (+ the unknown ones found). An integer amount column always
+# holds cents: read amounts with amount_euros() / amount_cents(). The cents are a nullable integer
+# column so that missing amounts stay missing (saved empty, sorted last), they are not 0 cents.
+compact_dtype = {
+    "date": "datetime64[ns]",
+    "category": pd.CategoricalDtype(category_ls),
+    "description": "category",
+    "amount": "Int64",
+}
+
+
+def has_dtype(column, value):
+    """Check if a column already has the expected data type (no conversion needed)"""
+    if value == "datetime64[ns]":
+        return pd.api.types.is_datetime64_dtype(column.dtype)
+    if value == "category":
+        return isinstance(column.dtype, pd.CategoricalDtype)
+    if value == "str":
+        return pd.api.types.is_string_dtype(column.dtype)
+    return pd.api.types.is_float_dtype(column.dtype)
+
+
+def convert_columns(df):
+    """Convert the dataframe column into the expected format"""
+    for key, value in df_dtype.items():
+        if key in df and has_dtype(df[key], value):
+            continue  # e.g. loaded from a Feather/Parquet file: already typed
+        if value == "datetime64[ns]":  # Special handling for datetime conversion
+            df[key] = pd.to_datetime(df[key], errors='coerce')  # Safely handle invalid dates
+        else:
+            df[key] = df[key].astype(value)
+    return df
+
+
+def amount_cents(amounts):
+    """Amounts as int64 cents (missing amounts count 0)"""
+    if isinstance(getattr(amounts, "dtype", None), pd.Int64Dtype):
+        return amounts.to_numpy(dtype=np.int64, na_value=0)  # compact cents
+    values = np.asarray(amounts)
+    if values.dtype.kind in "iu":
+        return values.astype(np.int64, copy=False)  # already cents
+    return np.rint(np.nan_to_num(values.astype(np.float64)) * 100).astype(np.int64)
+
+
+def amount_euros(amounts):
+    """Amounts in euros as float64 (missing amounts are NaN)"""
+    if isinstance(getattr(amounts, "dtype", None), pd.Int64Dtype):
+        return amounts.to_numpy(dtype=np.float64, na_value=np.nan) / 100  # compact cents
+    values = np.asarray(amounts)
+    if values.dtype.kind in "iu":
+        return values / 100  # cents
+    return values.astype(np.float64, copy=False)
+
+
+def compact_columns(df):
+    """Return the dataframe in the compact schema (same values, stored smaller)"""
+    unknown = sorted(set(df["category"].dropna().astype(str)) - set(category_ls))
+    compact = df.astype({
+        "date": compact_dtype["date"],
+        "category": pd.CategoricalDtype(category_ls + unknown),  # unknown categories are kept
+        "description": compact_dtype["description"],
+    })
+    compact["amount"] = pd.arrays.IntegerArray(amount_cents(df["amount"]), df["amount"].isna().to_numpy())
+    return compact
+
+
+def with_euro_amounts(df):
+    """The dataframe with amounts in euros (for the files: they never contain cents)"""
+    if df["amount"].dtype.kind in "iu":
+        return df.assign(amount=amount_euros(df["amount"]))
+    return df
+
+
+def memory_report(df):
+    """Bytes used by each column (the Python strings of object columns included)"""
+    return df.memory_usage(index=False, deep=True)
+
+
+def empty_frame():
+    """Return an empty dataframe with the expected columns and data types"""
+    return convert_columns(pd.DataFrame(columns=df_dtype.keys()))
+
+
+def concat_frames(top, bottom):
+    """Stack two expense dataframes and keep the category column categorical"""
+    if len(top) == 0:
+        return bottom.reset_index(drop=True)
+    if len(bottom) == 0:
+        return top
+
+    joined = pd.concat([top, bottom], ignore_index=True)
+
+    # pandas falls back to object when the two sides have different categories
+    # (descriptions are only categorical in the compact schema)
+    for key in ("category", "description"):
+        if key == "description" and not isinstance(top[key].dtype, pd.CategoricalDtype):
+            continue
+        if not isinstance(joined[key].dtype, pd.CategoricalDtype):
+            joined[key] = union_categoricals(
+                [top[key].astype("category"), bottom[key].astype("category")],
+                ignore_order=True
+            )
+    return joined
+
+
+######################## LEDGER  ########################
+
+
+class SortedIndex:
+    """Row positions sorted by a key (date, description...) and the sorted keys, for binary searches"""
+
+    def __init__(self, keys):
+        self.order = np.argsort(keys, kind="stable")
+        self.keys = keys[self.order]
+
+    def merge(self, keys, first_position):
+        """Add new rows (at positions first_position, first_position + 1, ...) without sorting everything again"""
+        new_order = np.argsort(keys, kind="stable")
+        insert_at = np.searchsorted(self.keys, keys[new_order], side="right")
+        self.order = np.insert(self.order, insert_at, new_order + first_position)
+        self.keys = np.insert(self.keys, insert_at, keys[new_order])
+
+    def compact(self, keep, new_positions):
+        """Follow the removal of the rows where keep is False"""
+        kept = keep[self.order]
+        self.order = new_positions[self.order[kept]]
+        self.keys = self.keys[kept]
+
+    def positions(self, low, high):
+        """Positions of the rows with low <= key < high"""
+        start = np.searchsorted(self.keys, low, side="left")
+        stop = np.searchsorted(self.keys, high, side="left")
+        return self.order[start:stop]
+
+
+# How the key of each index is computed from some rows of the ledger
+index_keys = {
+    "date": lambda rows: rows["date"].to_numpy("datetime64[ns]"),
+    "description": lambda rows: rows["description"].astype(object).fillna("").astype(str).str.lower().to_numpy(dtype=object),
+}
+
+
+
+def locked(method):
+    """Run a Ledger method while holding the ledger lock"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class Ledger:
+    """
+    Store of all the expenses.
+
+    Rows that are added are written into preallocated numpy columns (the append
+    buffer) which double in size when full, so one append is amortized O(1).
+    The buffer is merged into the main dataframe, with a single dtype
+    conversion, only when frame() is called by a view.
+
+    Every row gets a unique id (increasing in ledger order). Deleting a row only
+    marks it (tombstone), the dataframe is compacted later when a view needs it.
+    Sorted indexes on the date and the description find the rows of a day, or
+    the descriptions starting with some text, with a binary search.
+
+    Listeners registered with subscribe() are called after every change with
+    (event, rows): "add" and "delete" give the rows concerned as a dict of numpy
+    arrays (id, date, category, description, amount), "reset" (load, clear) gives None.
+
+    The dashboard computes its summaries in worker threads, so the public methods
+    hold self.lock (even the reads: they flush the append buffer).
+    """
+
+    def __init__(self, frame=None, chunk_size=1024, cache_bytes=32 * 2**20):
+        self.chunk_size = chunk_size
+        self.lock = threading.RLock()
+
+        # Summaries of the dashboard periods already computed (LRU, cleared when the ledger changes)
+        self.period_cache = PeriodCache(cache_bytes)
+
+        # Changes every time the ledger is modified
+        self.version = 0
+
+        self._listeners = []
+        self._rollup = None  # MonthlyRollup, created by the first summary()
+        self._daily = None  # DailyRollup, created by the first period_bars()
+        self.compact = False  # compact schema (see compact_memory)
+
+        self._next_id = 0
+        self.replace(empty_frame() if frame is None else frame)
+
+    def __len__(self):
+        return len(self._frame) - self._n_deleted + self._pending_len
+
+    ######## Change notifications ########
+
+    def subscribe(self, listener):
+        """Call listener(event, rows) after every change of the ledger"""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _watched(self):
+        """True if someone follows the changes (the rows of the change must be given)"""
+        return bool(self._listeners) or self._rollup is not None or self._daily is not None
+
+    def _notify(self, event, rows=None):
+        # The rollup is updated first so that the listeners can already read it
+        if self._rollup is not None:
+            self._rollup.apply(event, rows)
+        if self._daily is not None:
+            self._daily.apply(event, rows)
+        for listener in list(self._listeners):
+            listener(event, rows)
+
+    def _pending_rows(self, start, stop):
+        """Rows start to stop of the append buffer, as given to the listeners"""
+        return {key: column[start:stop].copy() for key, column in self._pending.items()}
+
+    ######## Append buffer ########
+
+    def _reserve(self, n):
+        """Make sure the append buffer has room for n more rows"""
+        needed = self._pending_len + n
+        capacity = 0 if self._pending is None else len(self._pending["amount"])
+        if needed <= capacity:
+            return
+
+        # Grow by doubling so that the copies are amortized over the appends
+        capacity = max(self.chunk_size, capacity * 2, needed)
+        buffer = {
+            "id": np.empty(capacity, dtype=np.int64),
+            "date": np.empty(capacity, dtype="datetime64[ns]"),
+            "category": np.empty(capacity, dtype=object),
+            "description": np.empty(capacity, dtype=object),
+            "amount": np.empty(capacity, dtype=np.float64),
+        }
+        if self._pending is not None:
+            for key, column in buffer.items():
+                column[:self._pending_len] = self._pending[key][:self._pending_len]
+        self._pending = buffer
+
+    @locked
+    def append(self, date, category, description, amount):
+        """Add a single expense, return its id"""
+        self._reserve(1)
+        i = self._pending_len
+        row_id = self._next_id
+        self._pending["id"][i] = row_id
+        self._pending["date"][i] = pd.Timestamp(date).to_datetime64()
+        self._pending["category"][i] = category
+        self._pending["description"][i] = description
+        self._pending["amount"][i] = float(amount)
+        self._pending_len += 1
+        self._next_id += 1
+        self.version += 1
+        if self._watched():
+            self._notify("add", self._pending_rows(i, i + 1))
+        return row_id
+
+    @locked
+    def extend(self, frame, ids=None):
+        """
+        Add many expenses at once (bulk import, fake data, ...).
+        ids is only given when the rows already have ids (journal replay), they must
+        be increasing and above the ids of the ledger.
+        """
+        n = len(frame)
+        if n == 0:
+            return
+        if ids is None:
+            ids = np.arange(self._next_id, self._next_id + n)
+        self._reserve(n)
+        start, stop = self._pending_len, self._pending_len + n
+        self._pending["id"][start:stop] = ids
+        self._pending["date"][start:stop] = pd.to_datetime(frame["date"], errors='coerce').to_numpy("datetime64[ns]")
+        self._pending["category"][start:stop] = frame["category"].to_numpy(dtype=object)
+        self._pending["description"][start:stop] = frame["description"].to_numpy(dtype=object)
+        self._pending["amount"][start:stop] = amount_euros(frame["amount"])
+        self._pending_len = stop
+        self._next_id = int(self._pending["id"][stop - 1]) + 1
+        self.version += 1
+        if self._watched():
+            self._notify("add", self._pending_rows(start, stop))
+
+    def _flush(self):
+        """Move the rows of the append buffer into the main dataframe"""
+        if not self._pending_len:
+            return
+        n = self._pending_len
+        new_rows = pd.DataFrame({key: self._pending[key][:n] for key in df_dtype})
+        new_rows = new_rows.astype(df_dtype)  # only the new rows are converted
+        if self.compact:
+            new_rows = compact_columns(new_rows)
+        new_ids = self._pending["id"][:n].copy()
+
+        first_position = len(self._frame)
+        self._frame = concat_frames(self._frame, new_rows)
+        self._ids = np.concatenate([self._ids, new_ids])
+        self._deleted = np.concatenate([self._deleted, np.zeros(n, dtype=bool)])
+        self._pending = None
+        self._pending_len = 0
+
+        # Merge the new rows into the indexes instead of sorting everything again
+        for name, index in self._indexes.items():
+            index.merge(index_keys[name](new_rows), first_position)
+
+    ######## Tombstones ########
+
+    def _compact(self):
+        """Really remove the rows marked as deleted (one copy for all the pending deletes)"""
+        keep = ~self._deleted
+
+        # Old position -> new position, so the indexes do not need a new sort
+        new_positions = np.cumsum(keep) - 1
+        for index in self._indexes.values():
+            index.compact(keep, new_positions)
+
+        self._frame = self._frame[keep].reset_index(drop=True)
+        self._ids = self._ids[keep]
+        self._deleted = np.zeros(len(self._frame), dtype=bool)
+        self._n_deleted = 0
+
+    @locked
+    def delete(self, ids):
+        """Delete the rows with the given ids (marked now, removed at the next compaction)"""
+        self._flush()
+        ids = np.unique(np.asarray(ids, dtype=np.int64))  # a repeated id is deleted once
+
+        # Ids are increasing in ledger order: binary search instead of a scan
+        positions = np.searchsorted(self._ids, ids)
+        found = positions < len(self._ids)
+        found[found] = self._ids[positions[found]] == ids[found]
+        if not found.all() or self._deleted[positions].any():
+            raise KeyError(f"No expense with id {ids[~found].tolist() or ids.tolist()}")
+
+        self._deleted[positions] = True
+        self._n_deleted += len(positions)
+        self.version += 1
+        if self._watched():
+            rows = self._frame.iloc[positions]
+            self._notify("delete", {
+                "id": ids,
+                "date": rows["date"].to_numpy("datetime64[ns]"),
+                "category": rows["category"].to_numpy(dtype=object),
+                "description": rows["description"].to_numpy(dtype=object),
+                "amount": amount_euros(rows["amount"]),
+            })
+
+        # Do not let the dead rows pile up
+        if self._n_deleted > len(self._frame) // 2:
+            self._compact()
+
+    ######## Indexes ########
+
+    def _index(self, name):
+        """Return the SortedIndex of a column, built on first use"""
+        if name not in self._indexes:
+            self._indexes[name] = SortedIndex(index_keys[name](self._frame))
+        return self._indexes[name]
+
+    @locked
+    def find_date(self, date):
+        """Return the expenses of one day, indexed by their id"""
+        self._flush()
+        day = np.datetime64(pd.Timestamp(date).normalize().to_datetime64(), "ns")
+
+        # Binary search of the [day, day + 1) range
+        positions = np.sort(self._index("date").positions(day, day + np.timedelta64(1, "D")))
+        positions = positions[~self._deleted[positions]]
+
+        matches = with_euro_amounts(self._frame.iloc[positions])
+        matches.index = self._ids[positions]
+        return matches
+
+    ######## Views ########
+
+    @locked
+    def frame(self):
+        """Return all the expenses as a dataframe (pending rows included, deleted rows removed)"""
+        self._flush()
+        if self._n_deleted:
+            self._compact()
+        return self._frame
+
+    @locked
+    def ids(self):
+        """Ids of the rows of frame(), in the same order"""
+        self.frame()
+        return self._ids
+
+    @locked
+    def sort_order(self, column, reverse=False):
+        """Positions of the frame() rows sorted by a column, cached until the ledger changes"""
+        frame = self.frame()
+        if self._sort_cache_version != self.version:
+            self._sort_cache = {}
+            self._sort_cache_version = self.version
+
+        key = (column, reverse)
+        if key not in self._sort_cache:
+            ascending = self._sort_cache.get((column, False))
+            if ascending is None:
+                # The date index is already the stable sort by date
+                ascending = self._index("date").order if column == "date" else sort_positions(frame[column])
+                self._sort_cache[(column, False)] = ascending
+            if reverse:
+                self._sort_cache[key] = descending_positions(ascending, frame[column].isna().to_numpy())
+        return self._sort_cache[key]
+
+    def view(self, column="date", reverse=False):
+        """FrameView of all the expenses sorted on a column"""
+        with self.lock:
+            return FrameView(self.frame(), self.sort_order(column, reverse), self._ids)
+
+    @locked
+    def search(self, text="", category=None, min_amount=None, max_amount=None, contains=False):
+        """
+        Return a FrameView (by date) of the expenses matching all the given criteria.
+        The text is searched at the start of the descriptions (binary search in the
+        description index), or anywhere in them if contains is True.
+        """
+        frame = self.frame()
+        text = text.strip().lower()
+        if not text and category is None and min_amount is None and max_amount is None:
+            return FrameView(frame, self.sort_order("date"), self._ids)
+
+        if text and not contains:
+            positions = np.sort(self._index("description").positions(text, text + "\uffff"))
+        else:
+            positions = np.arange(len(frame))
+
+        # Vectorized filters, only on the remaining rows
+        keep = np.ones(len(positions), dtype=bool)
+        if category is not None:
+            categories = frame["category"].cat.categories
+            code = categories.get_loc(category) if category in categories else -2
+            keep &= frame["category"].cat.codes.to_numpy()[positions] == code
+        amounts = amount_euros(frame["amount"])[positions]
+        if min_amount is not None:
+            keep &= amounts >= min_amount
+        if max_amount is not None:
+            keep &= amounts <= max_amount
+        positions = positions[keep]
+        if text and contains:
+            descriptions = frame["description"].iloc[positions].astype(str).str.lower()
+            positions = positions[descriptions.str.contains(text, regex=False).to_numpy(dtype=bool)]
+
+        dates = frame["date"].to_numpy("datetime64[ns]")[positions]
+        return FrameView(frame, positions[np.argsort(dates, kind="stable")], self._ids)
+
+    ######## Dashboard ########
+
+    def _get_rollup(self):
+        if self._rollup is None:
+            self._rollup = MonthlyRollup(self)
+        return self._rollup
+
+    def _raw_rows(self, start, stop):
+        """Rows with start <= date < stop (binary search in the date index)"""
+        self._flush()
+        positions = np.sort(self._index("date").positions(start.to_datetime64(), stop.to_datetime64()))
+        positions = positions[~self._deleted[positions]]
+        return self._frame.iloc[positions]
+
+    def summary(self, start, end):
+        """
+        PeriodSummary of the expenses with start <= date <= end.
+        The months fully inside the period come from the rollup, only the rows of
+        a partial first/last month are read from the ledger. Summaries are cached
+        per (period, version) so going back to a period costs nothing.
+        """
+        return self.versioned_summary(start, end)[0]
+
+    def versioned_summary(self, start, end):
+        """
+        (summary(start, end), ledger version it is the summary of).
+        The lock is only held to read the rollup and copy the rows of the partial months,
+        they are grouped outside of it: an append does not wait for a dashboard worker.
+        """
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        with self.lock:
+            version = self.version
+            summary = self.period_cache.lookup(((start, end), version))
+            if summary is not None:
+                return summary, version
+            months, edge_rows = self._summary_parts(start, end)
+
+        summary = summary_of_parts(months, edge_rows)
+        with self.lock:
+            # Changed meanwhile: still the summary of that version, but not worth keeping
+            if self.version == version:
+                self.period_cache.put(((start, end), version), summary)
+        return summary, version
+
+    def _summary_parts(self, start, end):
+        """Rollup (totals, counts) of the months fully inside the period (None if none) and the rows of the partial months"""
+        stop = end + pd.Timedelta(1, "ns")
+
+        # First and last months (keys) fully covered by the period
+        first_month = int(month_key(start.to_datetime64()))
+        if start != month_start(first_month):
+            first_month += 1
+        last_month = int(month_key(stop.to_datetime64())) - 1
+
+        if first_month > last_month:
+            return None, [self._raw_rows(start, stop)]
+        edges = ((start, month_start(first_month)), (month_start(last_month + 1), stop))
+        edge_rows = [self._raw_rows(raw_start, raw_stop) for raw_start, raw_stop in edges if raw_start < raw_stop]
+        return self._get_rollup().months(first_month, last_month), edge_rows
+
+    @locked
+    def period_bars(self, start, end, max_bars):
+        """
+        Bars of the period (whole days from start to end) as (labels, totals in euros, resolution):
+        the finest resolution (day, week, month, quarter, year, several years) giving at most max_bars bars.
+        The totals come from the prefix sums of the daily rollup: O(bars), whatever the period.
+        """
+        if self._daily is None:
+            self._daily = DailyRollup(self)
+        resolution = choose_resolution(start, end, max_bars)
+        edges = bucket_edges(start, end, resolution)
+        return bucket_labels(edges, resolution), self._daily.bucket_totals(edges) / 100, resolution
+
+    @locked
+    def daily_totals(self):
+        """Total (cents) per day and category of the whole ledger (see group_by_day), for the analytics"""
+        return group_by_day(self.frame())
+
+    @locked
+    def years(self):
+        """Years with at least one expense"""
+        rollup = self._get_rollup()
+        rollup.refresh()
+        counts = rollup.counts
+        months = counts.index[counts.sum(axis=1) > 0].to_numpy(dtype=np.int64)
+        return sorted(set((1970 + months // 12).tolist()))
+
+    ######## Whole ledger ########
+
+    @locked
+    def replace(self, frame, ids=None):
+        """Replace all the expenses by the ones of the given dataframe (file load, ids of a snapshot)"""
+        n = len(frame)
+        self._frame = (compact_columns(frame) if self.compact else frame).reset_index(drop=True)
+        if ids is None:
+            ids = np.arange(self._next_id, self._next_id + n)
+        self._ids = np.asarray(ids, dtype=np.int64)
+        self._deleted = np.zeros(n, dtype=bool)
+        self._n_deleted = 0
+        self._next_id = max(self._next_id, int(self._ids[-1]) + 1 if n else 0)
+
+        # Append buffer: one numpy array per column + number of used rows
+        self._pending = None
+        self._pending_len = 0
+
+        # Sorted indexes (name -> SortedIndex), built on first use
+        self._indexes = {}
+
+        # Sorted row positions per (column, reverse), valid for one version
+        self._sort_cache = {}
+        self._sort_cache_version = None
+
+        self.version += 1
+        self._notify("reset")
+
+    @locked
+    def clear(self):
+        """Remove all the expenses"""
+        self.replace(self._frame.iloc[0:0])
+
+    @locked
+    def compact_memory(self):
+        """
+        Switch to the compact schema (compact_dtype), the rows added later are stored the same way.
+        Return the bytes per column (before, after).
+        """
+        frame = self.frame()
+        before = memory_report(frame)
+        # Same rows at the same positions: the indexes and the cached sort orders stay valid
+        self._frame = compact_columns(frame)
+        self.compact = True
+        return before, memory_report(self._frame)
+
+
+######################## DASHBOARD ROLLUP  ########################
+
+
+# Months are grouped on integer month keys: the number of months since 1970-01
+
+
+def month_key(dates):
+    """Month keys of datetime64 values (NaT gives a meaningless key)"""
+    return np.asarray(dates, dtype="datetime64[ns]").astype("datetime64[M]").astype(np.int64)
+
+
+def month_start(key):
+    """Timestamp of the first day of the month of a month key"""
+    return pd.Timestamp(np.datetime64(int(key), "M"))
+
+
+def month_labels(keys, fmt="%b%y"):
+    """Labels of some month keys (only made for the bars shown, not for every row)"""
+    return list(pd.DatetimeIndex(np.asarray(keys, dtype=np.int64).astype("datetime64[M]")).strftime(fmt))
+
+
+def category_codes(values):
+    """
+    (codes, categories) of a category column: the categories used, sorted alphabetically (as
+    pd.factorize(sort=True) gives them), missing values get -1. A categorical column is read
+    from its codes, without hashing every row.
+    """
+    if isinstance(getattr(values, "dtype", None), pd.CategoricalDtype):
+        categorical = pd.Categorical(values)
+        codes = categorical.codes.astype(np.int64)
+        used = np.flatnonzero(np.bincount(codes[codes >= 0], minlength=len(categorical.categories)))
+        names = np.asarray(categorical.categories, dtype=object)[used]
+        order = np.argsort(names.astype(str), kind="stable")
+        new_codes = np.full(len(categorical.categories) + 1, -1, dtype=np.int64)  # last one: code -1 (missing)
+        new_codes[used[order]] = np.arange(len(order))
+        return new_codes[codes], names[order]
+    return pd.factorize(np.asarray(values, dtype=object), sort=True)
+
+
+def group_by_month(rows):
+    """
+    Return (total amount in cents, number of expenses) per month key (rows) and category (columns).
+    The rows are counted into a dense month x category grid with np.bincount (one pass, no groupby).
+    Summing integer cents keeps the totals exact (no float drift).
+    """
+    dates = np.asarray(rows["date"], dtype="datetime64[ns]")
+    codes, categories = category_codes(rows["category"])
+    amounts = amount_cents(rows["amount"])
+
+    # Rows without date or category are not in any group (as in a groupby)
+    valid = (codes >= 0) & ~np.isnat(dates)
+    if not valid.all():
+        dates, codes, amounts = dates[valid], codes[valid], amounts[valid]
+    if len(dates) == 0:
+        empty = pd.DataFrame(index=pd.Index([], dtype=np.int64, name="month"), columns=pd.Index([], dtype=object))
+        return empty.astype(np.int64), empty.astype(np.int64)
+
+    months = month_key(dates)
+    first_month = months.min()
+    n_months, n_categories = months.max() - first_month + 1, len(categories)
+    cells = (months - first_month) * n_categories + codes
+    totals = np.bincount(cells, weights=amounts, minlength=n_months * n_categories).reshape(n_months, n_categories)
+    totals = np.rint(totals).astype(np.int64)  # exact below 2**53 cents
+    counts = np.bincount(cells, minlength=n_months * n_categories).reshape(n_months, n_categories)
+
+    # Only the months with expenses are kept
+    used = counts.any(axis=1)
+    index = pd.Index(np.arange(first_month, first_month + n_months)[used], name="month")
+    columns = pd.Index(np.asarray(categories, dtype=object), name="category")
+    return (pd.DataFrame(totals[used], index=index, columns=columns),
+            pd.DataFrame(counts[used].astype(np.int64), index=index, columns=columns))
+
+
+def group_by_day(rows):
+    """
+    Return the total amount in cents per day number (rows: every day from the first to the last
+    expense, so the analytics can use window sums) and category (columns), counted like group_by_month
+    """
+    dates = np.asarray(rows["date"], dtype="datetime64[ns]")
+    codes, categories = category_codes(rows["category"])
+    amounts = amount_cents(rows["amount"])
+
+    valid = (codes >= 0) & ~np.isnat(dates)
+    if not valid.all():
+        dates, codes, amounts = dates[valid], codes[valid], amounts[valid]
+    if len(dates) == 0:
+        return pd.DataFrame(index=pd.Index([], dtype=np.int64, name="day"),
+                            columns=pd.Index([], dtype=object, name="category")).astype(np.int64)
+
+    days = day_number(dates)
+    first_day = days.min()
+    n_days, n_categories = days.max() - first_day + 1, len(categories)
+    cells = (days - first_day) * n_categories + codes
+    totals = np.bincount(cells, weights=amounts, minlength=n_days * n_categories).reshape(n_days, n_categories)
+    return pd.DataFrame(np.rint(totals).astype(np.int64),
+                        index=pd.Index(np.arange(first_day, first_day + n_days), name="day"),
+                        columns=pd.Index(np.asarray(categories, dtype=object), name="category"))
+
+
+def summary_of_parts(months, edge_rows):
+    """PeriodSummary of the rollup (totals, counts) of some months (or None) plus some rows (see Ledger.summary)"""
+    tables = [group_by_month(rows) for rows in edge_rows]
+    totals, counts = months if months is not None else tables.pop(0)
+    for edge_totals, edge_counts in tables:
+        totals = add_tables(totals, edge_totals)
+        counts = add_tables(counts, edge_counts)
+    return PeriodSummary(totals, counts)
+
+
+def add_tables(table, other):
+    """Add two month x category tables that do not have the same months / categories"""
+    return table.add(other, fill_value=0).fillna(0)
+
+
+class MonthlyRollup:
+    """
+    Total amount and number of expenses per (month, category) of the whole ledger.
+    It is updated by the ledger after each change with the rows concerned only,
+    so the dashboard never has to group the raw rows again.
+    """
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+        self.totals, self.counts = group_by_month(ledger.frame())
+        self.dirty = False
+
+    def apply(self, event, rows):
+        """Add (or remove) the rows of a ledger change"""
+        if event == "reset":
+            self.dirty = True  # rebuilt on the next read
+            return
+        if self.dirty:
+            return
+        totals, counts = group_by_month(rows)
+        if event == "delete":
+            totals, counts = -totals, -counts
+        self.totals = add_tables(self.totals, totals)
+        self.counts = add_tables(self.counts, counts)
+
+    def refresh(self):
+        """Rebuild the rollup if the ledger was replaced"""
+        if self.dirty:
+            self.__init__(self.ledger)
+
+    def months(self, first_month, last_month):
+        """Return (totals, counts) of the month keys first_month to last_month"""
+        self.refresh()
+        keep = (self.totals.index >= first_month) & (self.totals.index <= last_month)
+        return self.totals[keep], self.counts[keep]
+
+
+######## Bars of long periods ########
+
+# Bars of several years for very long periods: 1000 years give at most 2 bars for any
+# datetime64[ns] period (1677 to 2262), so every max_bars >= 2 can be met
+multi_year_steps = [2, 5, 10, 20, 50, 100, 200, 500, 1000]
+
+# Resolutions of the bars of a custom period, from the finest
+bar_resolutions = ["day", "week", "month", "quarter", "year"] + [f"{step} years" for step in multi_year_steps]
+
+# Months per bar of the resolutions cut on months (multi-year bars start on multiples of the step: 2000, 2010...)
+bar_months = {"month": 1, "quarter": 3, "year": 12, **{f"{step} years": 12 * step for step in multi_year_steps}}
+
+bar_label_formats = {"day": "%d %b", "week": "%d %b %y", "month": "%b%y",
+                     **{resolution: "%Y" for resolution in bar_resolutions[4:]}}
+
+
+def day_number(dates):
+    """Days since 1970-01-01 of datetime64 values"""
+    return np.asarray(dates, dtype="datetime64[ns]").astype("datetime64[D]").astype(np.int64)
+
+
+def bucket_edges(start, end, resolution):
+    """
+    Day numbers of the bars of a period (whole days from start to end): the first bar starts on
+    the day of start, the next ones on each Monday / first day of a month, quarter or year,
+    the last edge is the day after end
+    """
+    first = int(day_number(pd.Timestamp(start).to_datetime64()))
+    stop = int(day_number(pd.Timestamp(end).to_datetime64())) + 1
+    if resolution == "day":
+        return np.arange(first, stop + 1)
+    if resolution == "week":
+        monday = first - (first + 3) % 7  # 1970-01-01 was a Thursday
+        starts = np.arange(monday + 7, stop, 7)
+    else:
+        step = bar_months[resolution]
+        first_month = int(month_key(np.datetime64(first, "D")))
+        last_month = int(month_key(np.datetime64(stop - 1, "D")))
+        from_year_0 = first_month + 1970 * 12  # bars aligned on the calendar, not on 1970
+        months = np.arange(first_month - from_year_0 % step + step, last_month + 1, step)
+        starts = months.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+    return np.concatenate([[first], starts[(starts > first) & (starts < stop)], [stop]]).astype(np.int64)
+
+
+def choose_resolution(start, end, max_bars, resolutions=bar_resolutions):
+    """Finest resolution giving at most max_bars bars for the period (the coarsest if none does, max_bars < 2)"""
+    for resolution in resolutions:
+        if len(bucket_edges(start, end, resolution)) - 1 <= max_bars:
+            return resolution
+    return resolutions[-1]
+
+
+def bucket_labels(edges, resolution):
+    """Labels of the bars, from the first day of each bar"""
+    starts = pd.DatetimeIndex(np.asarray(edges[:-1], dtype=np.int64).astype("datetime64[D]"))
+    if resolution == "quarter":
+        return [f"Q{(date.month - 1) // 3 + 1} {date:%y}" for date in starts]
+    return list(starts.strftime(bar_label_formats[resolution]))
+
+
+def bucket_sums(days, cents, edges):
+    """Sum of the amounts of the days in each bar [edges[i], edges[i + 1]), the days before the first bar go in it"""
+    bars = np.clip(np.searchsorted(edges, days, side="right") - 1, 0, len(edges) - 2)
+    return np.rint(np.bincount(bars, weights=cents, minlength=len(edges) - 1)).astype(np.int64)
+
+
+def summary_bars(summary, start, end, max_bars):
+    """
+    (labels, totals in euros, resolution) of the bars of a PeriodSummary, when no ledger is at hand
+    (batch reports): months at least, then quarters, years or several years
+    """
+    months = summary.month_totals
+    if start is None or end is None:
+        if len(months) == 0:
+            return [], np.zeros(0), "month"
+        start = month_start(months.index[0]) if start is None else start
+        end = month_start(months.index[-1] + 1) - pd.Timedelta(1, "ns") if end is None else end
+    resolution = choose_resolution(start, end, max_bars, bar_resolutions[2:])
+    edges = bucket_edges(start, end, resolution)
+    days = day_number(months.index.to_numpy(dtype=np.int64).astype("datetime64[M]"))
+    return bucket_labels(edges, resolution), bucket_sums(days, amount_cents(months.to_numpy()), edges) / 100, resolution
+
+
+class DailyRollup:
+    """
+    Total amount (cents) per day of the whole ledger, dense from the first to the last day,
+    and its prefix sums: the total of any run of days is one subtraction, so the bars of
+    any period at any resolution cost O(bars). Updated by the ledger like MonthlyRollup.
+    """
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+        self.first_day = 0
+        self.totals = np.zeros(0, dtype=np.int64)
+        self._cumulative = None  # prefix sums, computed on first use after a change
+        self.dirty = False
+        self.add(ledger.frame(), 1)
+
+    def add(self, rows, sign):
+        """Add (sign 1) or remove (sign -1) the amounts of some rows"""
+        dates = np.asarray(rows["date"], dtype="datetime64[ns]")
+        # Same rows as the monthly rollup: with a date and a category
+        valid = ~np.isnat(dates) & pd.notna(np.asarray(rows["category"], dtype=object))
+        days, cents = day_number(dates[valid]), amount_cents(rows["amount"])[valid]
+        if len(days) == 0:
+            return
+
+        # Grow the dense array to the new first/last day
+        first = min(int(days.min()), self.first_day) if len(self.totals) else int(days.min())
+        last = max(int(days.max()), self.first_day + len(self.totals) - 1)
+        if first != self.first_day or last - first + 1 != len(self.totals):
+            totals = np.zeros(last - first + 1, dtype=np.int64)
+            totals[self.first_day - first:self.first_day - first + len(self.totals)] = self.totals
+            self.first_day, self.totals = first, totals
+
+        self.totals += sign * np.rint(np.bincount(days - first, weights=cents,
+                                                  minlength=len(self.totals))).astype(np.int64)
+        self._cumulative = None
+
+    def apply(self, event, rows):
+        """Add (or remove) the rows of a ledger change"""
+        if event == "reset":
+            self.dirty = True  # rebuilt on the next read
+            return
+        if not self.dirty:
+            self.add(rows, -1 if event == "delete" else 1)
+
+    def bucket_totals(self, edges):
+        """Total (cents) of each bar [edges[i], edges[i + 1]) of day numbers"""
+        if self.dirty:
+            self.__init__(self.ledger)
+        if self._cumulative is None:
+            self._cumulative = np.concatenate([[0], np.cumsum(self.totals)])
+        positions = np.clip(np.asarray(edges) - self.first_day, 0, len(self.totals))
+        return np.diff(self._cumulative[positions])
+
+
+class PeriodSummary:
+    """
+    Totals of a period per month and category, read by the KPIs, the charts and
+    the detail window. The KPIs are computed once, on first use. The tables hold
+    cents, the totals read from the summary are in euros.
+    """
+
+    def __init__(self, totals, counts):
+        has_data = counts.sum(axis=1) > 0
+        self.totals = totals[has_data].sort_index()
+        self.counts = counts[has_data].sort_index()
+
+    def __len__(self):
+        """Number of expenses in the period"""
+        return int(self.counts.to_numpy().sum())
+
+    def updated(self, changes, start, end):
+        """
+        New summary with the rows of some ledger changes [(event, rows)] added ("add")
+        or removed ("delete"), only the rows with start <= date <= end count.
+        Only the changed rows are grouped, the summary itself is not modified (it may be cached).
+        """
+        start, end = pd.Timestamp(start).to_datetime64(), pd.Timestamp(end).to_datetime64()
+        totals, counts = self.totals, self.counts
+        for event, rows in changes:
+            dates = np.asarray(rows["date"], dtype="datetime64[ns]")
+            inside = (dates >= start) & (dates <= end)
+            if not inside.any():
+                continue
+            change_totals, change_counts = group_by_month({key: np.asarray(rows[key])[inside]
+                                                           for key in ("date", "category", "amount")})
+            if event == "delete":
+                change_totals, change_counts = -change_totals, -change_counts
+            totals = add_tables(totals, change_totals).astype(np.int64)
+            counts = add_tables(counts, change_counts).astype(np.int64)
+        return PeriodSummary(totals, counts)
+
+    def nbytes(self):
+        """Memory used by the summary (for the cache limit)"""
+        return int(self.totals.memory_usage(deep=True).sum() + self.counts.memory_usage(deep=True).sum())
+
+    @cached_property
+    def month_totals(self):
+        """Total per month, for the months with at least one expense"""
+        return self.totals.sum(axis=1) / 100
+
+    @cached_property
+    def category_totals(self):
+        """Total per category"""
+        return self.totals.sum(axis=0) / 100
+
+    @cached_property
+    def total(self):
+        return float(self.totals.to_numpy().sum()) / 100
+
+    @cached_property
+    def avg_monthly(self):
+        """Average of the monthly totals (months with at least one expense)"""
+        return self.month_totals.mean() if len(self.totals) else 0.0
+
+    @cached_property
+    def top_category(self):
+        """Category with the highest total"""
+        return self.category_totals.idxmax() if len(self.totals.columns) else "-"
+
+    def kpis(self):
+        """The 3 KPIs of the dashboard (also written by the headless reports)"""
+        return {
+            "total_expenses": self.total,
+            "average_monthly_expense": float(self.avg_monthly),
+            "highest_spending_category": str(self.top_category),
+        }
+
+
+class PeriodCache:
+    """
+    LRU cache of the dashboard summaries, keyed by (period, ledger version).
+    When the version changes (the ledger was modified) all the entries are
+    dropped. The least recently used entries are dropped above max_bytes.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()  # (period, version) -> (value, size)
+        self._version = None
+
+    def get(self, key, compute):
+        """Return the cached value of key, or compute() it and keep it"""
+        value = self.lookup(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def lookup(self, key):
+        """Return the cached value of key, or None"""
+        period, version = key
+        if version != self._version:
+            self.clear()
+            self._version = version
+
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+        return None
+
+    def put(self, key, value):
+        """Keep the value of key, the entries of an older version are dropped"""
+        period, version = key
+        if version != self._version:
+            self.clear()
+            self._version = version
+        size = value.nbytes()
+        if size <= self.max_bytes:
+            self._entries[key] = (value, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, old_size) = self._entries.popitem(last=False)
+                self.nbytes -= old_size
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
+
+
+######################## VIEWS  ########################
+
+
+# Columns sorted without case, like COLLATE NOCASE in SQLite (only A-Z are folded)
+nocase_columns = {"description"}
+ascii_lower = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+def sort_keys(series):
+    """
+    Return (keys, missing) for sorting a column by its real dtype: dates and amounts
+    as numbers, categories and descriptions by their alphabetical rank (descriptions
+    without case). The missing values have the greatest keys (numpy puts NaT / NaN last).
+    """
+    nocase = series.name in nocase_columns
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Sort the few categories alphabetically, then the rows by the rank of their category
+        categories = series.cat.categories.astype(str)
+        if nocase:
+            ranks, _ = pd.factorize(categories.str.translate(ascii_lower).to_numpy(dtype=object), sort=True)
+        else:
+            ranks = np.empty(len(categories), dtype=np.int64)
+            ranks[np.argsort(categories.to_numpy(), kind="stable")] = np.arange(len(categories))
+        ranks = np.append(ranks, len(categories))  # code -1 = missing value
+        codes = series.cat.codes.to_numpy()
+        return ranks[codes], codes < 0
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return series.to_numpy(), series.isna().to_numpy()
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        # As floats: the missing compact cents (nullable Int64) become NaN, sorted last
+        return series.to_numpy(dtype=np.float64, na_value=np.nan), series.isna().to_numpy()
+    keys, uniques = pd.factorize(series.to_numpy(dtype=object), sort=not nocase)
+    missing = keys < 0
+    if nocase:
+        # Only the distinct descriptions are folded and ranked, the rows take the rank of theirs
+        ranks, _ = pd.factorize(pd.Index(uniques).astype(str).str.translate(ascii_lower), sort=True)
+        keys = np.append(ranks, len(uniques))[keys]  # code -1 = missing value
+    return np.where(missing, len(uniques), keys), missing
+
+
+def descending_positions(ascending, missing):
+    """
+    Turn the stable ascending order of a column into its descending order: the exact
+    reverse (equal values by id descending, as in the SQLite views), the missing values
+    stay last and by id.
+    """
+    n_valid = len(ascending) - int(missing.sum())
+    return np.concatenate([ascending[:n_valid][::-1], ascending[n_valid:]])
+
+
+def sort_positions(series, reverse=False):
+    """
+    Return the positions that sort a column by its real dtype, in the order of the
+    SQLite views (QueryView). Dates and amounts are sorted as numbers, categories and
+    descriptions alphabetically, missing values go last.
+    """
+    keys, missing = sort_keys(series)
+    ascending = np.argsort(keys, kind="stable")
+    return descending_positions(ascending, missing) if reverse else ascending
+
+
+class FrameView:
+    """Rows of a dataframe in a given order, read slice by slice by the data viewers"""
+
+    def __init__(self, frame, order=None, ids=None):
+        self.frame = frame
+        self.order = order  # positions of the rows in display order (None = frame order)
+        self.ids = ids  # ledger ids of the frame rows (to delete them)
+
+    def __len__(self):
+        return len(self.frame) if self.order is None else len(self.order)
+
+    def rows(self, start, stop):
+        """Return the rows start to stop (display order) as a dataframe"""
+        if self.order is None:
+            return self.frame.iloc[start:stop]
+        return self.frame.iloc[self.order[start:stop]]
+
+    def row_ids(self, view_positions):
+        """Ledger ids of the rows at the given display positions"""
+        positions = np.asarray(view_positions, dtype=np.int64)
+        if self.order is not None:
+            positions = self.order[positions]
+        return self.ids[positions]
+
+
+def format_rows(rows):
+    """Format a slice of expenses for display: date without time and amount with €"""
+    dates = rows["date"].dt.strftime("%Y-%m-%d").fillna("")
+    amounts = np.char.mod("€%.2f", amount_euros(rows["amount"])).tolist()
+    return list(zip(dates, rows["category"].astype(str), rows["description"].astype(str), amounts))
+
+
+######################## SYNTHETIC DATA  ########################
+
+# Share of the expenses, typical amount (median, spread of the log) and descriptions of each category
+synthetic_categories = {
+    "Food": (0.30, 18.0, 0.7, ["Groceries", "Lunch at restaurant", "Bakery", "Coffee", "Dinner out", "Take-away"]),
+    "Transport": (0.16, 12.0, 0.8, ["Bus ticket", "Train ticket", "Fuel", "Taxi", "Parking"]),
+    "Shopping": (0.12, 45.0, 0.9, ["Clothes", "Shoes", "Electronics", "Books", "Gifts"]),
+    "Entertainment": (0.10, 25.0, 0.8, ["Movie ticket", "Concert", "Streaming", "Games", "Museum"]),
+    "Utilities": (0.08, 60.0, 0.5, ["Electricity", "Water", "Internet", "Phone bill", "Gas"]),
+    "Health": (0.07, 35.0, 0.9, ["Pharmacy", "Doctor", "Dentist", "Gym membership"]),
+    "Miscellaneous": (0.07, 20.0, 1.0, ["Haircut", "Post office", "Donation", "Laundry"]),
+    "Education": (0.05, 80.0, 1.0, ["Course fee", "School supplies", "Online course", "Textbook"]),
+    "Housing": (0.05, 700.0, 0.4, ["Rent", "Home insurance", "Furniture", "Repairs"]),
+}
+
+
+def synthetic_expenses(n, seed=None, start="2015-01-01", end="2024-12-31"):
+    """
+    Random but realistic expenses for tests and benchmarks (10k to 10M rows, vectorized).
+    Categories are skewed (lots of food, little housing), amounts are log-normal per
+    category, and dates get busier over the years, in December and on weekends.
+    """
+    rng = np.random.default_rng(seed)
+    names = list(synthetic_categories)
+    shares = np.array([synthetic_categories[name][0] for name in names])
+    codes = rng.choice(len(names), size=n, p=shares / shares.sum())
+
+    # Day weights: growth over the period x December peak x weekends
+    days = pd.date_range(start, end, freq="D")
+    weights = np.linspace(1.0, 2.0, len(days))
+    weights *= np.where(days.month == 12, 1.5, 1.0) * np.where(days.dayofweek >= 5, 1.3, 1.0)
+    dates = days.to_numpy("datetime64[ns]")[rng.choice(len(days), size=n, p=weights / weights.sum())]
+
+    medians = np.array([synthetic_categories[name][1] for name in names])
+    spreads = np.array([synthetic_categories[name][2] for name in names])
+    amounts = np.round(medians[codes] * np.exp(rng.normal(size=n) * spreads[codes]), 2)
+
+    # Descriptions: one of the descriptions of the category (codes into the list of all descriptions)
+    descriptions = [description for name in names for description in synthetic_categories[name][3]]
+    offsets = np.cumsum([0] + [len(synthetic_categories[name][3]) for name in names])
+    counts = np.diff(offsets)
+    description_codes = offsets[codes] + (rng.random(n) * counts[codes]).astype(np.int64)
+
+    return pd.DataFrame({
+        "date": dates,
+        "category": pd.Categorical.from_codes(codes, categories=names),
+        "description": pd.Categorical.from_codes(description_codes, categories=descriptions).astype(df_dtype["description"]),
+        "amount": amounts,
+    })
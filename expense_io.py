@@ -0,0 +1,459 @@
+"""
+Reading and writing ledger files, and the journal used for incremental saves.
+
+CSV stays the interchange format. Large CSV files are read chunk by chunk with
+explicit types, each chunk is validated and cast before the next one is read.
+
+Feather and Parquet are binary columnar formats that keep the data types of
+df_dtype (category, datetime64...), so a load does not need to parse the dates
+again. Feather files are written uncompressed so they can be memory-mapped
+when loaded.
+
+Feather and Parquet need pyarrow (pip install pyarrow).
+"""
+
+import csv
+import glob
+import io
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from expense_data import category_ls, convert_columns, df_dtype, with_euro_amounts
+
+
+# File types offered by the save / load dialogs
+file_types = [
+    ("CSV files", "*.csv"),
+    ("Feather files (fast)", "*.feather"),
+    ("Parquet files", "*.parquet"),
+]
+
+# Saving to this type keeps a journal of the changes (see Journal)
+journal_file_type = ("Expense journal (incremental save)", "*.ledger")
+
+
+def file_format(path):
+    """Return "csv", "feather" or "parquet" from the extension of the path"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".feather", ".arrow"):
+        return "feather"
+    if extension in (".parquet", ".pq"):
+        return "parquet"
+    return "csv"
+
+
+######################## CSV IMPORT  ########################
+
+# Format of the dates written by save_to_file (faster than guessing the format)
+date_format = "%Y-%m-%d"
+
+# Types used while reading a CSV file: nothing is left to pandas inference
+csv_dtype = {
+    "date": "str",
+    "category": "category",
+    "description": "str",
+    "amount": "str",  # parsed with to_numeric so that bad values can be counted
+}
+
+
+def parse_chunk(chunk, extra_dtype=None):
+    """Validate and cast one chunk of a CSV file, return (typed chunk, number of invalid values)"""
+    dates = pd.to_datetime(chunk["date"], format=date_format, errors="coerce")
+
+    # Dates saved with a time ("2024-12-12 10:30:00") do not match the fixed format
+    retry = dates.isna() & chunk["date"].notna()
+    if retry.any():
+        dates[retry] = pd.to_datetime(chunk.loc[retry, "date"], format="ISO8601", errors="coerce")
+
+    amounts = pd.to_numeric(chunk["amount"], errors="coerce")
+    invalid = int((dates.isna() & chunk["date"].notna()).sum() + (amounts.isna() & chunk["amount"].notna()).sum())
+
+    typed = pd.DataFrame({
+        "date": dates.astype(df_dtype["date"]),
+        "category": chunk["category"],
+        "description": chunk["description"].astype(df_dtype["description"]),
+        "amount": amounts.astype(df_dtype["amount"]),
+    })
+    for key in extra_dtype or {}:
+        typed[key] = chunk[key]
+    return typed, invalid
+
+
+def iter_csv_chunks(path, chunk_size=100_000, extra_dtype=None):
+    """
+    Read a CSV file chunk by chunk, yield (typed chunk, invalid values, fraction of the file read).
+    extra_dtype gives other columns to keep, with their type (the row ids of a snapshot).
+    """
+    extra_dtype = extra_dtype or {}
+    size = os.path.getsize(path) or 1
+    with open(path, "rb") as handle:
+        reader = pd.read_csv(handle, usecols=list(df_dtype) + list(extra_dtype),
+                             dtype={**csv_dtype, **extra_dtype}, chunksize=chunk_size)
+        for chunk in reader:
+            typed, invalid = parse_chunk(chunk, extra_dtype)
+            yield typed, invalid, min(1.0, handle.tell() / size)
+
+
+def read_csv_chunked(path, chunk_size=100_000, progress=None, cancel=None, extra_dtype=None):
+    """
+    Load a CSV file with bounded memory: only one raw chunk exists at a time, the
+    typed chunks are joined at the end. progress(fraction) is called after each
+    chunk, the import stops (returns None) when the cancel event is set.
+    Return (dataframe, number of invalid dates/amounts).
+    """
+    chunks = []
+    invalid = 0
+    for typed, chunk_invalid, fraction in iter_csv_chunks(path, chunk_size, extra_dtype):
+        if cancel is not None and cancel.is_set():
+            return None, invalid
+        chunks.append(typed)
+        invalid += chunk_invalid
+        if progress is not None:
+            progress(fraction)
+
+    if not chunks:
+        columns = list(df_dtype) + list(extra_dtype or {})
+        return convert_columns(pd.DataFrame(columns=columns)).astype(extra_dtype or {}), invalid
+
+    # Every chunk has its own categories: join them with the union of the categories
+    categories = union_categoricals([chunk["category"] for chunk in chunks], ignore_order=True)
+    frame = pd.concat([chunk.drop(columns="category") for chunk in chunks], ignore_index=True)
+    frame.insert(1, "category", categories)
+    return frame, invalid
+
+
+######################## BULK ENTRY  ########################
+
+# Columns of the bulk entry grid and of the pasted rows
+entry_columns = ["date", "category", "description", "amount"]
+
+# Date formats accepted when typing or pasting (tried in this order, then ISO 8601)
+entry_date_formats = [date_format, "%d.%m.%Y", "%d/%m/%Y"]
+
+
+def split_pasted_rows(text):
+    """
+    Rows of a text pasted from a spreadsheet (tab separated) or a CSV (comma or semicolon),
+    as lists of 4 strings: date, category, description, amount. A header row is skipped and
+    3 cells are read as date, category, amount (no description).
+    """
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        return []
+    if "\t" in lines[0]:
+        delimiter = "\t"
+    else:
+        delimiter = ";" if lines[0].count(";") > lines[0].count(",") else ","
+
+    rows = []
+    for cells in csv.reader(io.StringIO("\n".join(lines)), delimiter=delimiter):
+        cells = [cell.strip() for cell in cells]
+        if len(cells) == 3:
+            cells = [cells[0], cells[1], "", cells[2]]
+        rows.append((cells + [""] * 4)[:4])
+    if rows and rows[0][0].lower() == "date":
+        rows = rows[1:]
+    return rows
+
+
+def parse_entries(raw):
+    """
+    Validate and cast the rows typed or pasted in the bulk entry grid, all at once
+    (raw: dataframe of strings with the columns of entry_columns).
+    Return (typed dataframe, error message per row, "" when the row is valid).
+    """
+    raw = raw.fillna("").astype(str).apply(lambda column: column.str.strip())
+
+    # Dates: every format is tried on the dates not parsed yet
+    dates = pd.Series(pd.NaT, index=raw.index, dtype="datetime64[ns]")
+    for fmt in entry_date_formats + ["ISO8601"]:
+        missing = dates.isna() & (raw["date"] != "")
+        if not missing.any():
+            break
+        dates[missing] = pd.to_datetime(raw.loc[missing, "date"], format=fmt, errors="coerce")
+
+    # Categories of category_ls, whatever the case
+    known = {category.lower(): category for category in category_ls}
+    categories = raw["category"].str.lower().map(known)
+
+    # Amounts: "12,50", "1 234.5 €" and "€12" are accepted
+    text_amounts = raw["amount"].str.replace(r"[\s€]", "", regex=True).str.replace(",", ".", regex=False)
+    amounts = pd.to_numeric(text_amounts, errors="coerce")
+
+    errors = pd.Series("", index=raw.index, dtype=object)
+    for bad, message in (
+        (dates.isna(), "invalid date"),
+        (categories.isna(), "unknown category"),
+        (amounts.isna(), "invalid amount"),
+    ):
+        errors[bad] = errors[bad].where(errors[bad] == "", errors[bad] + ", ") + message
+
+    typed = pd.DataFrame({
+        "date": dates,
+        "category": pd.Categorical(categories, categories=category_ls),
+        "description": raw["description"].astype(df_dtype["description"]),
+        "amount": amounts.astype(df_dtype["amount"]),
+    })
+    return typed, errors
+
+
+######################## FILES  ########################
+
+
+def write_ledger(frame, path):
+    """Save the expenses in the format given by the extension of the path"""
+    frame = with_euro_amounts(frame)  # compact ledger: cents -> euros
+    fmt = file_format(path)
+    if fmt == "feather":
+        # Uncompressed so the file can be memory-mapped by read_ledger
+        frame.reset_index(drop=True).to_feather(path, compression="uncompressed")
+    elif fmt == "parquet":
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False)
+
+
+def read_ledger(path, memory_map=True):
+    """Load expenses from a CSV, Feather or Parquet file, with the expected data types"""
+    fmt = file_format(path)
+    if fmt == "feather":
+        from pyarrow import feather
+
+        # The columns are read from the memory-mapped file, split_blocks avoids merging them in a copy
+        table = feather.read_table(path, memory_map=memory_map)
+        frame = table.to_pandas(split_blocks=True)
+    elif fmt == "parquet":
+        frame = pd.read_parquet(path, memory_map=memory_map)
+    else:
+        frame, _ = read_csv_chunked(path)
+
+    # Typed columns (binary formats) are kept as they are, only the others are converted
+    return convert_columns(frame)
+
+
+######################## JOURNAL  ########################
+
+
+def has_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def rows_to_json(rows):
+    """Columns of a ledger change (dict of numpy arrays) -> JSON friendly lists"""
+    return {
+        "id": rows["id"].tolist(),
+        "date": np.datetime_as_string(rows["date"], unit="s").tolist(),
+        "category": [None if pd.isna(value) else str(value) for value in rows["category"]],
+        "description": [None if pd.isna(value) else str(value) for value in rows["description"]],
+        "amount": rows["amount"].tolist(),
+    }
+
+
+class Journal:
+    """
+    Incremental save of a ledger: a snapshot plus an append-only journal of the
+    changes made after it. For a journal saved as "name.ledger":
+
+        name.ledger                      manifest (JSON): current snapshot file + last change it contains
+        name.ledger.snapshot-<seq>.xxx   the ledger with its row ids (Feather, or CSV without pyarrow)
+        name.ledger.journal              one JSON line per change (add / delete / clear)
+
+    save() only appends the changes made since the last save, so it is O(changes).
+    Loading reads the snapshot and replays the changes made after it. When the
+    journal gets long, a new snapshot is written in a background thread
+    (compaction). Every change has a sequence number and the manifest is
+    replaced atomically, so a crash at any moment loses at most the unsaved
+    changes: the changes already in the snapshot are skipped at replay, and a
+    half-written last line is ignored.
+    """
+
+    def __init__(self, path, ledger):
+        self.path = path
+        self.ledger = ledger
+        self.journal_path = path + ".journal"
+
+        self._seq = 0  # sequence number of the last change written
+        self._snapshot_seq = 0  # last change contained in the snapshot
+        self._unsaved = []  # changes not written yet: (event, rows)
+        self._needs_snapshot = False  # the ledger was replaced: the changes cannot describe it
+
+        self._lock = threading.Lock()  # journal file: save() vs compaction
+        self._compaction = None
+
+    ######## Creation / loading ########
+
+    @classmethod
+    def create(cls, path, ledger):
+        """Start a journal at path with a snapshot of the ledger, and follow its changes"""
+        journal = cls(path, ledger)
+        with open(journal.journal_path, "w"):
+            pass
+        journal._write_snapshot(ledger.frame(), ledger.ids(), 0)
+        ledger.subscribe(journal._on_change)
+        return journal
+
+    @classmethod
+    def open(cls, path, ledger):
+        """Load the snapshot + journal at path into the ledger, and follow its changes"""
+        journal = cls(path, ledger)
+        with open(path) as file:
+            manifest = json.load(file)
+        snapshot_path = os.path.join(os.path.dirname(path), manifest["snapshot"])
+        journal._seq = journal._snapshot_seq = manifest["seq"]
+
+        if snapshot_path.endswith(".feather"):
+            frame = read_ledger(snapshot_path)
+        else:
+            frame, _ = read_csv_chunked(snapshot_path, extra_dtype={"id": "int64"})
+        ids = frame.pop("id").to_numpy()
+        ledger.replace(frame, ids)
+
+        journal._replay()
+        ledger.subscribe(journal._on_change)
+        return journal
+
+    def _replay(self):
+        """Apply the changes written after the snapshot"""
+        if not os.path.exists(self.journal_path):
+            return
+        good_size = 0
+        with open(self.journal_path, "rb") as file:
+            for line in file:
+                try:
+                    change = json.loads(line)
+                except ValueError:
+                    break  # half-written line of a crash: everything after it is lost anyway
+                good_size += len(line)
+                if change["seq"] <= self._snapshot_seq:
+                    continue  # already in the snapshot
+                self._apply(change)
+                self._seq = change["seq"]
+
+        # Remove a broken end so that the next changes are written on a clean line
+        if good_size != os.path.getsize(self.journal_path):
+            with open(self.journal_path, "r+b") as file:
+                file.truncate(good_size)
+
+    def _apply(self, change):
+        if change["op"] == "add":
+            rows = pd.DataFrame({key: change[key] for key in df_dtype})
+            rows["date"] = pd.to_datetime(rows["date"], errors="coerce")
+            self.ledger.extend(rows, ids=np.asarray(change["id"], dtype=np.int64))
+        elif change["op"] == "delete":
+            self.ledger.delete(change["id"])
+        elif change["op"] == "clear":
+            self.ledger.clear()
+
+    ######## Saving ########
+
+    def _on_change(self, event, rows):
+        """Listener of the ledger: keep the change until the next save"""
+        if event == "reset":
+            if len(self.ledger) == 0:
+                self._unsaved.append(("clear", None))
+            else:
+                self._needs_snapshot = True
+        else:
+            self._unsaved.append((event, rows))
+
+    def save(self):
+        """Write the changes made since the last save (or a new snapshot if the ledger was replaced)"""
+        if self._needs_snapshot:
+            self.wait()
+            with self._lock:
+                self._seq += 1
+                self._write_snapshot(self.ledger.frame(), self.ledger.ids(), self._seq)
+                with open(self.journal_path, "w"):
+                    pass
+            self._unsaved = []
+            self._needs_snapshot = False
+            return
+
+        if not self._unsaved:
+            return
+
+        lines = []
+        for event, rows in self._unsaved:
+            self._seq += 1
+            change = {"seq": self._seq, "op": event}
+            if rows is not None:
+                change.update(rows_to_json(rows) if event == "add" else {"id": rows["id"].tolist()})
+            lines.append(json.dumps(change) + "\n")
+        self._unsaved = []
+
+        with self._lock:
+            with open(self.journal_path, "a") as file:
+                file.writelines(lines)
+                file.flush()
+                os.fsync(file.fileno())
+
+        # Compact once the journal holds more changes than a quarter of the ledger
+        if self._seq - self._snapshot_seq > max(1000, len(self.ledger) // 4):
+            self.compact_in_background()
+
+    def has_unsaved_changes(self):
+        return bool(self._unsaved) or self._needs_snapshot
+
+    ######## Snapshots / compaction ########
+
+    def _write_snapshot(self, frame, ids, seq):
+        """Write a snapshot containing the changes up to seq and point the manifest to it"""
+        extension = ".feather" if has_pyarrow() else ".csv"
+        snapshot_path = f"{self.path}.snapshot-{seq}{extension}"
+        write_ledger(frame.assign(id=ids), snapshot_path + ".tmp" + extension)
+        os.replace(snapshot_path + ".tmp" + extension, snapshot_path)
+
+        # The manifest is replaced in one step: it points to the old or to the new snapshot
+        manifest = {"snapshot": os.path.basename(snapshot_path), "seq": seq}
+        with open(self.path + ".tmp", "w") as file:
+            json.dump(manifest, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(self.path + ".tmp", self.path)
+        self._snapshot_seq = seq
+
+        # Older snapshots are not needed anymore
+        for old_path in glob.glob(glob.escape(self.path) + ".snapshot-*"):
+            if old_path != snapshot_path:
+                os.remove(old_path)
+
+    def compact_in_background(self):
+        """Write a new snapshot and shorten the journal, without blocking the caller"""
+        if self._compaction is not None and self._compaction.is_alive():
+            return
+        # The dataframe given by the ledger is never modified afterwards: safe to read from the thread
+        frame, ids, seq = self.ledger.frame(), self.ledger.ids(), self._seq
+        self._compaction = threading.Thread(target=self._compact, args=(frame, ids, seq), daemon=True)
+        self._compaction.start()
+
+    def _compact(self, frame, ids, seq):
+        self._write_snapshot(frame, ids, seq)
+
+        # Keep only the changes made after the snapshot (saved while it was written)
+        with self._lock:
+            with open(self.journal_path, "rb") as file:
+                lines = [line for line in file if json.loads(line)["seq"] > seq]
+            with open(self.journal_path + ".tmp", "wb") as file:
+                file.writelines(lines)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(self.journal_path + ".tmp", self.journal_path)
+
+    def wait(self):
+        """Wait for a running compaction"""
+        if self._compaction is not None:
+            self._compaction.join()
+
+    def close(self):
+        """Stop following the ledger"""
+        self.wait()
+        self.ledger.unsubscribe(self._on_change)
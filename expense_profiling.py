@@ -0,0 +1,175 @@
+"""
+Timing spans of the hot paths of the app (no GUI code in here).
+
+The slow steps are wrapped in named spans:
+
+    with span("dashboard.summary"):
+        summary = ledger.summary(start, end)
+
+When the timings are off (default), span() returns one shared do-nothing
+context manager, so the cost is a function call and a test. When they are on,
+the duration of each span is kept in a bounded list per name, and stats()
+gives the latency percentiles of each stage.
+
+A cProfile capture can also be started/stopped. Before Python 3.12 cProfile
+only follows the thread that enabled it, so the main (Tk) thread gets one
+profiler and the work of other threads is profiled with profile_call();
+stop_capture() merges all of them. From 3.12 cProfile is built on
+sys.monitoring, which sees every thread but allows one profiler at a time: the
+main profiler is then the only one. Only the standard library is used, so it
+can be imported before the main window is drawn.
+"""
+
+import contextlib
+import io
+import sys
+import threading
+import time
+from collections import deque
+
+
+# Timings off by default: span() is then (almost) free
+enabled = False
+
+# Durations kept per span name (the oldest are dropped)
+max_samples = 1000
+
+_samples = {}  # span name -> deque of seconds
+_samples_lock = threading.Lock()
+_null_span = contextlib.nullcontext()
+
+
+class _Span:
+    """Times the code of a with block and keeps the duration under its name"""
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def span(name):
+    """Context manager timing the code it wraps under name (does nothing when the timings are off)"""
+    if not enabled:
+        return _null_span
+    return _Span(name)
+
+
+def record(name, seconds):
+    """Keep one duration of a stage"""
+    with _samples_lock:
+        if name not in _samples:
+            _samples[name] = deque(maxlen=max_samples)
+        _samples[name].append(seconds)
+
+
+def set_enabled(value):
+    global enabled
+    enabled = bool(value)
+
+
+def reset():
+    """Forget all the durations"""
+    with _samples_lock:
+        _samples.clear()
+
+
+def percentile(sorted_values, fraction):
+    """Value at fraction (0..1) of a sorted list, by linear interpolation"""
+    position = (len(sorted_values) - 1) * fraction
+    low = int(position)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+
+def stats():
+    """{span name: {count, p50, p90, p99, max, total}} in seconds, sorted by name"""
+    with _samples_lock:
+        samples = {name: sorted(durations) for name, durations in _samples.items()}
+    return {
+        name: {
+            "count": len(durations),
+            "p50": percentile(durations, 0.50),
+            "p90": percentile(durations, 0.90),
+            "p99": percentile(durations, 0.99),
+            "max": durations[-1],
+            "total": sum(durations),
+        }
+        for name, durations in sorted(samples.items()) if durations
+    }
+
+
+######################## CPROFILE CAPTURE  ########################
+
+_capture = None  # {"main": Profile of the thread that started it, "others": [Profile]} while capturing
+_capture_lock = threading.Lock()
+
+# From Python 3.12 one profiler sees all the threads (and a second one cannot be enabled)
+profiles_all_threads = sys.version_info >= (3, 12)
+
+
+def capturing():
+    return _capture is not None
+
+
+def start_capture():
+    """Start profiling the calling thread (and the profile_call() of the other threads)"""
+    global _capture
+    import cProfile
+
+    with _capture_lock:
+        if _capture is not None:
+            return
+        profiler = cProfile.Profile()
+        _capture = {"main": profiler, "others": []}
+        profiler.enable()
+
+
+def profile_call(function, *args, **kwargs):
+    """Run function, under its own profiler if a capture is running (for worker threads)"""
+    if _capture is None or profiles_all_threads:
+        return function(*args, **kwargs)
+    import cProfile
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:  # another profiling tool is already active
+        return function(*args, **kwargs)
+    try:
+        return function(*args, **kwargs)
+    finally:
+        profiler.disable()
+        with _capture_lock:
+            if _capture is not None:
+                _capture["others"].append(profiler)
+
+
+def stop_capture(path=None, lines=30):
+    """
+    Stop the capture, save the merged profile to path (for snakeviz, pstats...) if given,
+    return the top functions by cumulative time as text (None if no capture was running)
+    """
+    global _capture
+    with _capture_lock:
+        if _capture is None:
+            return None
+        capture, _capture = _capture, None
+    capture["main"].disable()
+    import pstats  # not part of the profile
+
+    stream = io.StringIO()
+    merged = pstats.Stats(capture["main"], stream=stream)
+    for profiler in capture["others"]:
+        merged.add(profiler)
+    if path:
+        merged.dump_stats(path)
+    merged.sort_stats("cumulative").print_stats(lines)
+    return stream.getvalue()
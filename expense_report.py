@@ -0,0 +1,292 @@
+"""
+Headless reports: the KPIs of the dashboard as JSON and its charts as PNG/SVG,
+for one or many ledger files in one process.
+
+The same code as the dashboard is used (Ledger.summary, PeriodSummary.kpis,
+DashboardCharts) but tkinter is never imported: the charts are drawn with the
+Agg backend, so it runs on a server without display.
+
+With --batch the files are not loaded into ledgers: each one is streamed chunk
+by chunk into a month x category rollup in a process pool (--jobs), then the
+rollups are added into the combined report. Memory stays bounded by the chunk
+size, whatever the size and number of files.
+
+    python expense_report.py team1.csv team2.feather --out reports
+    python expense_report.py data/*.csv --year 2024 --format png svg
+    python expense_report.py teams/*.csv --batch --jobs 8
+"""
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+
+matplotlib.use("Agg")  # never load a GUI backend
+
+import pandas as pd  # noqa: E402
+
+from expense_charts import DashboardCharts  # noqa: E402
+from expense_data import (Ledger, PeriodSummary, add_tables, convert_columns, empty_frame,  # noqa: E402
+                          group_by_month, month_labels, summary_bars)
+from expense_io import Journal, file_format, iter_csv_chunks, read_ledger  # noqa: E402
+
+
+######################## LOADING  ########################
+
+
+def load_ledger(path):
+    """Ledger with the expenses of a CSV, Feather, Parquet or .ledger (journal) file"""
+    ledger = Ledger()
+    if path.lower().endswith(".ledger"):
+        Journal.open(path, ledger).close()
+    else:
+        ledger.replace(read_ledger(path))
+    return ledger
+
+
+def parse_period(year=None, start=None, end=None):
+    """
+    (start, end) given on the command line: a whole year, or start/end dates (end day included).
+    A date that is not given is None.
+    """
+    if year is not None:
+        year_start = pd.Timestamp(f"{year}-01-01")
+        return year_start, year_start + pd.DateOffset(years=1) - pd.Timedelta(1, "ns")
+    start = pd.Timestamp(start) if start else None
+    end = pd.Timestamp(end) + pd.Timedelta(days=1) - pd.Timedelta(1, "ns") if end else None
+    return start, end
+
+
+def report_period(ledger, year=None, start=None, end=None):
+    """(start, end) of the report, a missing date is taken from the first/last expense of the ledger"""
+    start, end = parse_period(year, start, end)
+    if start is None or end is None:
+        if len(ledger) == 0:
+            raise ValueError("No data to show.")
+        dates = ledger.frame()["date"]
+        start = dates.min() if start is None else start
+        end = dates.max() if end is None else end
+    if start > end:
+        raise ValueError("Please select a valid period.")
+    return start, end
+
+
+######################## REPORT  ########################
+
+
+def summary_report(path, summary, start, end):
+    """Content of the JSON report of one ledger"""
+    return {
+        "ledger": path,
+        "start": None if start is None else start.isoformat(),
+        "end": None if end is None else end.isoformat(),
+        "expenses": len(summary),
+        **summary.kpis(),
+        "category_totals": {str(category): float(amount) for category, amount in summary.category_totals.items()},
+        "month_totals": dict(zip(month_labels(summary.month_totals.index, "%Y-%m"),
+                                 summary.month_totals.astype(float).tolist())),
+    }
+
+
+def write_report(path, name, charts, out_dir, formats=("png",), year=None, start=None, end=None):
+    """Write <name>.json and the charts <name>-pie.<format>, <name>-bars.<format>, return the report"""
+    ledger = load_ledger(path)
+    start, end = report_period(ledger, year, start, end)
+    summary = ledger.summary(start, end)
+    report = summary_report(path, summary, start, end)
+
+    with open(os.path.join(out_dir, f"{name}.json"), "w") as file:
+        json.dump(report, file, indent=2)
+
+    bars = None if year is not None or not formats else ledger.period_bars(start, end, charts.max_bars())
+    write_charts(summary, name, charts, out_dir, formats, year, bars)
+    return report
+
+
+def write_charts(summary, name, charts, out_dir, formats, year=None, bars=None):
+    """
+    Write the charts <name>-pie.<format> and <name>-bars.<format> of a summary.
+    bars: the bars of a custom period (ledger.period_bars), by default from the months of the summary
+    """
+    if not formats:
+        return
+    # The figures are reused from one report to the next (updated in place)
+    charts.update_pie(summary, draw=False)
+    if year is not None:
+        charts.update_year_bars(summary, year, draw=False)
+    else:
+        charts.update_range_bars(summary, draw=False, bars=bars)
+    for fmt in formats:
+        charts.pie_figure.savefig(os.path.join(out_dir, f"{name}-pie.{fmt}"), format=fmt)
+        charts.bar_figure.savefig(os.path.join(out_dir, f"{name}-bars.{fmt}"), format=fmt)
+
+
+def report_names(paths, reserved=("report", "combined")):
+    """
+    File name (without extension) of each ledger, made unique when two ledgers have the same one
+    (name-2, name-3... skipping the names already used, a file may be called name-2 too).
+    The names of the other reports written in the folder are not used either.
+    """
+    names = []
+    used = set(reserved)
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        name, suffix = stem, 1
+        while name.lower() in used:  # X.json and x.json are the same file on Windows and macOS
+            suffix += 1
+            name = f"{stem}-{suffix}"
+        used.add(name.lower())
+        names.append(name)
+    return names
+
+
+######################## BATCH AGGREGATION  ########################
+
+
+def iter_file_chunks(path, chunk_size=100_000):
+    """Typed chunks of a ledger file, only one chunk is in memory at a time (except for .ledger journals)"""
+    if path.lower().endswith(".ledger"):
+        yield load_ledger(path).frame()
+    elif file_format(path) == "csv":
+        for typed, _, _ in iter_csv_chunks(path, chunk_size):
+            yield typed
+    elif file_format(path) == "parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield convert_columns(batch.to_pandas())
+    else:
+        from pyarrow import feather
+
+        # Memory-mapped: the batches are only read when converted
+        for batch in feather.read_table(path, memory_map=True).to_batches(max_chunksize=chunk_size):
+            yield convert_columns(batch.to_pandas())
+
+
+def aggregate_file(path, start=None, end=None, chunk_size=100_000):
+    """
+    (totals, counts, start, end): month x category totals and counts of the expenses of a file
+    with start <= date <= end, a missing date is the first/last expense of the file (as report_period).
+    Runs in a worker process, only the small tables are sent back.
+    """
+    totals, counts = group_by_month(empty_frame())
+    first = last = None
+    for chunk in iter_file_chunks(path, chunk_size):
+        # First/last expense of the whole file, read while streaming it
+        dates = chunk["date"].dropna()
+        if len(dates):
+            first = dates.min() if first is None else min(first, dates.min())
+            last = dates.max() if last is None else max(last, dates.max())
+        if start is not None:
+            chunk = chunk[chunk["date"] >= start]
+        if end is not None:
+            chunk = chunk[chunk["date"] <= end]
+        chunk_totals, chunk_counts = group_by_month(chunk)
+        totals = add_tables(totals, chunk_totals)
+        counts = add_tables(counts, chunk_counts)
+
+    if start is None or end is None:
+        if first is None:
+            raise ValueError("No data to show.")
+        start = first if start is None else start
+        end = last if end is None else end
+    if start > end:
+        raise ValueError("Please select a valid period.")
+    return totals, counts, start, end
+
+
+def write_batch_report(paths, names, charts, out_dir, formats=("png",), year=None, start=None, end=None, jobs=None):
+    """
+    Aggregate the files in a process pool, write <name>.json per file and combined.json
+    (+ the combined charts). Return (reports of the files and the combined one, failed files).
+    """
+    start, end = parse_period(year, start, end)
+    combined_totals, combined_counts = group_by_month(empty_frame())
+    combined_start = combined_end = None  # from the first to the last expense of all the files by default
+    reports = {}
+    failed = 0
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(aggregate_file, path, start, end): (path, name) for path, name in zip(paths, names)}
+        for future in as_completed(futures):
+            path, name = futures[future]
+            try:
+                totals, counts, file_start, file_end = future.result()
+            except Exception as e:
+                # One bad file does not stop the other reports
+                failed += 1
+                print(f"{path}: failed: {e}", file=sys.stderr)
+                continue
+
+            report = summary_report(path, PeriodSummary(totals, counts), file_start, file_end)
+            with open(os.path.join(out_dir, f"{name}.json"), "w") as file:
+                json.dump(report, file, indent=2)
+            print(f"{path}: {report['expenses']} expenses")
+            reports[name] = report
+
+            # The partial rollups are merged as they come
+            combined_totals = add_tables(combined_totals, totals)
+            combined_counts = add_tables(combined_counts, counts)
+            combined_start = file_start if combined_start is None else min(combined_start, file_start)
+            combined_end = file_end if combined_end is None else max(combined_end, file_end)
+
+    start = start if start is not None else combined_start
+    end = end if end is not None else combined_end
+    combined = PeriodSummary(combined_totals, combined_counts)
+    combined_report = {**summary_report(None, combined, start, end), "ledgers": len(reports)}
+    with open(os.path.join(out_dir, "combined.json"), "w") as file:
+        json.dump(combined_report, file, indent=2)
+    # No ledger here: months, quarters or years from the combined rollup
+    bars = None if year is not None else summary_bars(combined, start, end, charts.max_bars())
+    write_charts(combined, "combined", charts, out_dir, formats, year, bars)
+
+    # Reports in the order of the command line
+    return [reports[name] for name in names if name in reports] + [combined_report], failed
+
+
+######################## COMMAND LINE  ########################
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write the dashboard KPIs (JSON) and charts (PNG/SVG) of ledger files.")
+    parser.add_argument("ledgers", nargs="+", help="CSV, Feather, Parquet or .ledger files")
+    parser.add_argument("--out", default="reports", help="output folder (default: reports)")
+    parser.add_argument("--year", type=int, help="report on one year (12 monthly bars)")
+    parser.add_argument("--start", help="first day of the period (YYYY-MM-DD), default: first expense")
+    parser.add_argument("--end", help="last day of the period (YYYY-MM-DD), default: last expense")
+    parser.add_argument("--format", nargs="*", default=["png"], choices=["png", "svg"],
+                        help="chart formats, none for KPIs only (default: png)")
+    parser.add_argument("--batch", action="store_true",
+                        help="stream the files in a process pool: KPIs per file + combined report/charts")
+    parser.add_argument("--jobs", type=int, help="worker processes of --batch (default: number of CPUs)")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.out, exist_ok=True)
+    charts = DashboardCharts()
+    names = report_names(args.ledgers)
+    if args.batch:
+        reports, failed = write_batch_report(args.ledgers, names, charts, args.out, args.format,
+                                             args.year, args.start, args.end, args.jobs)
+    else:
+        reports = []
+        failed = 0
+        for path, name in zip(args.ledgers, names):
+            try:
+                reports.append(write_report(path, name, charts, args.out, args.format, args.year, args.start, args.end))
+                print(f"{path}: {reports[-1]['expenses']} expenses")
+            except Exception as e:
+                # One bad file does not stop the other reports
+                failed += 1
+                print(f"{path}: failed: {e}", file=sys.stderr)
+
+    # Index of all the reports of the run
+    with open(os.path.join(args.out, "report.json"), "w") as file:
+        json.dump(reports, file, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,492 @@
+"""
+SQLite storage of the expenses (stdlib sqlite3, one local file).
+
+SQLiteLedger has the same methods as the in-memory Ledger but the rows stay in
+the database: filters, deletes and the dashboard aggregations are SQL queries
+(indexed on the date and the category), and the data viewers read their rows
+page by page with QueryView. Memory does not grow with the history, only the
+SQLite page cache (cache_bytes) and the pages shown are kept.
+
+Every sort column of the viewer has an index on (column, id), so a page is read
+by walking the index from a row already seen (keyset paging), never by sorting
+the table.
+
+Every change is committed at once, there is nothing to save.
+"""
+
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from expense_data import (PeriodCache, PeriodSummary, amount_euros, bucket_edges, bucket_labels, bucket_sums,
+                          choose_resolution, convert_columns, empty_frame, group_by_day, group_by_month, locked,
+                          month_key)
+
+
+# Saving to / loading from these extensions uses the database
+database_file_type = ("SQLite database", "*.sqlite *.db")
+
+schema = """
+CREATE TABLE IF NOT EXISTS expenses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date INTEGER,  -- nanoseconds since 1970-01-01 (datetime64[ns])
+    month INTEGER,  -- month key (months since 1970-01), grouped by the dashboard
+    category TEXT,
+    description TEXT,
+    amount REAL
+);
+"""
+
+# Indexes of the filters and of the sort orders of the viewers
+indexes = {
+    "expenses_date": "expenses(date)",
+    "expenses_category": "expenses(category)",
+    "expenses_amount": "expenses(amount, id)",
+    "expenses_description": "expenses(description COLLATE NOCASE, id)",
+}
+
+columns = "id, date, category, description, amount"
+
+# Day number (days since 1970-01-01) of the date column: floor division, also before 1970
+day_ns = 86_400 * 10**9
+day_sql = f"(date - ((date % {day_ns}) + {day_ns}) % {day_ns}) / {day_ns}"
+
+# Sort orders of the views (the id keeps the order of equal values stable) and their collation.
+# The indexes on date and category hold the id too (it is the rowid).
+sortable_columns = {
+    "date": "",
+    "category": "",
+    "description": " COLLATE NOCASE",
+    "amount": "",
+}
+
+
+def is_database(path):
+    """True if the path has the extension of a SQLite database"""
+    return path.lower().endswith((".sqlite", ".db"))
+
+
+######################## CONVERSIONS  ########################
+
+
+def to_records(frame, ids):
+    """Rows of an expense dataframe as tuples for executemany (missing values become NULL)"""
+    dates = frame["date"].to_numpy("datetime64[ns]")
+    missing_date = np.isnat(dates)
+    date_values = np.where(missing_date, None, dates.astype(np.int64)).tolist()
+    month_values = np.where(missing_date, None, month_key(dates)).tolist()
+    categories = frame["category"].astype(object).where(frame["category"].notna(), None).tolist()
+    descriptions = frame["description"].astype(object).where(frame["description"].notna(), None).tolist()
+    amounts = amount_euros(frame["amount"])
+    amounts = np.where(np.isnan(amounts), None, amounts).tolist()
+    return zip(np.asarray(ids).tolist(), date_values, month_values, categories, descriptions, amounts)
+
+
+def to_frame(records):
+    """Rows (id, date, category, description, amount) read from the database as (dataframe, ids)"""
+    if not records:
+        return empty_frame(), np.empty(0, dtype=np.int64)
+    ids, dates, categories, descriptions, amounts = zip(*records)
+    frame = convert_columns(pd.DataFrame({
+        "date": pd.array(dates, dtype="Int64").to_numpy(dtype=np.int64, na_value=np.iinfo(np.int64).min)
+                  .view("datetime64[ns]"),
+        "category": pd.Series(categories, dtype=object),
+        "description": pd.Series(descriptions, dtype=object).fillna(""),
+        "amount": pd.Series(amounts, dtype=np.float64),
+    }))
+    return frame, np.asarray(ids, dtype=np.int64)
+
+
+def escape_like(text):
+    """Text matched literally by LIKE ... ESCAPE '\\'"""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+######################## LEDGER  ########################
+
+
+class SQLiteLedger:
+    """
+    Store of the expenses in a SQLite database, with the methods of the Ledger
+    used by the app. The connection is shared with the dashboard worker threads,
+    so the public methods hold self.lock.
+    """
+
+    def __init__(self, path, cache_bytes=32 * 2**20):
+        self.path = path
+        self.lock = threading.RLock()
+        self.period_cache = PeriodCache(cache_bytes)
+        self.version = 0
+        self._listeners = []
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("PRAGMA synchronous = NORMAL")
+        self._connection.execute(f"PRAGMA cache_size = {-(cache_bytes // 1024)}")  # negative = KiB
+        self._connection.executescript(schema)
+        self._create_indexes()
+        self._len = self._query_one("SELECT COUNT(*) FROM expenses")
+
+    def __len__(self):
+        return self._len
+
+    @locked
+    def close(self):
+        self._connection.close()
+
+    def _create_indexes(self):
+        for name, target in indexes.items():
+            self._connection.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+
+    def _query_one(self, sql, params=()):
+        return self._connection.execute(sql, params).fetchone()[0]
+
+    ######## Change notifications ########
+
+    def subscribe(self, listener):
+        """Call listener(event, rows) after every change of the ledger (same events as Ledger)"""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _changed(self, event, frame=None, ids=None):
+        self.version += 1
+        rows = None
+        if self._listeners and frame is not None:
+            rows = {
+                "id": np.asarray(ids, dtype=np.int64),
+                "date": frame["date"].to_numpy("datetime64[ns]"),
+                "category": frame["category"].to_numpy(dtype=object),
+                "description": frame["description"].to_numpy(dtype=object),
+                "amount": amount_euros(frame["amount"]),
+            }
+        for listener in list(self._listeners):
+            listener(event, rows)
+
+    ######## Changes ########
+
+    def _next_ids(self, n):
+        """Ids of n new rows (never reused, as in the Ledger)"""
+        last = self._connection.execute(
+            "SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'expenses'), 0), "
+            "COALESCE((SELECT MAX(id) FROM expenses), 0))").fetchone()[0]
+        return np.arange(last + 1, last + 1 + n)
+
+    @locked
+    def append(self, date, category, description, amount):
+        """Add a single expense, return its id"""
+        frame = convert_columns(pd.DataFrame({"date": [pd.Timestamp(date)], "category": [category],
+                                              "description": [description], "amount": [float(amount)]}))
+        return int(self.extend(frame)[0])
+
+    @locked
+    def extend(self, frame, ids=None):
+        """Add many expenses at once in one transaction, return their ids"""
+        if len(frame) == 0:
+            return np.empty(0, dtype=np.int64)
+        ids = self._next_ids(len(frame)) if ids is None else np.asarray(ids, dtype=np.int64)
+        with self._connection:
+            self._connection.executemany(
+                "INSERT INTO expenses (id, date, month, category, description, amount) VALUES (?, ?, ?, ?, ?, ?)",
+                to_records(frame, ids))
+        self._len += len(frame)
+        self._changed("add", frame, ids)
+        return ids
+
+    @locked
+    def delete(self, ids):
+        """Delete the expenses with these ids (KeyError if one of them does not exist)"""
+        ids = np.unique(np.asarray(ids, dtype=np.int64))
+        if len(ids) == 0:
+            return
+        with self._connection:
+            # The ids go through a temporary table: no limit on the number of parameters
+            self._connection.execute("CREATE TEMP TABLE IF NOT EXISTS selected_ids (id INTEGER PRIMARY KEY)")
+            self._connection.execute("DELETE FROM selected_ids")
+            self._connection.executemany("INSERT INTO selected_ids VALUES (?)", ((i,) for i in ids.tolist()))
+            found = self._query_one("SELECT COUNT(*) FROM expenses WHERE id IN (SELECT id FROM selected_ids)")
+            if found != len(ids):
+                raise KeyError("some of these expenses do not exist")
+            frame, deleted_ids = None, ids
+            if self._listeners:
+                frame, deleted_ids = to_frame(self._connection.execute(
+                    f"SELECT {columns} FROM expenses WHERE id IN (SELECT id FROM selected_ids)").fetchall())
+            self._connection.execute("DELETE FROM expenses WHERE id IN (SELECT id FROM selected_ids)")
+        self._len -= len(ids)
+        self._changed("delete", frame, deleted_ids)
+
+    @locked
+    def replace(self, frame, ids=None):
+        """Replace all the expenses of the database (one transaction: the old rows stay if the insert fails)"""
+        with self._connection:
+            self._connection.execute("BEGIN")  # sqlite3 would commit the DROP INDEX at once otherwise
+            # Building the indexes once after the inserts is faster than updating them on every row
+            for name in indexes:
+                self._connection.execute(f"DROP INDEX IF EXISTS {name}")
+            self._connection.execute("DELETE FROM expenses")
+            if len(frame):
+                ids = self._next_ids(len(frame)) if ids is None else np.asarray(ids, dtype=np.int64)
+                self._connection.executemany(
+                    "INSERT INTO expenses (id, date, month, category, description, amount) VALUES (?, ?, ?, ?, ?, ?)",
+                    to_records(frame, ids))
+            self._create_indexes()
+        self._len = len(frame)
+        self._changed("reset")
+
+    @locked
+    def clear(self):
+        """Remove all the expenses"""
+        self.replace(empty_frame())
+
+    ######## Reads ########
+
+    @locked
+    def find_date(self, date):
+        """Return the expenses of one day, indexed by their id (range query on the date index)"""
+        day = pd.Timestamp(date).normalize()
+        frame, ids = to_frame(self._connection.execute(
+            f"SELECT {columns} FROM expenses WHERE date >= ? AND date < ? ORDER BY id",
+            (day.value, (day + pd.Timedelta(days=1)).value)).fetchall())
+        frame.index = ids
+        return frame
+
+    @locked
+    def frame(self):
+        """Return all the expenses as a dataframe (loads the whole table: only for exports)"""
+        return to_frame(self._connection.execute(f"SELECT {columns} FROM expenses ORDER BY id").fetchall())[0]
+
+    @locked
+    def ids(self):
+        """Ids of the rows of frame(), in the same order"""
+        return np.fromiter((row[0] for row in self._connection.execute("SELECT id FROM expenses ORDER BY id")),
+                           dtype=np.int64)
+
+    def view(self, column="date", reverse=False):
+        """All the expenses sorted on a column, read page by page"""
+        return QueryView(self, order=column, reverse=reverse)
+
+    def search(self, text="", category=None, min_amount=None, max_amount=None, contains=False):
+        """
+        Return a QueryView (by date) of the expenses matching all the given criteria.
+        The text is searched at the start of the descriptions, or anywhere in them if contains is True.
+        """
+        conditions, params = [], []
+        text = text.strip()
+        if text:
+            conditions.append("description LIKE ? ESCAPE '\\'")  # LIKE ignores the case
+            params.append(("%" if contains else "") + escape_like(text) + "%")
+        if category is not None:
+            conditions.append("category = ?")
+            params.append(category)
+        if min_amount is not None:
+            conditions.append("amount >= ?")
+            params.append(min_amount)
+        if max_amount is not None:
+            conditions.append("amount <= ?")
+            params.append(max_amount)
+        return QueryView(self, " AND ".join(conditions), params)
+
+    ######## Dashboard ########
+
+    @locked
+    def summary(self, start, end):
+        """PeriodSummary of the expenses with start <= date <= end, grouped by SQLite (cached per version)"""
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        return self.period_cache.get(((start, end), self.version), lambda: self._summary(start, end))
+
+    @locked
+    def versioned_summary(self, start, end):
+        """(summary(start, end), version), the queries share the connection so the lock is held throughout"""
+        return self.summary(start, end), self.version
+
+    def _summary(self, start, end):
+        records = self._connection.execute(
+            "SELECT month, category, SUM(CAST(ROUND(amount * 100) AS INTEGER)), COUNT(*) FROM expenses "
+            "WHERE date >= ? AND date <= ? AND category IS NOT NULL GROUP BY month, category",
+            (start.value, end.value)).fetchall()
+        if not records:
+            return PeriodSummary(*group_by_month(empty_frame()))
+        grouped = pd.DataFrame(records, columns=["month", "category", "total", "count"])
+        totals = grouped.pivot(index="month", columns="category", values="total").fillna(0).astype(np.int64)
+        counts = grouped.pivot(index="month", columns="category", values="count").fillna(0).astype(np.int64)
+        return PeriodSummary(totals, counts)
+
+    @locked
+    def period_bars(self, start, end, max_bars):
+        """
+        Bars of the period (whole days from start to end) as (labels, totals in euros, resolution),
+        at the finest resolution giving at most max_bars bars. SQLite sums the days, numpy the bars.
+        """
+        resolution = choose_resolution(start, end, max_bars)
+        edges = bucket_edges(start, end, resolution)
+        records = self._connection.execute(
+            f"SELECT {day_sql} AS day, SUM(CAST(ROUND(amount * 100) AS INTEGER)) FROM expenses "
+            "WHERE date >= ? AND date < ? AND category IS NOT NULL GROUP BY day",
+            (int(edges[0]) * day_ns, int(edges[-1]) * day_ns)).fetchall()
+        days = np.array([record[0] for record in records], dtype=np.int64)
+        cents = np.array([record[1] or 0 for record in records], dtype=np.float64)
+        return bucket_labels(edges, resolution), bucket_sums(days, cents, edges) / 100, resolution
+
+    @locked
+    def daily_totals(self):
+        """Total (cents) per day and category of the whole database (see group_by_day), for the analytics"""
+        records = self._connection.execute(
+            f"SELECT {day_sql} AS day, category, SUM(CAST(ROUND(amount * 100) AS INTEGER)) FROM expenses "
+            "WHERE date IS NOT NULL AND category IS NOT NULL GROUP BY day, category").fetchall()
+        if not records:
+            return group_by_day(empty_frame())
+        grouped = pd.DataFrame(records, columns=["day", "category", "total"])
+        table = grouped.pivot(index="day", columns="category", values="total").fillna(0).astype(np.int64)
+        days = table.index.to_numpy(dtype=np.int64)
+        return table.reindex(pd.Index(np.arange(days.min(), days.max() + 1), name="day"), fill_value=0)
+
+    @locked
+    def years(self):
+        """Years with at least one expense (one index lookup per year)"""
+        years = []
+        date = self._query_one("SELECT MIN(date) FROM expenses")
+        while date is not None:
+            year = pd.Timestamp(date).year
+            years.append(year)
+            date = self._query_one("SELECT MIN(date) FROM expenses WHERE date >= ?",
+                                   (pd.Timestamp(f"{year + 1}-01-01").value,))
+        return years
+
+
+######################## VIEWS  ########################
+
+
+class QueryView:
+    """
+    Rows of a query on the database in a given order, read by the data viewers
+    like a FrameView. Only one page of rows is kept, it is read again when the
+    database changes.
+
+    The rows with a value in the sort column come first, walked in the (column, id)
+    index from the nearest row already read (an anchor): WHERE (column, id) > (?, ?)
+    instead of an OFFSET that sorts the whole table. The rows without a value come
+    last (as in the Ledger views), by id.
+    """
+    page_size = 200
+    max_anchors = 256
+
+    def __init__(self, database, where="", params=(), order="date", reverse=False):
+        if order not in sortable_columns:
+            raise ValueError(f"cannot sort on {order}")
+        self.database = database
+        self.where = where
+        self.params = list(params)
+        self.column = order
+        self.collate = sortable_columns[order]
+        self.reverse = reverse
+        self._key = columns.split(", ").index(order)  # position of the sort column in the records
+        self._version = None
+        self._len = self._n_sorted = 0
+        self._anchors = {}  # view position -> (value, id) of a row read before
+        self._page_start, self._page = 0, None
+
+    def _conditions(self, *extra):
+        return "WHERE " + " AND ".join(([f"({self.where})"] if self.where else []) + list(extra))
+
+    def _refresh(self):
+        """Forget the length, the anchors and the page read before a change of the database"""
+        if self._version != self.database.version:
+            self._version = self.database.version
+            self._len = self.database._query_one(f"SELECT COUNT(*) FROM expenses {self._conditions('1')}",
+                                                 self.params)
+            n_missing = self.database._query_one(
+                f"SELECT COUNT(*) FROM expenses {self._conditions(f'{self.column} IS NULL')}", self.params)
+            self._n_sorted = self._len - n_missing
+            self._anchors = {}
+            self._page = None
+
+    def _walk(self, forward, anchor, count, skip):
+        """
+        count records of the sorted rows after (forward) or before the anchor (value, id)
+        (None: from the first / last row), skipping skip rows, in the walking order
+        """
+        ascending = forward != self.reverse
+        direction = "ASC" if ascending else "DESC"
+        conditions = [f"{self.column} IS NOT NULL"]
+        params = list(self.params)
+        if anchor is not None:
+            conditions.append(f"({self.column}, id) {'>' if ascending else '<'} (?{self.collate}, ?)")
+            params += list(anchor)
+        return self.database._connection.execute(
+            f"SELECT {columns} FROM expenses {self._conditions(*conditions)} "
+            f"ORDER BY {self.column}{self.collate} {direction}, id {direction} LIMIT ? OFFSET ?",
+            params + [count, skip]).fetchall()
+
+    def _fetch_sorted(self, start, stop):
+        """Records of the sorted rows start to stop, walked from the closest anchor"""
+        # (rows to skip, forward, anchor): from the first row, from the last row or from an anchor
+        walks = [(start, True, None), (self._n_sorted - stop, False, None)]
+        for position, anchor in self._anchors.items():
+            if position < start:
+                walks.append((start - position - 1, True, anchor))
+            elif position >= stop:
+                walks.append((position - stop, False, anchor))
+        skip, forward, anchor = min(walks, key=lambda walk: walk[0])
+
+        records = self._walk(forward, anchor, stop - start, skip)
+        if not forward:
+            records.reverse()
+        if records:
+            if len(self._anchors) >= self.max_anchors:
+                self._anchors.clear()
+            for position, record in ((start, records[0]), (start + len(records) - 1, records[-1])):
+                self._anchors[position] = (record[self._key], record[0])
+        return records
+
+    def _fetch(self, start, stop):
+        """Rows start to stop of the query, as (dataframe, ids)"""
+        stop = min(stop, self._len)
+        records = []
+        if start < min(stop, self._n_sorted):
+            records += self._fetch_sorted(start, min(stop, self._n_sorted))
+        if stop > self._n_sorted:
+            # Rows without a value in the sort column, by id (the index keeps them together)
+            skip = max(start, self._n_sorted) - self._n_sorted
+            records += self.database._connection.execute(
+                f"SELECT {columns} FROM expenses {self._conditions(f'{self.column} IS NULL')} "
+                "ORDER BY id LIMIT ? OFFSET ?",
+                self.params + [stop - self._n_sorted - skip, skip]).fetchall()
+        return to_frame(records)
+
+    def __len__(self):
+        with self.database.lock:
+            self._refresh()
+            return self._len
+
+    def rows(self, start, stop):
+        """Return the rows start to stop (display order) as a dataframe"""
+        with self.database.lock:
+            self._refresh()
+            page_stop = self._page_start + (0 if self._page is None else len(self._page[0]))
+            if self._page is None or start < self._page_start or min(stop, self._len) > page_stop:
+                # Read a whole page around the rows asked for, the next scroll steps are then free
+                self._page_start = max(0, start - self.page_size // 4)
+                self._page = self._fetch(self._page_start, max(stop, self._page_start + self.page_size))
+            frame, _ = self._page
+            return frame.iloc[start - self._page_start:stop - self._page_start]
+
+    def row_ids(self, view_positions):
+        """Ledger ids of the rows at the given display positions (from the page shown, else one query per run)"""
+        positions = np.asarray(view_positions, dtype=np.int64)
+        if len(positions) == 0:
+            return positions
+        with self.database.lock:
+            self._refresh()
+            ids = []
+            runs = np.split(positions, np.flatnonzero(np.diff(positions) != 1) + 1)
+            for run in runs:
+                first, last = int(run[0]), int(run[-1])
+                if self._page is not None and self._page_start <= first and last < self._page_start + len(self._page[1]):
+                    ids.append(self._page[1][first - self._page_start:last + 1 - self._page_start])
+                else:
+                    ids.append(self._fetch(first, last + 1)[1])
+            return np.concatenate(ids)
@@ -0,0 +1,119 @@
+"""SpendingAnalytics (prefix sums of the day x category table) against pandas groupby / rolling / cumsum"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from expense_analytics import SpendingAnalytics, ledger_analytics
+from expense_data import Ledger, month_key, synthetic_expenses
+
+periods = [
+    (pd.Timestamp("2019-01-01"), pd.Timestamp("2019-12-31 23:59:59")),  # whole months
+    (pd.Timestamp("2020-02-10"), pd.Timestamp("2021-03-17 23:59:59")),  # partial first and last months
+    (pd.Timestamp("2014-12-20"), pd.Timestamp("2015-01-05 23:59:59")),  # starts before the first expense
+]
+
+
+@pytest.fixture(scope="module")
+def ledger():
+    ledger = Ledger()
+    ledger.replace(synthetic_expenses(5000, seed=8))
+    return ledger
+
+
+@pytest.fixture(scope="module")
+def daily(ledger):
+    """Dense day x category table (euros) of the reference, wide enough for every period and window"""
+    frame = ledger.frame()
+    table = frame.groupby([frame["date"].dt.normalize(), frame["category"].astype(str)])["amount"].sum().unstack(fill_value=0)
+    days = pd.date_range(pd.Timestamp("2014-06-01"), frame["date"].max().normalize())
+    return table.reindex(days, fill_value=0.0)
+
+
+def period_days(daily, start, end):
+    return daily.loc[start.normalize():end.normalize()]
+
+
+@pytest.mark.parametrize("start, end", periods)
+def test_running_total(ledger, daily, start, end):
+    result = ledger_analytics(ledger).running_total(start, end)
+    expected = period_days(daily, start, end).sum(axis=1).cumsum()
+    assert np.array_equal(result.index, expected.index)
+    assert np.allclose(result.to_numpy(), expected.to_numpy())
+
+
+@pytest.mark.parametrize("window", [30, 90])
+@pytest.mark.parametrize("start, end", periods)
+def test_rolling(ledger, daily, window, start, end):
+    """The window also counts the days before the start of the period"""
+    result = ledger_analytics(ledger).rolling(window, start, end)
+    expected = daily.rolling(window, min_periods=1).sum().loc[start.normalize():end.normalize()]
+    assert np.array_equal(result.index, expected.index)
+    assert np.allclose(result[expected.columns].to_numpy(), expected.to_numpy())
+
+
+@pytest.mark.parametrize("start, end", periods)
+def test_monthly_and_month_over_month(ledger, daily, start, end):
+    analytics = ledger_analytics(ledger)
+    days = period_days(daily, start, end)
+    expected = days.groupby(month_key(days.index.to_numpy())).sum()
+    result = analytics.monthly(start, end)
+    assert np.array_equal(result.index, expected.index)
+    assert np.allclose(result[expected.columns].to_numpy(), expected.to_numpy())
+
+    changes = analytics.month_over_month(start, end)
+    assert np.allclose(changes["change"][expected.columns].iloc[1:].to_numpy(), expected.diff().iloc[1:].to_numpy())
+    percent = (expected.diff() / expected.shift(1).where(expected.shift(1) != 0) * 100).iloc[1:]
+    assert np.allclose(changes["percent"][expected.columns].iloc[1:].to_numpy(), percent.to_numpy(), equal_nan=True)
+
+
+def test_partial_last_month(ledger, daily):
+    """A period ending on the 17th compares days 1-17 of its last month with days 1-17 of the month before"""
+    start, end = periods[1]
+    analytics = ledger_analytics(ledger)
+    assert analytics.partial_months(start, end) == {int(month_key(start.to_datetime64())),
+                                                    int(month_key(end.to_datetime64()))}
+    assert analytics.last_month_label(start, end) == "Mar 2021 (days 1-17) vs Feb 2021 (days 1-17)"
+    spent = daily.loc["2021-03-01":"2021-03-17"].sum()
+    before = daily.loc["2021-02-01":"2021-02-17"].sum()
+    result = analytics.last_month_changes(start, end)
+    assert np.allclose(result.loc[spent.index, "spent"].to_numpy(), spent.to_numpy())
+    assert np.allclose(result.loc[spent.index, "change"].to_numpy(), (spent - before).to_numpy())
+    assert list(result["spent"]) == sorted(result["spent"], reverse=True)
+
+
+def test_burn_down(ledger, daily):
+    analytics = ledger_analytics(ledger)
+    month = int(month_key(np.datetime64("2020-06-01")))
+    budget = analytics.default_budget(month)
+    assert budget == pytest.approx(daily.loc["2019-06-01":"2020-05-31"].to_numpy().sum() / 12)
+    frame, projected = analytics.burn_down(month, budget)
+    spent = daily.loc["2020-06-01":"2020-06-30"].sum(axis=1).cumsum()
+    assert np.allclose(frame["spent"].to_numpy(), spent.to_numpy())
+    assert np.allclose(frame["remaining"].to_numpy(), budget - spent.to_numpy())
+    assert frame["ideal"].iloc[-1] == pytest.approx(0)
+    assert projected == pytest.approx(spent.iloc[-1])  # a month in the past: projected = spent
+
+
+def test_follows_the_ledger():
+    """After appends and deletes, the analytics are the ones of a table built again from the ledger"""
+    ledger = Ledger()
+    ledger.replace(synthetic_expenses(1000, seed=9))
+    start, end = pd.Timestamp("2015-01-01"), pd.Timestamp("2024-12-31")
+    before = ledger_analytics(ledger)
+    before.running_total(start, end)
+
+    for row in synthetic_expenses(50, seed=10).itertuples(index=False):
+        ledger.append(row.date, row.category, row.description, row.amount)
+    ledger.delete(ledger.ids()[::9])
+    ledger.append(pd.Timestamp("2026-01-15"), "Education", "after the last day", 99.0)  # table grows at the end
+
+    after = ledger_analytics(ledger)
+    assert after is not before and after.version == ledger.version
+    assert ledger_analytics(ledger) is after  # one per version
+    fresh = SpendingAnalytics(ledger.daily_totals(), ledger.version)
+    end = pd.Timestamp("2026-01-31")
+    assert np.allclose(after.running_total(start, end), fresh.running_total(start, end))
+    result, expected = after.rolling(30, start, end), fresh.rolling(30, start, end)
+    assert np.allclose(result[expected.columns].to_numpy(), expected.to_numpy())
+    assert after.running_total(start, end).iloc[-1] == pytest.approx(ledger.frame()["amount"].sum())
@@ -0,0 +1,76 @@
+"""Bulk entry: rows typed or pasted are split, validated and typed all at once"""
+
+import numpy as np
+import pandas as pd
+
+from expense_data import Ledger, category_ls
+from expense_io import entry_columns, parse_entries, split_pasted_rows
+
+
+def entries(*rows):
+    return pd.DataFrame(list(rows), columns=entry_columns)
+
+
+def test_valid_rows():
+    typed, errors = parse_entries(entries(
+        ["2024-03-01", "Food", "Groceries", "12.50"],
+        ["02.03.2024", "food", "", "12,50"],  # category in another case, decimal comma
+        ["03/03/2024", "HEALTH", "Pharmacy", "1 234.5 €"],
+        ["2024-03-04T10:30", " Transport ", " Bus ", "€3"],  # ISO 8601, spaces around the cells
+    ))
+    assert (errors == "").all()
+    assert typed["date"].tolist() == [pd.Timestamp("2024-03-01"), pd.Timestamp("2024-03-02"),
+                                      pd.Timestamp("2024-03-03"), pd.Timestamp("2024-03-04 10:30")]
+    assert typed["category"].astype(str).tolist() == ["Food", "Food", "Health", "Transport"]
+    assert list(typed["category"].cat.categories) == category_ls
+    assert typed["description"].tolist() == ["Groceries", "", "Pharmacy", "Bus"]
+    assert np.allclose(typed["amount"], [12.5, 12.5, 1234.5, 3.0])
+
+
+def test_errors_per_row():
+    typed, errors = parse_entries(entries(
+        ["2024-13-01", "Food", "bad month", "1"],
+        ["", "Pets", "no date, unknown category", "abc"],
+        ["2024-01-01", "Food", "ok", "2"],
+        [None, None, None, None],
+    ))
+    assert errors.tolist() == [
+        "invalid date",
+        "invalid date, unknown category, invalid amount",
+        "",
+        "invalid date, unknown category, invalid amount",
+    ]
+    assert typed["amount"].iloc[2] == 2.0
+
+
+def test_typed_rows_go_in_the_ledger():
+    typed, errors = parse_entries(entries(
+        ["2024-03-01", "Food", "Groceries", "12.50"],
+        ["2024-03-02", "Housing", "Rent", "800"],
+    ))
+    ledger = Ledger()
+    ledger.extend(typed[errors == ""])
+    assert len(ledger) == 2
+    assert ledger.summary(pd.Timestamp("2024-03-01"), pd.Timestamp("2024-03-31")).total == 812.5
+
+
+def test_split_pasted_rows():
+    # From a spreadsheet (tabs), with a header
+    assert split_pasted_rows("Date\tCategory\tDescription\tAmount\n2024-01-02\tFood\tBread\t2,40\n\n") == [
+        ["2024-01-02", "Food", "Bread", "2,40"]]
+    # CSV with semicolons (decimal commas in the cells), 3 cells: no description
+    assert split_pasted_rows("2024-01-02;Food;2,40\n2024-01-03;Health;\"1 000,00\"") == [
+        ["2024-01-02", "Food", "", "2,40"], ["2024-01-03", "Health", "", "1 000,00"]]
+    # CSV with commas, quoted cells, missing cells padded
+    assert split_pasted_rows('2024-01-02,Food,"Bread, butter",3.10\n2024-01-04,Food') == [
+        ["2024-01-02", "Food", "Bread, butter", "3.10"], ["2024-01-04", "Food", "", ""]]
+    assert split_pasted_rows("  \n") == []
+
+
+def test_pasted_rows_parse():
+    rows = split_pasted_rows("date;category;description;amount\n05.01.2024;shopping;Shoes;59,90 €")
+    typed, errors = parse_entries(pd.DataFrame(rows, columns=entry_columns))
+    assert errors.tolist() == [""]
+    assert typed["date"].iloc[0] == pd.Timestamp("2024-01-05")
+    assert typed["category"].iloc[0] == "Shopping"
+    assert typed["amount"].iloc[0] == 59.9
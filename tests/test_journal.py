@@ -0,0 +1,141 @@
+"""Journal: saves append the changes, loading replays them, a crash loses at most the unsaved changes"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from expense_data import Ledger, synthetic_expenses
+from expense_io import Journal
+
+
+def state(ledger):
+    """Rows of a ledger by id, to compare two ledgers"""
+    frame = ledger.frame()
+    return sorted(zip(ledger.ids().tolist(), frame["date"].tolist(), frame["category"].astype(str).tolist(),
+                      frame["description"].astype(str).tolist(), np.round(frame["amount"], 2).tolist()))
+
+
+def reopen(path):
+    ledger = Ledger()
+    Journal.open(path, ledger).close()
+    return ledger
+
+
+def change_some(ledger, seed):
+    """A few appends, a bulk add and a delete"""
+    rows = synthetic_expenses(20, seed=seed)
+    for row in rows.itertuples(index=False):
+        ledger.append(row.date, row.category, row.description, row.amount)
+    ledger.extend(synthetic_expenses(30, seed=seed + 1))
+    ledger.delete(ledger.ids()[::7])
+
+
+def test_save_and_replay(tmp_path):
+    path = str(tmp_path / "expenses.ledger")
+    ledger = Ledger()
+    ledger.replace(synthetic_expenses(200, seed=1))
+    journal = Journal.create(path, ledger)
+
+    change_some(ledger, 10)
+    journal.save()
+    size = (tmp_path / "expenses.ledger.journal").stat().st_size
+    change_some(ledger, 20)
+    journal.save()
+    # Only the new changes are appended
+    lines = (tmp_path / "expenses.ledger.journal").read_text().splitlines()
+    assert [json.loads(line)["seq"] for line in lines] == list(range(1, len(lines) + 1))
+    assert (tmp_path / "expenses.ledger.journal").stat().st_size > size
+    journal.close()
+
+    assert state(reopen(path)) == state(ledger)
+
+
+def test_unsaved_changes_are_lost_only(tmp_path):
+    path = str(tmp_path / "expenses.ledger")
+    ledger = Ledger()
+    ledger.replace(synthetic_expenses(100, seed=2))
+    journal = Journal.create(path, ledger)
+    change_some(ledger, 30)
+    journal.save()
+    saved = state(ledger)
+
+    change_some(ledger, 40)  # crash before the next save
+    assert journal.has_unsaved_changes()
+    assert state(reopen(path)) == saved
+
+
+def test_half_written_line(tmp_path):
+    path = str(tmp_path / "expenses.ledger")
+    ledger = Ledger()
+    ledger.replace(synthetic_expenses(100, seed=3))
+    journal = Journal.create(path, ledger)
+    change_some(ledger, 50)
+    journal.save()
+    journal.close()
+    saved = state(ledger)
+
+    # Crash in the middle of writing a line
+    with open(path + ".journal", "a") as file:
+        file.write('{"seq": 999, "op": "add", "id": [12')
+    ledger = Ledger()
+    journal = Journal.open(path, ledger)
+    assert state(ledger) == saved
+
+    # The broken end is removed: the next changes are replayed too
+    ledger.append(pd.Timestamp("2024-05-01"), "Food", "after the crash", 4.5)
+    journal.save()
+    journal.close()
+    assert state(reopen(path)) == state(ledger)
+
+
+def test_crash_during_compaction(tmp_path):
+    """The new snapshot is written but the journal still holds the changes it contains"""
+    path = str(tmp_path / "expenses.ledger")
+    ledger = Ledger()
+    ledger.replace(synthetic_expenses(100, seed=4))
+    journal = Journal.create(path, ledger)
+    change_some(ledger, 60)
+    journal.save()
+    journal._write_snapshot(ledger.frame(), ledger.ids(), journal._seq)  # the journal is not shortened
+    change_some(ledger, 70)
+    journal.save()
+    journal.close()
+
+    # The changes already in the snapshot are not applied twice
+    assert state(reopen(path)) == state(ledger)
+
+
+def test_compaction(tmp_path):
+    path = str(tmp_path / "expenses.ledger")
+    ledger = Ledger()
+    ledger.replace(synthetic_expenses(100, seed=5))
+    journal = Journal.create(path, ledger)
+    change_some(ledger, 80)
+    journal.save()
+    journal.compact_in_background()
+    change_some(ledger, 90)  # while compacting
+    journal.wait()
+    journal.save()
+    journal.close()
+
+    assert state(reopen(path)) == state(ledger)
+    assert len(list(tmp_path.glob("expenses.ledger.snapshot-*"))) == 1
+
+
+def test_clear_and_replace(tmp_path):
+    path = str(tmp_path / "expenses.ledger")
+    ledger = Ledger()
+    ledger.replace(synthetic_expenses(50, seed=6))
+    journal = Journal.create(path, ledger)
+    ledger.clear()
+    ledger.append(pd.Timestamp("2023-01-01"), "Health", "after clear", 10.0)
+    journal.save()
+    assert state(reopen(path)) == state(ledger)
+
+    # A replaced ledger (file loaded) is saved as a new snapshot
+    ledger.replace(synthetic_expenses(40, seed=7))
+    journal.save()
+    journal.close()
+    assert state(reopen(path)) == state(ledger)
+    assert (tmp_path / "expenses.ledger.journal").read_text() == ""
@@ -0,0 +1,125 @@
+"""The Ledger (append buffer, tombstone deletes, rollups) gives the same data as a plain pandas dataframe"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from expense_data import Ledger, amount_euros, group_by_month, synthetic_expenses
+
+
+def check_same(ledger, reference):
+    """The ledger holds the rows of the reference (indexed by id), in the same order"""
+    assert len(ledger) == len(reference)
+    assert np.array_equal(ledger.ids(), reference.index.to_numpy())
+    frame = ledger.frame()
+    assert np.array_equal(frame["date"].to_numpy(), reference["date"].to_numpy())
+    assert frame["category"].astype(object).tolist() == reference["category"].astype(object).tolist()
+    assert frame["description"].astype(str).tolist() == reference["description"].astype(str).tolist()
+    assert np.allclose(amount_euros(frame["amount"]), reference["amount"].to_numpy(), equal_nan=True)
+
+
+@pytest.fixture(params=[False, True], ids=["plain", "compact"])
+def changed(request):
+    """(ledger, reference) after the same appends, bulk adds and deletes on both"""
+    rng = np.random.default_rng(1)
+    frame = synthetic_expenses(2000, seed=2)
+    ledger = Ledger()
+    ledger.replace(frame)
+    if request.param:
+        ledger.compact_memory()
+    reference = frame.astype({"category": object, "description": object}).set_axis(ledger.ids())
+
+    for _ in range(3):
+        # One by one, like the add expense window (the append buffer grows a few times)
+        rows = synthetic_expenses(300, seed=int(rng.integers(1000)))
+        for row in rows.itertuples(index=False):
+            ledger.append(row.date, row.category, row.description, row.amount)
+        # In one batch, like the bulk entry and the file imports
+        bulk = synthetic_expenses(500, seed=int(rng.integers(1000)))
+        ledger.extend(bulk)
+        added = pd.concat([rows, bulk], ignore_index=True).astype({"category": object, "description": object})
+        reference = pd.concat([reference, added.set_axis(ledger.ids()[len(reference):])])
+
+        # Tombstones, from the old rows and from the rows just added
+        deleted = rng.choice(reference.index.to_numpy(), 250, replace=False)
+        ledger.delete(deleted)
+        reference = reference.drop(deleted)
+    return ledger, reference
+
+
+def test_appends_and_deletes(changed):
+    check_same(*changed)
+
+
+def test_ids_stay_unique_after_deletes():
+    ledger = Ledger()
+    ledger.append(pd.Timestamp("2024-01-01"), "Food", "a", 1.0)
+    ledger.append(pd.Timestamp("2024-01-02"), "Food", "b", 2.0)
+    ledger.delete([ledger.ids()[-1]])
+    ledger.append(pd.Timestamp("2024-01-03"), "Food", "c", 3.0)
+    assert len(set(ledger.ids())) == 2
+    assert ledger.ids()[-1] > ledger.ids()[0]
+
+
+def test_find_date(changed):
+    ledger, reference = changed
+    for day in reference["date"].dt.normalize().drop_duplicates().iloc[::97]:
+        expected = reference[reference["date"].dt.normalize() == day]
+        found = ledger.find_date(day)
+        assert sorted(found.index) == sorted(expected.index)
+        assert np.allclose(found.loc[expected.index, "amount"].to_numpy(dtype=np.float64), expected["amount"].to_numpy())
+
+
+@pytest.mark.parametrize("column", ["date", "category", "description", "amount"])
+def test_ascending_sort(changed, column):
+    ledger, reference = changed
+    keys = reference[column].astype(str).str.lower() if column == "description" else reference[column]
+    expected = reference.index[np.argsort(keys.to_numpy(), kind="stable")]
+    assert np.array_equal(ledger.view(column).row_ids(np.arange(len(ledger))), expected.to_numpy())
+
+
+def test_search(changed):
+    ledger, reference = changed
+    description = reference["description"].iloc[0]
+    expected = reference[reference["description"].str.lower().str.startswith(description[:3].lower())
+                         & (reference["category"] == reference["category"].iloc[0])
+                         & (reference["amount"] >= 5) & (reference["amount"] <= 80)]
+    view = ledger.search(description[:3], category=reference["category"].iloc[0], min_amount=5, max_amount=80)
+    assert sorted(view.row_ids(np.arange(len(view)))) == sorted(expected.index)
+
+    expected = reference[reference["description"].str.lower().str.contains("a", regex=False)]
+    view = ledger.search("A", contains=True)
+    assert sorted(view.row_ids(np.arange(len(view)))) == sorted(expected.index)
+
+
+def test_summary_and_rollups(changed):
+    ledger, reference = changed
+    periods = [(pd.Timestamp("2015-01-01"), pd.Timestamp("2025-01-01") - pd.Timedelta(1, "ns")),  # whole months only
+               (pd.Timestamp("2018-03-17"), pd.Timestamp("2021-11-04 12:00")),  # partial first/last months
+               (pd.Timestamp("2020-02-03"), pd.Timestamp("2020-02-20"))]  # inside one month
+    for start, end in periods:
+        summary = ledger.summary(start, end)
+        rows = reference[(reference["date"] >= start) & (reference["date"] <= end)]
+        expected_totals, _ = group_by_month(rows.astype({"category": "category"}))
+        assert summary.total == pytest.approx(rows["amount"].sum())
+        assert len(summary) == len(rows)
+        expected = rows.groupby("category")["amount"].sum()
+        totals = summary.category_totals
+        assert np.allclose(totals[totals != 0].sort_index().to_numpy(), expected[expected != 0].sort_index().to_numpy())
+        assert np.array_equal(summary.month_totals.index[summary.month_totals != 0],
+                              expected_totals.index[expected_totals.sum(axis=1) != 0])
+
+    # The daily rollup of the bars follows the changes too
+    start, end = periods[1]
+    labels, totals, resolution = ledger.period_bars(start, end, 60)
+    rows = reference[(reference["date"] >= start.normalize()) & (reference["date"] < end.normalize() + pd.Timedelta(days=1))]
+    assert totals.sum() == pytest.approx(rows["amount"].sum())
+    assert len(labels) <= 60
+
+
+def test_years_and_clear():
+    ledger = Ledger()
+    ledger.extend(synthetic_expenses(100, seed=3, start="2019-01-01", end="2020-12-31"))
+    assert ledger.years() == [2019, 2020]
+    ledger.clear()
+    assert len(ledger) == 0 and ledger.years() == []
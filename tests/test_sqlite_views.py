@@ -0,0 +1,78 @@
+"""The SQLite views (QueryView) show the rows in the same order as the in-memory views (FrameView)"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from expense_data import Ledger, sort_positions, synthetic_expenses
+from expense_sqlite import SQLiteLedger, sortable_columns
+
+
+def messy_expenses(n=3000):
+    """Synthetic expenses with missing values, repeated values and descriptions in other cases"""
+    frame = synthetic_expenses(n, seed=4)
+    frame["description"] = frame["description"].astype(object)
+    frame.loc[frame.index[::7], "description"] = frame["description"].iloc[::7].str.upper()
+    frame.loc[frame.index[::11], "description"] = frame["description"].iloc[::11].str.capitalize()
+    frame.loc[frame.index[::79], "description"] = None
+    frame.loc[frame.index[::97], "amount"] = np.nan
+    frame.loc[frame.index[::89], "date"] = pd.NaT
+    frame.loc[frame.index[::83], "category"] = np.nan
+    frame.loc[frame.index[::5], "amount"] = 10.0  # many ties
+    return frame
+
+
+@pytest.fixture(scope="module", params=[False, True], ids=["plain", "compact"])
+def ledgers(request, tmp_path_factory):
+    frame = messy_expenses()
+    ledger = Ledger()
+    ledger.replace(frame)
+    if request.param:
+        ledger.compact_memory()  # cents, missing amounts included, and categorical descriptions
+    database = SQLiteLedger(str(tmp_path_factory.mktemp("sqlite") / "expenses.sqlite"))
+    database.replace(frame, ledger.ids())
+    yield ledger, database
+    database.close()
+
+
+def page_ids(view, page=170):
+    """Ids of all the rows of a view, read page by page like a data viewer does"""
+    return np.concatenate([view.row_ids(np.arange(start, min(start + page, len(view))))
+                           for start in range(0, len(view), page)])
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+@pytest.mark.parametrize("column", list(sortable_columns))
+def test_same_order(ledgers, column, reverse):
+    ledger, database = ledgers
+    expected = page_ids(ledger.view(column, reverse))
+    assert len(expected) == len(ledger)
+    assert np.array_equal(page_ids(database.view(column, reverse)), expected)
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+@pytest.mark.parametrize("column", list(sortable_columns))
+def test_same_order_scrolling_back(ledgers, column, reverse):
+    """Pages read from the end walk the index backwards from the anchors"""
+    ledger, database = ledgers
+    expected = ledger.view(column, reverse)
+    view = database.view(column, reverse)
+    for start in range(len(view) - 60, 0, -450):
+        positions = np.arange(start, start + 60)
+        assert np.array_equal(view.row_ids(positions), expected.row_ids(positions))
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+@pytest.mark.parametrize("column", list(sortable_columns))
+def test_sort_positions(ledgers, column, reverse):
+    """sort_positions() of a column gives the order of the views"""
+    ledger, database = ledgers
+    order = sort_positions(ledger.frame()[column], reverse)
+    assert np.array_equal(ledger.ids()[order], page_ids(database.view(column, reverse)))
+
+
+def test_descriptions_without_case(ledgers):
+    ledger, _ = ledgers
+    rows = ledger.view("description").rows(0, len(ledger))
+    descriptions = rows["description"].dropna().astype(str).str.lower().tolist()
+    assert descriptions == sorted(descriptions)